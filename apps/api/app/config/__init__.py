@@ -21,14 +21,39 @@ from .constants import (
     DEFAULT_GEMINI_MODEL,
     DEFAULT_GROQ_MODEL,
     MAX_BATCH_TOKENS,
+    BATCH_FILL_RATIO,
     MAX_JOB_TOKENS,
     MAX_FILE_TOKENS,
     RETRY_LIMIT,
+    BATCH_MISSING_ID_ROUNDS,
+    GEMINI_MAX_CONCURRENT_BATCHES,
+    GROQ_MAX_CONCURRENT_BATCHES,
+    DISTRIBUTED_RATE_LIMIT_ENABLED,
+    DISTRIBUTED_RATE_LIMIT_RETRY_SECONDS,
+    PROVIDER_SHARDING_ENABLED,
+    HTTP_TIMEOUT_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    TRANSLATION_MEMORY_ENABLED,
+    TRANSLATION_MEMORY_TTL_SECONDS,
+    PREVIEW_REUSE_TTL_SECONDS,
+    PREVIEW_ASSET_CACHE_BOOKS,
+    PREVIEW_ASSET_URL_TTL_SECONDS,
+    CHECKPOINT_TTL_SECONDS,
+    SEGMENTATION_PROCESSES,
+    SEGMENTATION_POOL_MIN_CHARS,
+    SEGMENT_COALESCE_BLOCKS,
+    TRANSLATION_WINDOW_CHARS,
     DEFAULT_RQ_QUEUES,
     MAX_CONCURRENT_JOBS,
     RETENTION_DAYS,
+    JOB_RETRY_MAX,
     GENERATE_PDF,
     GENERATE_TXT,
+    OUTPUT_PROCESSES,
+    PDF_CHUNK_CHARS,
+    PDF_RENDER_PROCESSES,
     DEFAULT_EMAIL_PROVIDER,
     EMAIL_FROM,
     RATE_LIMIT_BURST,
@@ -55,6 +80,9 @@ class Settings(BaseSettings):
     # Frontend URL (auto-determined from env, but can override)
     frontend_url: str | None = Field(default=None, alias="FRONTEND_URL")
 
+    # Public API URL for links back to the API, e.g. preview images (default: the request's base URL)
+    api_url: str | None = Field(default=None, alias="API_URL")
+
     # R2 Storage SECRETS
     r2_account_id: str = Field(alias="R2_ACCOUNT_ID")
     r2_access_key_id: str = Field(alias="R2_ACCESS_KEY_ID")
@@ -80,24 +108,58 @@ class Settings(BaseSettings):
     # Translation Provider SECRETS
     gemini_api_key: str = Field(alias="GEMINI_API_KEY")
     groq_api_key: str = Field(alias="GROQ_API_KEY")
+    # Optional extra keys (comma-separated), each with its own quota, used when sharding
+    gemini_api_keys: str = Field(default="", alias="GEMINI_API_KEYS")
+    groq_api_keys: str = Field(default="", alias="GROQ_API_KEYS")
 
     # Translation non-secrets (constants)
     provider: str = DEFAULT_PROVIDER
     gemini_model: str = DEFAULT_GEMINI_MODEL
     groq_model: str = DEFAULT_GROQ_MODEL
     max_batch_tokens: int = MAX_BATCH_TOKENS
+    batch_fill_ratio: float = BATCH_FILL_RATIO
     max_job_tokens: int = MAX_JOB_TOKENS
     max_file_tokens: int = MAX_FILE_TOKENS
     retry_limit: int = RETRY_LIMIT
+    batch_missing_id_rounds: int = BATCH_MISSING_ID_ROUNDS
+    gemini_max_concurrent_batches: int = GEMINI_MAX_CONCURRENT_BATCHES
+    groq_max_concurrent_batches: int = GROQ_MAX_CONCURRENT_BATCHES
+    distributed_rate_limit_enabled: bool = DISTRIBUTED_RATE_LIMIT_ENABLED
+    distributed_rate_limit_retry_seconds: int = DISTRIBUTED_RATE_LIMIT_RETRY_SECONDS
+    provider_sharding_enabled: bool = PROVIDER_SHARDING_ENABLED
+
+    # Provider HTTP connection pool (constants)
+    http_timeout_seconds: int = HTTP_TIMEOUT_SECONDS
+    http_max_connections: int = HTTP_MAX_CONNECTIONS
+    http_max_keepalive_connections: int = HTTP_MAX_KEEPALIVE_CONNECTIONS
+    http_keepalive_expiry_seconds: int = HTTP_KEEPALIVE_EXPIRY_SECONDS
+
+    # Translation memory (constants)
+    translation_memory_enabled: bool = TRANSLATION_MEMORY_ENABLED
+    translation_memory_ttl_seconds: int = TRANSLATION_MEMORY_TTL_SECONDS
+    preview_reuse_ttl_seconds: int = PREVIEW_REUSE_TTL_SECONDS
+    preview_asset_cache_books: int = PREVIEW_ASSET_CACHE_BOOKS
+    preview_asset_url_ttl_seconds: int = PREVIEW_ASSET_URL_TTL_SECONDS
+    checkpoint_ttl_seconds: int = CHECKPOINT_TTL_SECONDS
+
+    # Document processing (constants)
+    segmentation_processes: int = SEGMENTATION_PROCESSES
+    segmentation_pool_min_chars: int = SEGMENTATION_POOL_MIN_CHARS
+    segment_coalesce_blocks: bool = SEGMENT_COALESCE_BLOCKS
+    translation_window_chars: int = TRANSLATION_WINDOW_CHARS
 
     # Queue (constants)
     rq_queues: str = DEFAULT_RQ_QUEUES
     max_concurrent_jobs: int = MAX_CONCURRENT_JOBS
     retention_days: int = RETENTION_DAYS
+    job_retry_max: int = JOB_RETRY_MAX
 
     # Output (constants)
     generate_pdf: bool = GENERATE_PDF
     generate_txt: bool = GENERATE_TXT
+    output_processes: int = OUTPUT_PROCESSES
+    pdf_chunk_chars: int = PDF_CHUNK_CHARS
+    pdf_render_processes: int = PDF_RENDER_PROCESSES
 
     # Email SECRETS
     resend_api_key: str = Field(alias="RESEND_API_KEY")
@@ -24,18 +24,49 @@ DEFAULT_PROVIDER = "gemini"  # Best quality for production
 DEFAULT_GEMINI_MODEL = "gemini-2.5-flash-lite"
 DEFAULT_GROQ_MODEL = "llama-3.1-8b-instant"
 MAX_BATCH_TOKENS = 6000
+BATCH_FILL_RATIO = 0.9  # Pack batches to 90% of max_batch_tokens (headroom for estimate error)
 MAX_JOB_TOKENS = 1_000_000
 MAX_FILE_TOKENS = 1_000_000
 RETRY_LIMIT = 3
+BATCH_MISSING_ID_ROUNDS = 3  # Requests per batch before segments missing from the JSON response are given up
+GEMINI_MAX_CONCURRENT_BATCHES = 16  # Batches in flight per job (paced by the RPM/TPM token bucket)
+GROQ_MAX_CONCURRENT_BATCHES = 4  # Batches in flight per Groq key when sharding (paced by its token bucket)
+DISTRIBUTED_RATE_LIMIT_ENABLED = True  # Share RPM/TPM buckets across all workers via Redis
+DISTRIBUTED_RATE_LIMIT_RETRY_SECONDS = 30  # Per-process limits after a Redis error, then Redis is tried again
+PROVIDER_SHARDING_ENABLED = False  # Shard each book's batches across Gemini + Groq (and all API keys)
+
+# Provider HTTP connection pool (one pool per provider instance)
+HTTP_TIMEOUT_SECONDS = 60
+HTTP_MAX_CONNECTIONS = 32
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 16
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 30
+
+# Translation memory (Redis cache of segment translations shared by previews and jobs)
+TRANSLATION_MEMORY_ENABLED = True
+TRANSLATION_MEMORY_TTL_SECONDS = 2592000  # 30 days, refreshed on every hit
+PREVIEW_REUSE_TTL_SECONDS = 432000  # 5 days, matches upload retention
+PREVIEW_ASSET_CACHE_BOOKS = 8  # Previewed EPUBs kept on disk to serve their images (GET /preview/assets)
+PREVIEW_ASSET_URL_TTL_SECONDS = 86400  # Lifetime of the signed image URLs in a preview
+CHECKPOINT_TTL_SECONDS = 432000  # 5 days, per-job translated batches for resuming
+
+# Document processing (parse/sanitize/segment spine documents)
+SEGMENTATION_PROCESSES = 0  # Process pool size for large books (0 = one per CPU core)
+SEGMENTATION_POOL_MIN_CHARS = 500_000  # Smaller books are segmented in-process
+SEGMENT_COALESCE_BLOCKS = False  # One segment per inline-only block (<p>He <em>said</em></p>) instead of per text node
+TRANSLATION_WINDOW_CHARS = 1_000_000  # Source text per chapter window translated/assembled at once (~250K tokens)
 
 # Queue Configuration
 DEFAULT_RQ_QUEUES = "translate"
 MAX_CONCURRENT_JOBS = 5
 RETENTION_DAYS = 5
+JOB_RETRY_MAX = 2  # Re-run failed jobs and jobs abandoned by a killed/redeployed worker (resumes from checkpoint)
 
 # Output Configuration
 GENERATE_PDF = True
 GENERATE_TXT = True
+OUTPUT_PROCESSES = 0  # Process pool size for rendering the output files (0 = one per CPU core)
+PDF_CHUNK_CHARS = 1_000_000  # HTML per chapter group of a PDF rendered by one process (larger PDFs are merged)
+PDF_RENDER_PROCESSES = 0  # Processes for the chapter groups of a job's two PDFs, split between them (0 = OUTPUT_PROCESSES)
 
 # Email Configuration
 DEFAULT_EMAIL_PROVIDER = "resend"
@@ -8,22 +8,226 @@ Features:
 - Bilingual PDFs: Preserves subtitle styling (0.85em, gray, italic)
 - Regular translations: Professional typography and layout
 - RTL language support (Arabic, Hebrew, Farsi, Urdu)
-- Base64 image embedding
+- Images served on demand from the EPUB zip (no base64 inlining)
+- Large books rendered in parallel chapter groups and merged with pypdf
+- One font configuration shared by every render in a process
 - Optimized margins (1.5cm top/bottom, 2cm left/right)
 - Page numbers and proper typography
 
 WeasyPrint is the standard for ALL PDF generation in BookTranslator.
 """
 
+import io
 import os
 import tempfile
-from typing import List
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 from pathlib import Path
 
+from pypdf import PdfReader, PdfWriter
+
+from app.config import settings
 from app.logger import get_logger
+from app.pipeline.epub_assets import EPUBAssets
+from app.pipeline.spool import DocumentSpool
 
 logger = get_logger(__name__)
 
+# Page size, margins and page numbers (shared by every PDF and the page-number overlay)
+PAGE_CSS = """        @page {
+            size: A4;
+            margin: 1.5cm 2cm;  /* Top/bottom: 1.5cm, Left/right: 2cm */
+            @bottom-center {
+                content: counter(page);
+                font-size: 10pt;
+                color: #666;
+            }
+        }"""
+
+# Chapter groups are rendered without page numbers; the merged PDF gets continuous ones
+NO_PAGE_NUMBERS_CSS = "@page { @bottom-center { content: none; } }"
+
+HTML_TAIL = "\n</body>\n</html>"
+CHAPTER_BREAK = '<div style="page-break-before: always;"></div>'
+
+# FontConfiguration shared by every render in the process (the PDFs of a job
+# and their chapter groups); building one costs a fontconfig scan
+_font_config = None
+
+
+def _get_font_config():
+    """The process's WeasyPrint FontConfiguration (created on first use)."""
+    global _font_config
+    if _font_config is None:
+        from weasyprint.text.fonts import FontConfiguration
+
+        started = time.perf_counter()
+        _font_config = FontConfiguration()
+        logger.info(f"🔤 Font configuration created in {time.perf_counter() - started:.2f}s")
+    return _font_config
+
+
+def _combine_documents(docs) -> str:
+    """Body HTML of documents, each chapter on a new page."""
+    combined_html_parts = []
+    for i, doc in enumerate(docs):
+        content = doc.get('content', '')
+
+        # Add page break between chapters (except first)
+        if i > 0:
+            combined_html_parts.append(CHAPTER_BREAK)
+
+        combined_html_parts.append(content)
+
+    return '\n'.join(combined_html_parts)
+
+
+def _write_pdf(
+    docs,
+    html_head: str,
+    output_path: str,
+    assets: Optional[EPUBAssets],
+    html_attrs: str,
+    max_processes: Optional[int] = None
+):
+    """Render documents to a PDF in one pass, or in chapter groups for large books.
+
+    Every chapter starts on a new page, so a book split at chapter boundaries
+    paginates exactly like the single pass. Groups of about
+    ``settings.pdf_chunk_chars`` characters are rendered in parallel worker
+    processes (each holding only its group's layout) and merged with pypdf,
+    keeping each group's outline; page numbers are then stamped across the
+    merged PDF so they stay continuous. Books smaller than one group are
+    rendered at once.
+
+    Args:
+        docs: Document dicts with 'content' (a list or a DocumentSpool)
+        html_head: HTML document up to and including the opening <body> tag
+        output_path: Path where PDF should be written
+        assets: Images of the input EPUB, fetched while rendering (None: no images)
+        html_attrs: lang/dir attributes of the <html> tag
+        max_processes: Processes for the chapter groups (default:
+            settings.pdf_render_processes, or one per CPU core). The output
+            stage passes its share, as both PDFs of a job render at once
+    """
+    chunks = _plan_chunks(docs, settings.pdf_chunk_chars)
+    if len(chunks) < 2:
+        _render_pdf_chunk(html_head, docs, 0, len(docs), assets, output_path)
+        return
+
+    started = time.perf_counter()
+    processes = min(max_processes or settings.pdf_render_processes or os.cpu_count() or 1, len(chunks))
+    chunk_head = html_head.replace('</head>', f'<style>{NO_PAGE_NUMBERS_CSS}</style>\n</head>', 1)
+    chunk_paths = [f"{output_path}.part{i}" for i in range(len(chunks))]
+
+    try:
+        jobs = []
+        for (start, end), chunk_path in zip(chunks, chunk_paths):
+            # Spools pickle as metadata and assets as the EPUB path and image index,
+            # so workers read their documents and images from disk
+            if isinstance(docs, DocumentSpool):
+                jobs.append((chunk_head, docs, start, end, assets, chunk_path))
+            else:
+                jobs.append((chunk_head, docs[start:end], 0, end - start, assets, chunk_path))
+
+        if processes < 2:
+            for job in jobs:
+                _render_pdf_chunk(*job)
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                for future in [pool.submit(_render_pdf_chunk, *job) for job in jobs]:
+                    future.result()
+
+        page_count = _merge_pdf_chunks(chunk_paths, output_path, html_attrs)
+        logger.info(
+            f"⚡ Rendered {len(chunks)} chapter groups across {processes} processes "
+            f"into {page_count} pages in {time.perf_counter() - started:.1f}s"
+        )
+    finally:
+        for chunk_path in chunk_paths:
+            if os.path.exists(chunk_path):
+                os.remove(chunk_path)
+
+
+def _plan_chunks(docs, max_chars: int) -> List[Tuple[int, int]]:
+    """Split documents into consecutive groups of about max_chars characters.
+
+    Returns (start, end) per group.
+    """
+    chunks = []
+    start, chars = 0, 0
+    for i, doc in enumerate(docs):
+        content = doc.get('content', '')
+        if i > start and chars + len(content) > max_chars:
+            chunks.append((start, i))
+            start, chars = i, 0
+        chars += len(content)
+    if len(docs) > start:
+        chunks.append((start, len(docs)))
+    return chunks
+
+
+def _render_pdf_chunk(html_head: str, docs, start: int, end: int, assets: Optional[EPUBAssets], output_path: str):
+    """Render documents[start:end] to a PDF (in a worker process for chapter groups).
+
+    Image URLs resolve against the first document's directory and are read
+    from the EPUB zip by the assets' url_fetcher as WeasyPrint lays them out.
+    """
+    from weasyprint import HTML
+
+    chunk_docs = docs[start:end]
+    combined_html = _combine_documents(chunk_docs)
+
+    # Generate PDF
+    if assets is not None and chunk_docs:
+        html_obj = HTML(
+            string=f"{html_head}{combined_html}{HTML_TAIL}",
+            base_url=assets.base_url(chunk_docs[0].get('href', '')),
+            url_fetcher=assets.url_fetcher()
+        )
+    else:
+        html_obj = HTML(string=f"{html_head}{combined_html}{HTML_TAIL}")
+    html_obj.write_pdf(
+        output_path,
+        font_config=_get_font_config()
+    )
+
+
+def _merge_pdf_chunks(chunk_paths: List[str], output_path: str, html_attrs: str) -> int:
+    """Concatenate chapter-group PDFs (with their outlines) and number the pages.
+
+    Returns:
+        Number of pages in the merged PDF
+    """
+    writer = PdfWriter()
+    for chunk_path in chunk_paths:
+        # Appends the pages and the group's outline (bookmarks), pointing at the new pages
+        writer.append(chunk_path)
+
+    page_count = len(writer.pages)
+    numbers = PdfReader(io.BytesIO(_render_page_numbers(page_count, html_attrs)))
+    if len(numbers.pages) == page_count:
+        for page, number_page in zip(writer.pages, numbers.pages):
+            page.merge_page(number_page)
+    else:
+        logger.warning(f"Page number overlay has {len(numbers.pages)} pages for {page_count} - PDF left unnumbered")
+
+    with open(output_path, "wb") as f:
+        writer.write(f)
+    return page_count
+
+
+def _render_page_numbers(page_count: int, html_attrs: str) -> bytes:
+    """A PDF of page_count blank pages carrying only the page numbers (same @page rule)."""
+    from weasyprint import HTML
+
+    pages = CHAPTER_BREAK * (page_count - 1)
+    return HTML(string=(
+        f'<!DOCTYPE html>\n<html{html_attrs}>\n<head>\n<meta charset="UTF-8">\n'
+        f'<style>\n{PAGE_CSS}\n</style>\n</head>\n<body>{pages}</body>\n</html>'
+    )).write_pdf()
+
 
 def convert_bilingual_html_to_pdf(
     bilingual_docs: List[dict],
@@ -31,7 +235,8 @@ def convert_bilingual_html_to_pdf(
     output_path: str,
     source_lang: str = "en",
     target_lang: str = "es",
-    original_book = None
+    epub_path: Optional[str] = None,
+    max_processes: Optional[int] = None
 ) -> bool:
     """
     Convert bilingual HTML documents to PDF with preserved CSS styling.
@@ -46,92 +251,23 @@ def convert_bilingual_html_to_pdf(
         output_path: Path where PDF should be written
         source_lang: Source language code (default: "en")
         target_lang: Target language code (default: "es")
-        original_book: Optional EpubBook object for extracting images
+        epub_path: Optional path of the input EPUB, whose images are rendered
+        max_processes: Processes for rendering a large book's chapter groups
 
     Returns:
         True if conversion succeeded, False otherwise
     """
     try:
-        from weasyprint import HTML, CSS
-        from weasyprint.text.fonts import FontConfiguration
+        import weasyprint  # noqa: F401
     except ImportError:
         logger.error("WeasyPrint not available - cannot generate PDF from HTML")
         return False
 
     try:
-        import base64
-        import re
-        import ebooklib
-
         logger.info(f"Converting {len(bilingual_docs)} bilingual documents to PDF")
 
-        # Extract images from EPUB as base64 data URIs (if original_book provided)
-        image_map = {}
-        if original_book:
-            logger.info("Extracting images from EPUB...")
-            for item in original_book.get_items():
-                if item.get_type() == ebooklib.ITEM_IMAGE:
-                    try:
-                        img_path = item.get_name()
-                        img_content = item.get_content()
-
-                        # Determine MIME type
-                        ext = img_path.lower().split('.')[-1]
-                        mime_types = {
-                            'jpg': 'image/jpeg', 'jpeg': 'image/jpeg',
-                            'png': 'image/png', 'gif': 'image/gif',
-                            'svg': 'image/svg+xml', 'webp': 'image/webp'
-                        }
-                        mime_type = mime_types.get(ext, 'image/jpeg')
-
-                        # Encode as base64 data URI
-                        img_base64 = base64.b64encode(img_content).decode('utf-8')
-                        data_uri = f"data:{mime_type};base64,{img_base64}"
-
-                        # Store with multiple path variations for matching
-                        image_map[img_path] = data_uri
-                        image_map[img_path.lstrip('/')] = data_uri
-                        image_map[img_path.lstrip('../')] = data_uri
-                        image_map[os.path.basename(img_path)] = data_uri
-
-                    except Exception as e:
-                        logger.warning(f"Failed to extract image {item.get_name()}: {e}")
-
-            logger.info(f"Extracted {len(set(image_map.values()))} unique images")
-
-        # Combine all document contents and replace image sources
-        combined_html_parts = []
-
-        for i, doc in enumerate(bilingual_docs):
-            content = doc.get('content', '')
-
-            # Replace image src attributes with base64 data URIs
-            if image_map:
-                def replace_img_src(match):
-                    img_tag = match.group(0)
-                    src_match = re.search(r'src=(?:"([^"]*)"|\'([^\']*)\')', img_tag, re.IGNORECASE)
-                    if not src_match:
-                        return img_tag
-
-                    src = src_match.group(1) or src_match.group(2)
-
-                    # Try different path variations
-                    for variant in [src, src.lstrip('/'), src.lstrip('../'), os.path.basename(src)]:
-                        if variant in image_map:
-                            data_uri = image_map[variant]
-                            return img_tag.replace(f'src="{src}"', f'src="{data_uri}"').replace(f"src='{src}'", f"src='{data_uri}'")
-
-                    return img_tag
-
-                content = re.sub(r'<img[^>]*>', replace_img_src, content, flags=re.IGNORECASE)
-
-            # Add page break between chapters (except first)
-            if i > 0:
-                combined_html_parts.append('<div style="page-break-before: always;"></div>')
-
-            combined_html_parts.append(content)
-
-        combined_html = '\n'.join(combined_html_parts)
+        # Index the EPUB's images; they are read from the zip while rendering
+        assets = EPUBAssets(epub_path) if epub_path else None
 
         # Determine if RTL language
         rtl_languages = {'ar', 'he', 'fa', 'ur'}
@@ -143,8 +279,8 @@ def convert_bilingual_html_to_pdf(
         direction_css = 'rtl' if is_rtl else 'ltr'
         text_align = 'right' if is_rtl else 'left'
 
-        # Create complete HTML document with CSS
-        full_html = f"""<!DOCTYPE html>
+        # Complete HTML document with CSS (the documents go in the body)
+        html_head = f"""<!DOCTYPE html>
 <html{lang_attr}{dir_attr}>
 <head>
     <meta charset="UTF-8">
@@ -153,15 +289,7 @@ def convert_bilingual_html_to_pdf(
         {css_content}
 
         /* PDF-specific enhancements */
-        @page {{
-            size: A4;
-            margin: 1.5cm 2cm;  /* Top/bottom: 1.5cm, Left/right: 2cm */
-            @bottom-center {{
-                content: counter(page);
-                font-size: 10pt;
-                color: #666;
-            }}
-        }}
+{PAGE_CSS}
 
         body {{
             font-family: 'Times New Roman', 'Georgia', 'Garamond', serif;
@@ -210,22 +338,12 @@ def convert_bilingual_html_to_pdf(
     </style>
 </head>
 <body>
-{combined_html}
-</body>
-</html>"""
+"""
 
         # Convert HTML to PDF using WeasyPrint
         logger.info("Rendering HTML to PDF with WeasyPrint...")
 
-        # Create font configuration for better font rendering
-        font_config = FontConfiguration()
-
-        # Generate PDF
-        html_obj = HTML(string=full_html)
-        html_obj.write_pdf(
-            output_path,
-            font_config=font_config
-        )
+        _write_pdf(bilingual_docs, html_head, output_path, assets, f"{lang_attr}{dir_attr}", max_processes)
 
         # Check file was created
         if os.path.exists(output_path):
@@ -314,7 +432,7 @@ def test_bilingual_pdf():
         output_path=str(output_path),
         source_lang="en",
         target_lang="es",
-        original_book=original_book
+        epub_path=str(sample_book)
     )
 
     if success:
@@ -342,7 +460,8 @@ def convert_html_to_pdf(
     css_content: str,
     output_path: str,
     target_lang: str = "es",
-    original_book = None
+    epub_path: Optional[str] = None,
+    max_processes: Optional[int] = None
 ) -> bool:
     """
     Convert regular (non-bilingual) translation HTML to PDF with WeasyPrint.
@@ -354,92 +473,23 @@ def convert_html_to_pdf(
         css_content: CSS content to apply (original EPUB CSS)
         output_path: Path where PDF should be written
         target_lang: Target language code (default: "es")
-        original_book: Optional EpubBook object for extracting images
+        epub_path: Optional path of the input EPUB, whose images are rendered
+        max_processes: Processes for rendering a large book's chapter groups
 
     Returns:
         True if conversion succeeded, False otherwise
     """
     try:
-        from weasyprint import HTML, CSS
-        from weasyprint.text.fonts import FontConfiguration
+        import weasyprint  # noqa: F401
     except ImportError:
         logger.error("WeasyPrint not available - cannot generate PDF from HTML")
         return False
 
     try:
-        import base64
-        import re
-        import ebooklib
-
         logger.info(f"Converting {len(translated_docs)} translated documents to PDF")
 
-        # Extract images from EPUB as base64 data URIs (if original_book provided)
-        image_map = {}
-        if original_book:
-            logger.info("Extracting images from EPUB...")
-            for item in original_book.get_items():
-                if item.get_type() == ebooklib.ITEM_IMAGE:
-                    try:
-                        img_path = item.get_name()
-                        img_content = item.get_content()
-
-                        # Determine MIME type
-                        ext = img_path.lower().split('.')[-1]
-                        mime_types = {
-                            'jpg': 'image/jpeg', 'jpeg': 'image/jpeg',
-                            'png': 'image/png', 'gif': 'image/gif',
-                            'svg': 'image/svg+xml', 'webp': 'image/webp'
-                        }
-                        mime_type = mime_types.get(ext, 'image/jpeg')
-
-                        # Encode as base64 data URI
-                        img_base64 = base64.b64encode(img_content).decode('utf-8')
-                        data_uri = f"data:{mime_type};base64,{img_base64}"
-
-                        # Store with multiple path variations for matching
-                        image_map[img_path] = data_uri
-                        image_map[img_path.lstrip('/')] = data_uri
-                        image_map[img_path.lstrip('../')] = data_uri
-                        image_map[os.path.basename(img_path)] = data_uri
-
-                    except Exception as e:
-                        logger.warning(f"Failed to extract image {item.get_name()}: {e}")
-
-            logger.info(f"Extracted {len(set(image_map.values()))} unique images")
-
-        # Combine all document contents and replace image sources
-        combined_html_parts = []
-
-        for i, doc in enumerate(translated_docs):
-            content = doc.get('content', '')
-
-            # Replace image src attributes with base64 data URIs
-            if image_map:
-                def replace_img_src(match):
-                    img_tag = match.group(0)
-                    src_match = re.search(r'src=(?:"([^"]*)"|\'([^\']*)\')', img_tag, re.IGNORECASE)
-                    if not src_match:
-                        return img_tag
-
-                    src = src_match.group(1) or src_match.group(2)
-
-                    # Try different path variations
-                    for variant in [src, src.lstrip('/'), src.lstrip('../'), os.path.basename(src)]:
-                        if variant in image_map:
-                            data_uri = image_map[variant]
-                            return img_tag.replace(f'src="{src}"', f'src="{data_uri}"').replace(f"src='{src}'", f"src='{data_uri}'")
-
-                    return img_tag
-
-                content = re.sub(r'<img[^>]*>', replace_img_src, content, flags=re.IGNORECASE)
-
-            # Add page break between chapters (except first)
-            if i > 0:
-                combined_html_parts.append('<div style="page-break-before: always;"></div>')
-
-            combined_html_parts.append(content)
-
-        combined_html = '\n'.join(combined_html_parts)
+        # Index the EPUB's images; they are read from the zip while rendering
+        assets = EPUBAssets(epub_path) if epub_path else None
 
         # Determine if RTL language
         rtl_languages = {'ar', 'he', 'fa', 'ur'}
@@ -451,8 +501,8 @@ def convert_html_to_pdf(
         direction_css = 'rtl' if is_rtl else 'ltr'
         text_align = 'right' if is_rtl else 'left'
 
-        # Create complete HTML document with CSS
-        full_html = f"""<!DOCTYPE html>
+        # Complete HTML document with CSS (the documents go in the body)
+        html_head = f"""<!DOCTYPE html>
 <html{lang_attr}{dir_attr}>
 <head>
     <meta charset="UTF-8">
@@ -461,15 +511,7 @@ def convert_html_to_pdf(
         {css_content}
 
         /* PDF-specific enhancements */
-        @page {{
-            size: A4;
-            margin: 1.5cm 2cm;  /* Top/bottom: 1.5cm, Left/right: 2cm */
-            @bottom-center {{
-                content: counter(page);
-                font-size: 10pt;
-                color: #666;
-            }}
-        }}
+{PAGE_CSS}
 
         body {{
             font-family: 'Times New Roman', 'Georgia', 'Garamond', serif;
@@ -506,22 +548,12 @@ def convert_html_to_pdf(
     </style>
 </head>
 <body>
-{combined_html}
-</body>
-</html>"""
+"""
 
         # Convert HTML to PDF using WeasyPrint
         logger.info("Rendering HTML to PDF with WeasyPrint...")
 
-        # Create font configuration for better font rendering
-        font_config = FontConfiguration()
-
-        # Generate PDF
-        html_obj = HTML(string=full_html)
-        html_obj.write_pdf(
-            output_path,
-            font_config=font_config
-        )
+        _write_pdf(translated_docs, html_head, output_path, assets, f"{lang_attr}{dir_attr}", max_processes)
 
         # Check file was created
         if os.path.exists(output_path):
@@ -10,6 +10,7 @@ from app.config import settings
 from app.logger import setup_logging, get_logger, set_request_id
 from app.db import create_tables
 from app.migrations import run_migrations
+from app.providers.factory import close_shared_providers
 from app.routes import health, presign, estimate, checkout, webhook, jobs, paypal, skip_payment, preview
 
 # Setup logging
@@ -149,6 +150,9 @@ async def shutdown_event():
     """Cleanup on application shutdown."""
     logger.info("Shutting down BookTranslator API")
 
+    # Close pooled provider HTTP connections (preview translations)
+    await close_shared_providers()
+
 
 @app.get("/")
 async def root():
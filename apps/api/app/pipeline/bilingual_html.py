@@ -9,6 +9,7 @@ This format provides the best reading experience across all formats
 """
 from typing import List, Dict
 
+from app.pipeline.document import get_document
 from app.logger import get_logger
 
 logger = get_logger(__name__)
@@ -140,8 +141,6 @@ def create_bilingual_documents(
     Returns:
         List of bilingual documents, one per original document
     """
-    from bs4 import BeautifulSoup, NavigableString
-
     bilingual_docs = []
 
     # Validate segment count alignment before processing
@@ -177,22 +176,9 @@ def create_bilingual_documents(
             orig_segs = orig_segs[:min_len]
             trans_segs = trans_segs[:min_len]
 
-        # Get original document
-        doc_idx = doc_map['doc_idx']
-        original_doc = spine_docs[doc_idx]
-        original_content = original_doc['content']
-
-        # Parse original document
-        soup = BeautifulSoup(original_content, 'lxml-xml', from_encoding='utf-8')
-
-        # Reconstruct with bilingual subtitles
-        reconstructed_html = _reconstruct_bilingual_html(
-            soup,
-            orig_segs,
-            trans_segs,
-            source_lang,
-            target_lang
-        )
+        # Splice translations and subtitles into the template from segmentation
+        template = doc_map.get('template') or get_document(spine_docs[doc_map['doc_idx']]).template
+        reconstructed_html = template.render_bilingual(orig_segs, trans_segs, source_lang)
 
         bilingual_docs.append({
             'id': doc_map['doc_id'],
@@ -208,92 +194,3 @@ def create_bilingual_documents(
 
     logger.info(f"Created {len(bilingual_docs)} bilingual documents")
     return bilingual_docs
-
-
-def _reconstruct_bilingual_html(
-    soup,
-    original_segments: List[str],
-    translated_segments: List[str],
-    source_lang: str,
-    target_lang: str
-) -> str:
-    """
-    Reconstruct HTML with bilingual content, preserving all original formatting.
-
-    For each text node:
-    1. Replace with translated text
-    2. Insert subtitle span with original text right after parent element
-    """
-    from bs4 import NavigableString, Tag
-
-    segment_idx = 0
-    no_translate_tags = {'pre', 'code', 'script', 'style', 'svg', 'image', 'img', 'a'}
-
-    # Track which elements we've processed to add subtitles
-    elements_to_subtitle = []
-
-    # First pass: Replace text with translations and mark elements for subtitles
-    for element in soup.find_all(string=True):
-        if isinstance(element, NavigableString) and element.strip():
-            parent = element.parent
-
-            # Skip non-translatable content
-            if _should_skip_element(parent, no_translate_tags):
-                continue
-
-            text = element.strip()
-            # Same criteria as segmentation
-            if (len(text) >= 3 and
-                not text.isdigit() and
-                text.lower() not in ['html', 'head', 'body', 'div', 'span'] and
-                segment_idx < len(translated_segments)):
-
-                # Replace with translation
-                element.replace_with(translated_segments[segment_idx])
-
-                # Mark parent for subtitle insertion
-                elements_to_subtitle.append({
-                    'parent': parent,
-                    'original': original_segments[segment_idx],
-                    'translation': translated_segments[segment_idx]
-                })
-
-                segment_idx += 1
-
-    # Second pass: Insert subtitle spans inside parent elements
-    # Subtitle is now display:block so it automatically appears on new line
-    for item in elements_to_subtitle:
-        try:
-            parent = item['parent']
-            original_text = item['original']
-
-            # Create subtitle span (display: block in CSS, so no <br> needed)
-            subtitle = soup.new_tag('span', attrs={
-                'class': 'bilingual-subtitle',
-                'lang': source_lang,
-                'xml:lang': source_lang
-            })
-            subtitle.string = original_text
-
-            # Simply append the subtitle - CSS will handle the line break
-            parent.append(subtitle)
-        except Exception as e:
-            logger.warning(f"Failed to add subtitle to element '{parent.name if hasattr(parent, 'name') else 'unknown'}': {e}")
-            continue  # Skip this subtitle but continue with others
-
-    return str(soup)
-
-
-def _should_skip_element(element, no_translate_tags: set) -> bool:
-    """Check if element content should be skipped for translation."""
-    if not element:
-        return True
-
-    # Check if element or any parent is in no-translate tags
-    current = element
-    while current:
-        if hasattr(current, 'name') and current.name in no_translate_tags:
-            return True
-        current = current.parent if hasattr(current, 'parent') else None
-
-    return False
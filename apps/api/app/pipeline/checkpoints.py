@@ -0,0 +1,127 @@
+"""Translation checkpoints for resumable jobs.
+
+Translated batches are written to a Redis hash per job as they complete
+(segment index -> translated text). When a job is re-run after the worker was
+killed or redeployed, or retried by RQ after a failure, the worker loads the
+checkpoint and only translates the segments that are missing. The hash is
+tied to a fingerprint of the book's segments so a checkpoint is never applied
+to a different segmentation.
+"""
+
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import redis
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TranslationCheckpointStore:
+    """Redis-backed per-job store of translated segments.
+
+    Checkpointing is best effort: Redis errors are logged and the job carries
+    on, it just cannot resume from the lost batches.
+    """
+
+    KEY_PREFIX = "job-checkpoint"
+    FINGERPRINT_FIELD = "fingerprint"
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        ttl_seconds: int = settings.checkpoint_ttl_seconds
+    ):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    def _get_client(self) -> redis.Redis:
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(
+                settings.redis_url, socket_connect_timeout=2, socket_timeout=5
+            )
+        return self.redis_client
+
+    def _make_key(self, job_id: str) -> str:
+        return f"{self.KEY_PREFIX}:{job_id}"
+
+    @staticmethod
+    def fingerprint(segments: List[str]) -> str:
+        """Fingerprint a book's segmentation."""
+        digest = hashlib.sha256()
+        for segment in segments:
+            digest.update(segment.encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def save(self, job_id: str, fingerprint: str, translations: Dict[int, str]):
+        """Persist translated segments for a job.
+
+        Args:
+            job_id: Job ID
+            fingerprint: Fingerprint of the job's segments
+            translations: Mapping of segment index to translation
+        """
+        if not translations:
+            return
+
+        key = self._make_key(job_id)
+        mapping = {str(i): translation for i, translation in translations.items()}
+        mapping[self.FINGERPRINT_FIELD] = fingerprint
+
+        try:
+            pipe = self._get_client().pipeline(transaction=False)
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, self.ttl_seconds)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to save translation checkpoint for job {job_id}: {e}")
+            return
+
+        logger.debug(f"Checkpointed {len(translations)} segments for job {job_id}")
+
+    def load(self, job_id: str, fingerprint: str) -> Dict[int, str]:
+        """Load a job's checkpointed segments.
+
+        Args:
+            job_id: Job ID
+            fingerprint: Fingerprint of the job's current segments
+
+        Returns:
+            Mapping of segment index to translation (empty if there is no
+            checkpoint or it belongs to a different segmentation)
+        """
+        try:
+            stored = self._get_client().hgetall(self._make_key(job_id))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to load translation checkpoint for job {job_id}: {e}")
+            return {}
+
+        if not stored:
+            return {}
+
+        stored = {field.decode("utf-8"): value.decode("utf-8") for field, value in stored.items()}
+        if stored.pop(self.FINGERPRINT_FIELD, None) != fingerprint:
+            logger.warning(f"Discarding checkpoint for job {job_id}: segmentation changed")
+            self.clear(job_id)
+            return {}
+
+        translations = {int(i): translation for i, translation in stored.items()}
+        logger.info(f"⏯️ Resuming job {job_id} from checkpoint: {len(translations)} segments already translated")
+        return translations
+
+    def clear(self, job_id: str):
+        """Delete a job's checkpoint (after the job has completed)."""
+        try:
+            self._get_client().delete(self._make_key(job_id))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to clear translation checkpoint for job {job_id}: {e}")
+
+
+@lru_cache()
+def get_checkpoint_store() -> TranslationCheckpointStore:
+    """Get the process-wide translation checkpoint store."""
+    return TranslationCheckpointStore()
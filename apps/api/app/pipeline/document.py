@@ -0,0 +1,417 @@
+"""Parsed spine documents shared by every pipeline stage.
+
+A spine document used to be parsed by BeautifulSoup once to sanitize it, again
+to segment it, again to reconstruct it, again for the bilingual edition and
+twice more while writing the EPUB. ParsedDocument parses it once in
+``EPUBProcessor.read_epub`` and keeps an index of its translatable text nodes;
+segmentation reads the index and also serializes the document once as a
+DocumentTemplate, with a slot at each indexed node. Reconstruction splices
+translations into the template's slots, so rendering never walks or
+re-parses the tree and always uses the same node index as segmentation.
+
+In block mode (``set_block_tags``) a block element whose content is text and
+inline markup only (e.g. ``<p>He <em>never</em> said so.</p>``) is indexed as
+one unit instead of one per text node: its segment carries the inline tags,
+which PlaceholderManager protects as {TAG_n} placeholders, and its slot is
+the block's whole content.
+"""
+
+import re
+from typing import Dict, List, Optional, Set, Union
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+from bs4.dammit import EntitySubstitution
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Tags whose text is never translated (preserve content)
+# Note: 'table' is not listed so TOC and other table content is translated
+NO_TRANSLATE_TAGS = {'pre', 'code', 'script', 'style', 'svg', 'image', 'img', 'a'}
+
+# Text that is really an HTML artifact rather than content
+SKIPPED_TEXTS = {'html', 'head', 'body', 'div', 'span'}
+
+
+def is_translatable_text(text: str) -> bool:
+    """Check whether stripped node text is worth translating (3+ chars, not a number)."""
+    return len(text) >= 3 and not text.isdigit() and text.lower() not in SKIPPED_TEXTS
+
+
+class ParsedDocument:
+    """One XHTML spine document, parsed once, with its translatable text nodes."""
+
+    PARSER = 'lxml-xml'
+
+    def __init__(self, soup: BeautifulSoup):
+        self.soup = soup
+        self.block_tags: Optional[Set[str]] = None
+        self._text_nodes: Optional[List[Union[NavigableString, Tag]]] = None
+        self._positions: List[int] = []
+        self._template: Optional[DocumentTemplate] = None
+
+    @classmethod
+    def parse(cls, content: str) -> "ParsedDocument":
+        return cls(BeautifulSoup(content, cls.PARSER))
+
+    def sanitize(self):
+        """Remove script tags and event handler attributes."""
+        for script in self.soup.find_all('script'):
+            script.decompose()
+
+        for tag in self.soup.find_all():
+            attrs_to_remove = [attr for attr in tag.attrs if attr.startswith('on')]
+            for attr in attrs_to_remove:
+                del tag[attr]
+
+        self._text_nodes = None
+        self._template = None
+
+    def set_block_tags(self, block_tags: Optional[Set[str]]):
+        """Coalesce block elements with these tag names into single units (None: off)."""
+        if block_tags != self.block_tags:
+            self.block_tags = block_tags
+            self._text_nodes = None
+            self._template = None
+
+    @property
+    def text_nodes(self) -> List[Union[NavigableString, Tag]]:
+        """Translatable text nodes in document order (built on first use).
+
+        In block mode, coalesced block elements take the place of their text nodes.
+        """
+        if self._text_nodes is None:
+            self._index_text_nodes()
+        return self._text_nodes
+
+    def _index_text_nodes(self):
+        """Collect translatable text nodes and their child positions in one pass.
+
+        A depth-first walk carries an "inside a no-translate tag" flag down the
+        tree instead of checking every node's ancestors, so the cost is linear
+        in the size of the document however deeply it is nested. The walk
+        uses an explicit stack (no recursion limit) and visits nodes in the
+        same order as find_all(string=True).
+
+        Positions (index within the parent's contents) let the template swaps
+        avoid bs4's linear Tag.index() scan; swaps are one-for-one, so they
+        stay valid.
+        """
+        nodes = []
+        positions = []
+        # (children, next child index, inside a no-translate tag)
+        stack = [[self.soup.contents, 0, False]]
+        while stack:
+            frame = stack[-1]
+            children, position, skipped = frame
+            if position >= len(children):
+                stack.pop()
+                continue
+            frame[1] = position + 1
+
+            child = children[position]
+            if isinstance(child, NavigableString):
+                if not skipped and is_translatable_text(child.strip()):
+                    nodes.append(child)
+                    positions.append(position)
+            elif not skipped and self.block_tags and child.name in self.block_tags and self._is_coalescable(child):
+                nodes.append(child)
+                positions.append(position)
+            else:
+                stack.append([child.contents, 0, skipped or child.name in NO_TRANSLATE_TAGS])
+
+        self._text_nodes = nodes
+        self._positions = positions
+
+    def _is_coalescable(self, block: Tag) -> bool:
+        """Check whether a block holds translatable text and inline markup only.
+
+        Nested blocks, no-translate tags (links, images, code), comments and
+        text containing angle brackets (which would read as placeholder tags)
+        keep the block's text nodes as separate segments.
+        """
+        has_inline = False
+        translatable = False
+        for descendant in block.descendants:
+            if isinstance(descendant, Tag):
+                if descendant.name in self.block_tags or descendant.name in NO_TRANSLATE_TAGS:
+                    return False
+                has_inline = True
+            elif type(descendant) is not NavigableString or '<' in descendant or '>' in descendant:
+                return False
+            elif not translatable:
+                translatable = is_translatable_text(descendant.strip())
+        return has_inline and translatable
+
+    @property
+    def segments(self) -> List[str]:
+        """Stripped text of each translatable node (inline markup for coalesced blocks)."""
+        return [
+            _inline_markup(node).strip() if isinstance(node, Tag) else node.strip()
+            for node in self.text_nodes
+        ]
+
+    def serialize(self) -> str:
+        return str(self.soup)
+
+    @property
+    def template(self) -> "DocumentTemplate":
+        """The document serialized with a slot per text node (built on first use)."""
+        if self._template is None:
+            self._template = self._build_template()
+        return self._template
+
+    def _build_template(self) -> "DocumentTemplate":
+        """Serialize once with sentinels in place of the text nodes.
+
+        Each text node is swapped for a text slot, each parent of a text node
+        gets a trailing subtitle slot (where bilingual subtitles are appended)
+        and the root's dir attribute becomes a slot; the tree is restored
+        afterwards. A coalesced block's content is bracketed by begin/end
+        sentinels instead and the block itself gets the subtitle slot.
+        """
+        nodes = self.text_nodes
+        # Block outputs are the serialized content between their sentinels
+        node_outputs = [None if isinstance(node, Tag) else node.output_ready('minimal') for node in nodes]
+        markup_tags = {
+            i: sorted(_TAG_TOKEN.findall(segment))
+            for i, (node, segment) in enumerate(zip(nodes, self.segments))
+            if isinstance(node, Tag)
+        }
+
+        parent_slots: Dict[int, int] = {}
+        subtitle_segments: List[List[int]] = []
+        markers = []
+        for i, node in enumerate(nodes):
+            if isinstance(node, Tag):
+                container = node
+                node.insert(0, NavigableString(f"\x00B{i}\x00"))
+                markers.append((node.contents[0], 0))
+                node.append(NavigableString(f"\x00E{i}\x00"))
+                markers.append((node.contents[-1], len(node.contents) - 1))
+            else:
+                container = node.parent
+            slot = parent_slots.get(id(container))
+            if slot is None:
+                slot = len(subtitle_segments)
+                parent_slots[id(container)] = slot
+                subtitle_segments.append([])
+                marker = NavigableString(f"\x00S{slot}\x00")
+                container.append(marker)
+                markers.append((marker, len(container.contents) - 1))
+            subtitle_segments[slot].append(i)
+
+        replaced = []
+        for i, (node, position) in enumerate(zip(nodes, self._positions)):
+            if isinstance(node, Tag):
+                continue
+            sentinel = NavigableString(f"\x00T{i}\x00")
+            self._swap(node, sentinel, position)
+            replaced.append((node, sentinel, position))
+
+        root = self.soup.find('html') or self.soup.find('body')
+        original_dir = root.get('dir') if root else None
+        if root:
+            root['dir'] = _DIR_SENTINEL
+
+        try:
+            serialized = self.serialize()
+        finally:
+            if root:
+                if original_dir is None:
+                    del root['dir']
+                else:
+                    root['dir'] = original_dir
+            for node, sentinel, position in replaced:
+                self._swap(sentinel, node, position)
+            # Newest first, so each marker is still at its recorded position
+            for marker, position in reversed(markers):
+                marker.extract(_self_index=position)
+
+        return DocumentTemplate(serialized, node_outputs, subtitle_segments, original_dir, markup_tags)
+
+    @staticmethod
+    def _swap(old_node: NavigableString, new_node: NavigableString, position: int):
+        parent = old_node.parent
+        old_node.extract(_self_index=position)
+        parent.insert(position, new_node)
+
+
+_DIR_SENTINEL = "\x00D\x00"
+# NUL cannot occur in parsed XML, so sentinels never collide with content
+_SLOT_PATTERN = re.compile(r' dir="\x00D\x00"|\x00([TS])(\d+)\x00|\x00B(\d+)\x00(.*?)\x00E\3\x00', re.DOTALL)
+# Same as PlaceholderManager's 'tag' pattern, captured for splitting
+_TAG_TOKEN = re.compile(r'(<[^>]+>)')
+
+
+def _inline_markup(block: Tag) -> str:
+    """A block's content as raw text with its inline tags written out as markup."""
+    parts = []
+    for child in block.contents:
+        if isinstance(child, Tag):
+            if not child.contents:
+                parts.append(str(child))
+                continue
+            attrs = ''.join(
+                f' {key}={_attribute_value(value)}' for key, value in child.attrs.items()
+            )
+            parts.append(f'<{child.name}{attrs}>{_inline_markup(child)}</{child.name}>')
+        else:
+            parts.append(str(child))
+    return ''.join(parts)
+
+
+def _attribute_value(value) -> str:
+    if isinstance(value, list):
+        value = ' '.join(value)
+    return EntitySubstitution.quoted_attribute_value(EntitySubstitution.substitute_xml(value))
+
+
+def _render_markup(translation: str, expected_tags: List[str]) -> str:
+    """Escape a coalesced block's translation, keeping its inline tags.
+
+    If the translation does not carry exactly the block's tags, properly
+    nested, the tags are dropped rather than risk malformed XHTML.
+    """
+    pieces = _TAG_TOKEN.split(translation)
+    tags = pieces[1::2]
+    if sorted(tags) != expected_tags or not _tags_nested(tags):
+        logger.warning(f"Inline tags did not survive translation, dropping them: {translation[:80]!r}")
+        return EntitySubstitution.substitute_xml(''.join(pieces[0::2]))
+    pieces[0::2] = [EntitySubstitution.substitute_xml(piece) for piece in pieces[0::2]]
+    return ''.join(pieces)
+
+
+def _tags_nested(tags: List[str]) -> bool:
+    open_tags = []
+    for tag in tags:
+        if tag.endswith('/>'):
+            continue
+        if tag.startswith('</'):
+            if not open_tags or open_tags.pop() != tag[2:-1].strip():
+                return False
+        else:
+            open_tags.append(tag[1:-1].split()[0])
+    return not open_tags
+
+
+class DocumentTemplate:
+    """A serialized document with slots for translated text.
+
+    ``chunks`` holds the literal XHTML between slots and ``slots`` what goes
+    in each gap: ('T', i) text node i, ('S', j) the bilingual subtitles of
+    the j-th parent element, ('D', None) the root's dir attribute. Rendering
+    is a single join, with text escaped exactly as bs4 serializes it.
+    ``markup_tags`` lists the inline tags of each coalesced block's segment,
+    which are kept unescaped.
+    """
+
+    def __init__(
+        self,
+        serialized: str,
+        node_outputs: List[Optional[str]],
+        subtitle_segments: List[List[int]],
+        original_dir: Optional[str],
+        markup_tags: Optional[Dict[int, List[str]]] = None
+    ):
+        self.chunks: List[str] = []
+        self.slots: List[tuple] = []
+        last = 0
+        for match in _SLOT_PATTERN.finditer(serialized):
+            self.chunks.append(serialized[last:match.start()])
+            if match.group(1):
+                self.slots.append((match.group(1), int(match.group(2))))
+            elif match.group(3):
+                # A coalesced block: its original content is what the slot replaces
+                self.slots.append(('T', int(match.group(3))))
+                node_outputs[int(match.group(3))] = match.group(4)
+            else:
+                self.slots.append(('D', None))
+            last = match.end()
+        self.chunks.append(serialized[last:])
+
+        self.node_outputs = node_outputs
+        self.subtitle_segments = subtitle_segments
+        self.markup_tags = markup_tags or {}
+        self.original_dir = (
+            f' dir={EntitySubstitution.quoted_attribute_value(EntitySubstitution.substitute_xml(original_dir))}'
+            if original_dir is not None else ''
+        )
+
+    def render(self, translations: List[str], rtl: bool = False) -> str:
+        """Render the document with its text nodes replaced by translations.
+
+        Args:
+            translations: Translations aligned with the document's segments
+                (extra nodes keep their original text)
+            rtl: Set dir="rtl" on the root element
+
+        Returns:
+            Translated XHTML
+        """
+        return self._render(translations, rtl=rtl)
+
+    def render_bilingual(
+        self,
+        originals: List[str],
+        translations: List[str],
+        source_lang: str
+    ) -> str:
+        """Render the document with translations and the originals as subtitles.
+
+        Each translated node's parent gets a ``bilingual-subtitle`` span with
+        the source text appended (display: block in the bilingual CSS).
+        Coalesced blocks keep their original inline markup in the subtitle.
+        """
+        lang = EntitySubstitution.substitute_xml(source_lang)
+        subtitles = [
+            f'<span class="bilingual-subtitle" lang="{lang}" xml:lang="{lang}">'
+            f'{self.node_outputs[i] if i in self.markup_tags else EntitySubstitution.substitute_xml(original)}</span>'
+            for i, original in enumerate(originals[:len(translations)])
+        ]
+        return self._render(translations, subtitles=subtitles)
+
+    def _render(
+        self,
+        translations: List[str],
+        rtl: bool = False,
+        subtitles: Optional[List[str]] = None
+    ) -> str:
+        escape = EntitySubstitution.substitute_xml
+        parts = [self.chunks[0]]
+        for (kind, value), chunk in zip(self.slots, self.chunks[1:]):
+            if kind == 'T':
+                if value >= len(translations):
+                    parts.append(self.node_outputs[value])
+                elif value in self.markup_tags:
+                    parts.append(_render_markup(translations[value], self.markup_tags[value]))
+                else:
+                    parts.append(escape(translations[value]))
+            elif kind == 'S':
+                if subtitles:
+                    parts.extend(subtitles[i] for i in self.subtitle_segments[value] if i < len(subtitles))
+            else:
+                parts.append(' dir="rtl"' if rtl else self.original_dir)
+            parts.append(chunk)
+        return ''.join(parts)
+
+
+def get_document(doc: Dict, cache: bool = True) -> ParsedDocument:
+    """Get the parsed document of a spine document dict, parsing it if needed.
+
+    Documents from ``read_epub`` carry their ParsedDocument; derived dicts
+    (e.g. truncated preview documents) are parsed once and cached on the dict
+    unless ``cache`` is False. Documents read with ``parse_documents=False``
+    are sanitized on first parse.
+    """
+    document = doc.get('document')
+    if document is None:
+        document = ParsedDocument.parse(doc['content'])
+        if doc.get('sanitized') is False:
+            document.sanitize()
+            doc['content'] = document.serialize()
+            doc['sanitized'] = True
+        if cache:
+            doc['document'] = document
+    return document
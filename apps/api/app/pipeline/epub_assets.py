@@ -0,0 +1,156 @@
+"""Images served on demand from the input EPUB's zip.
+
+The PDF renderers used to base64-encode every image of the book into a map
+(each under four path variants) and rewrite every <img> tag of the combined
+HTML with a regex. EPUBAssets instead indexes the image members of the zip
+once by normalized path and reads an image's bytes only when WeasyPrint
+asks for it: documents are rendered with a base URL under ASSET_BASE_URL,
+so relative image paths resolve to URLs that ``url_fetcher`` serves from the
+zip, and the HTML is never rewritten.
+"""
+
+import posixpath
+import re
+import zipfile
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote, urlsplit
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Unresolvable host: only the asset fetcher serves URLs under it
+ASSET_BASE_URL = "https://epub.invalid/"
+
+IMAGE_MIME_TYPES = {
+    'jpg': 'image/jpeg', 'jpeg': 'image/jpeg',
+    'png': 'image/png', 'gif': 'image/gif',
+    'svg': 'image/svg+xml', 'webp': 'image/webp'
+}
+
+_ROOTFILE = re.compile(r'<rootfile[^>]*full-path="([^"]+)"')
+
+
+class EPUBAssets:
+    """Index of the images in an EPUB zip, read on demand.
+
+    Images are looked up by their path relative to the OPF file (how spine
+    documents and their hrefs refer to them), by their full path in the zip
+    and, as a last resort, by file name. The zip is opened lazily and the
+    object pickles as its path and index, so PDF render processes open
+    their own handle.
+    """
+
+    def __init__(self, epub_path: str):
+        self.epub_path = epub_path
+        self._zip: Optional[zipfile.ZipFile] = None
+        self.index: Dict[str, str] = {}
+        self._by_name: Dict[str, str] = {}
+
+        opf_dir = posixpath.dirname(opf_path(self.zip))
+        for member in self.zip.namelist():
+            if _mime_type(member) is None:
+                continue
+            self.index[member] = member
+            if opf_dir and member.startswith(f"{opf_dir}/"):
+                self.index[member[len(opf_dir) + 1:]] = member
+            self._by_name.setdefault(posixpath.basename(member), member)
+
+        logger.info(f"Indexed {len(set(self.index.values()))} images in {epub_path}")
+
+    @property
+    def zip(self) -> zipfile.ZipFile:
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.epub_path)
+        return self._zip
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        state['_zip'] = None
+        return state
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+    def resolve(self, src: str, document_href: str = '') -> Optional[str]:
+        """Zip member of an image src as written in a document (None if unknown).
+
+        Args:
+            src: src/href value (relative to the document, may be URL-encoded)
+            document_href: href of the document the src appears in (OPF-relative)
+        """
+        path = unquote(urlsplit(src).path)
+        if not path.startswith('/'):
+            path = posixpath.join(posixpath.dirname(document_href), path)
+        path = posixpath.normpath(path).lstrip('/')
+        while path.startswith('../'):
+            path = path[3:]
+
+        member = self.index.get(path)
+        if member is None:
+            member = self._by_name.get(posixpath.basename(path))
+        return member
+
+    def read(self, src: str, document_href: str = '') -> Optional[Tuple[bytes, str]]:
+        """(bytes, MIME type) of an image src, or None if it is not in the EPUB."""
+        member = self.resolve(src, document_href)
+        if member is None:
+            return None
+        return self.zip.read(member), _mime_type(member)
+
+    def base_url(self, document_href: str = '') -> str:
+        """Base URL for rendering documents at document_href with url_fetcher."""
+        directory = posixpath.dirname(document_href)
+        return f"{ASSET_BASE_URL}{directory}/" if directory else ASSET_BASE_URL
+
+    def url_fetcher(self):
+        """A WeasyPrint url_fetcher serving ASSET_BASE_URL URLs from the zip.
+
+        Other URLs go to WeasyPrint's default fetcher. WeasyPrint 68+ takes a
+        URLFetcher instance, older versions a function returning a dict.
+        """
+        try:
+            from weasyprint.urls import URLFetcher, URLFetcherResponse
+        except ImportError:
+            from weasyprint import default_url_fetcher
+
+            def fetch(url, *args, **kwargs):
+                if not url.startswith(ASSET_BASE_URL):
+                    return default_url_fetcher(url, *args, **kwargs)
+                data, mime_type = self._fetch(url)
+                return {'string': data, 'mime_type': mime_type, 'redirected_url': url}
+
+            return fetch
+
+        assets = self
+
+        class EPUBURLFetcher(URLFetcher):
+            def fetch(self, url, headers=None):
+                if not url.startswith(ASSET_BASE_URL):
+                    return super().fetch(url, headers)
+                data, mime_type = assets._fetch(url)
+                return URLFetcherResponse(url, data, {'Content-Type': mime_type})
+
+        return EPUBURLFetcher()
+
+    def _fetch(self, url: str) -> Tuple[bytes, str]:
+        asset = self.read(url[len(ASSET_BASE_URL):])
+        if asset is None:
+            # WeasyPrint logs fetch errors and renders without the image
+            raise ValueError(f"Image not found in EPUB: {url}")
+        return asset
+
+
+def opf_path(epub_zip: zipfile.ZipFile) -> str:
+    """Path of the package (OPF) file in an EPUB zip, from META-INF/container.xml ('' if missing)."""
+    try:
+        match = _ROOTFILE.search(epub_zip.read('META-INF/container.xml').decode('utf-8', 'replace'))
+    except KeyError:
+        match = None
+    return match.group(1) if match else ''
+
+
+def _mime_type(path: str) -> Optional[str]:
+    return IMAGE_MIME_TYPES.get(path.rsplit('.', 1)[-1].lower()) if '.' in path else None
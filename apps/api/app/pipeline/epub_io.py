@@ -1,7 +1,10 @@
+import re
+import time
+import weakref
 import zipfile
 import tempfile
 import os
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 
 import ebooklib
@@ -9,10 +12,16 @@ from ebooklib import epub
 from bs4 import BeautifulSoup
 
 from app.config import settings
+from app.pipeline.document import ParsedDocument
+from app.pipeline.epub_writer import remember_source, write_book
 from app.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Combined CSS per book, extracted once (the EPUB writers, both PDFs and the
+# preview all ask for it)
+_book_css: "weakref.WeakKeyDictionary[epub.EpubBook, str]" = weakref.WeakKeyDictionary()
+
 
 class EPUBProcessor:
     """EPUB reader/writer with validation and security checks."""
@@ -51,8 +60,25 @@ class EPUBProcessor:
             logger.error(f"EPUB validation failed: {e}")
             return False
     
-    def read_epub(self, epub_path: str) -> Tuple[epub.EpubBook, List[Dict]]:
-        """Read EPUB and extract spine documents."""
+    def read_epub(
+        self,
+        epub_path: str,
+        parse_documents: bool = True,
+        load_content: bool = True
+    ) -> Tuple[epub.EpubBook, List[Dict]]:
+        """Read EPUB and extract spine documents.
+
+        Args:
+            epub_path: Path to the EPUB file
+            parse_documents: Parse and sanitize each document now. When False
+                the raw XHTML is returned with 'sanitized': False and is
+                sanitized when first parsed (HTMLSegmenter.segment_documents
+                does this in a process pool for large books)
+            load_content: Decode each document's XHTML now. When False
+                'content' is None and 'size' holds the XHTML's size in bytes;
+                the content is read when needed with SpineContentReader
+                (implies parse_documents=False)
+        """
         
         # Validate safety first
         if not self.validate_epub_safety(epub_path):
@@ -60,6 +86,7 @@ class EPUBProcessor:
         
         try:
             book = epub.read_epub(epub_path)
+            remember_source(book, epub_path)
             spine_docs = []
             
             # Extract spine documents in order
@@ -69,17 +96,32 @@ class EPUBProcessor:
                 
                 item = book.get_item_with_id(item_id)
                 if item and item.get_type() == ebooklib.ITEM_DOCUMENT:
-                    content = item.get_content().decode('utf-8', errors='ignore')
-                    
-                    # Sanitize content
-                    content = self._sanitize_xhtml(content)
-                    
-                    spine_docs.append({
+                    doc = {
                         'id': item_id,
                         'href': item.get_name(),
-                        'content': content,
+                        'content': None,
+                        'document': None,
                         'title': getattr(item, 'title', item_id)
-                    })
+                    }
+
+                    if not load_content:
+                        doc['size'] = len(item.content or b'')
+                        doc['sanitized'] = False
+                        spine_docs.append(doc)
+                        continue
+
+                    content = item.get_content().decode('utf-8', errors='ignore')
+                    doc['content'] = content
+
+                    if parse_documents:
+                        # Parse once and sanitize; later stages reuse the parsed document
+                        doc['document'] = self._parse_document(content)
+                        if doc['document']:
+                            doc['content'] = doc['document'].serialize()
+                    else:
+                        doc['sanitized'] = False
+                    
+                    spine_docs.append(doc)
             
             logger.info(f"Read EPUB with {len(spine_docs)} spine documents")
             return book, spine_docs
@@ -88,28 +130,16 @@ class EPUBProcessor:
             logger.error(f"Failed to read EPUB: {e}")
             raise
     
-    def _sanitize_xhtml(self, content: str) -> str:
-        """Sanitize XHTML content for security."""
+    def _parse_document(self, content: str) -> Optional[ParsedDocument]:
+        """Parse and sanitize XHTML content for security."""
         try:
-            # Parse with BeautifulSoup
-            soup = BeautifulSoup(content, 'xml')
-            
-            # Remove script tags and event handlers
-            for script in soup.find_all('script'):
-                script.decompose()
-            
-            # Remove event attributes (onclick, onload, etc.)
-            for tag in soup.find_all():
-                attrs_to_remove = [attr for attr in tag.attrs if attr.startswith('on')]
-                for attr in attrs_to_remove:
-                    del tag[attr]
-            
-            # Ensure UTF-8 encoding
-            return str(soup)
+            document = ParsedDocument.parse(content)
+            document.sanitize()
+            return document
             
         except Exception as e:
             logger.warning(f"Failed to sanitize XHTML, using original: {e}")
-            return content
+            return None
     
     def write_epub(
         self,
@@ -184,8 +214,8 @@ class EPUBProcessor:
             # Update navigation and table of contents
             self._update_navigation(original_book, new_book, spine, translated_docs, href_mapping)
             
-            # Write EPUB
-            epub.write_epub(output_path, new_book)
+            # Write EPUB (unchanged images, fonts and CSS are copied from the original zip)
+            write_book(output_path, new_book, original_book)
             
             logger.info(f"Successfully wrote translated EPUB to {output_path}")
             return True
@@ -304,8 +334,8 @@ class EPUBProcessor:
             if not has_nav:
                 new_book.add_item(epub.EpubNav())
 
-            # Write EPUB
-            epub.write_epub(output_path, new_book)
+            # Write EPUB (unchanged images, fonts and CSS are copied from the original zip)
+            write_book(output_path, new_book, original_book)
 
             logger.info(f"Successfully wrote bilingual EPUB to {output_path}")
             return True
@@ -597,12 +627,19 @@ class EPUBProcessor:
     def extract_all_css_from_book(self, book: epub.EpubBook) -> str:
         """Extract and combine all CSS stylesheets from EPUB.
 
+        The result is cached per book object.
+
         Args:
             book: EbookLib Book object
 
         Returns:
             Combined CSS content from all stylesheets
         """
+        cached = _book_css.get(book)
+        if cached is not None:
+            return cached
+
+        started = time.perf_counter()
         css_content = []
         for item in book.get_items():
             if item.get_type() == ebooklib.ITEM_STYLE:
@@ -612,7 +649,13 @@ class EPUBProcessor:
                 except Exception as e:
                     logger.warning(f"Failed to extract CSS from {item.get_name()}: {e}")
 
-        return '\n\n'.join(css_content)
+        combined = '\n\n'.join(css_content)
+        _book_css[book] = combined
+        logger.info(
+            f"🎨 Extracted {len(css_content)} stylesheets ({len(combined):,} chars of CSS) "
+            f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+        )
+        return combined
 
     def _embed_css_in_html(self, html_content: str, css_content: str) -> str:
         """Embed CSS directly in HTML document's <head> section.
@@ -630,20 +673,6 @@ class EPUBProcessor:
             if not css_content:
                 return html_content
 
-            soup = BeautifulSoup(html_content, 'xml')
-
-            # Find or create head element
-            head = soup.find('head')
-            if not head:
-                # Create head if it doesn't exist
-                html_tag = soup.find('html')
-                if html_tag:
-                    head = soup.new_tag('head')
-                    html_tag.insert(0, head)
-                else:
-                    logger.warning("No <html> or <head> tag found, cannot embed CSS")
-                    return html_content
-
             # Use EXACT same CSS embedding as preview.py (lines 968-1008)
             # Just inject raw CSS text inside <style> tags - no BeautifulSoup manipulation
             enhanced_css = f"""{css_content}
@@ -665,19 +694,10 @@ img {{
             # Insert the style tag as raw HTML (same as preview does)
             style_html = f'<style type="text/css">\n{enhanced_css}\n</style>'
 
-            # Convert to string and inject style tag at start of head
-            html_str = str(soup)
-
-            # Find </head> closing tag and insert before it
-            head_close_pos = html_str.find('</head>')
-            if head_close_pos != -1:
-                html_str = html_str[:head_close_pos] + style_html + html_str[head_close_pos:]
-            else:
-                # Fallback: try to find <head> and insert after it
-                head_open_pos = html_str.find('<head>')
-                if head_open_pos != -1:
-                    insert_pos = html_str.find('>', head_open_pos) + 1
-                    html_str = html_str[:insert_pos] + style_html + html_str[insert_pos:]
+            html_str = _insert_into_head(html_content, style_html, at_start=False)
+            if html_str is None:
+                logger.warning("No <html> or <head> tag found, cannot embed CSS")
+                return html_content
 
             return html_str
 
@@ -696,25 +716,15 @@ img {{
             HTML with CSS link added
         """
         try:
-            soup = BeautifulSoup(html_content, 'xml')
-
-            # Find or create head element
-            head = soup.find('head')
-            if not head:
-                html_tag = soup.find('html')
-                if html_tag:
-                    head = soup.new_tag('head')
-                    html_tag.insert(0, head)
-                else:
-                    logger.warning("No <html> or <head> tag found, cannot add CSS link")
-                    return html_content
-
-            # Create link tag (EPUB standard format)
-            link_tag = soup.new_tag('link', rel='stylesheet', type='text/css', href=css_href)
-            head.insert(0, link_tag)
+            # Link tag (EPUB standard format) as the first child of <head>
+            link_html = f'<link href="{css_href}" rel="stylesheet" type="text/css"/>'
+            html_str = _insert_into_head(html_content, link_html, at_start=True)
+            if html_str is None:
+                logger.warning("No <html> or <head> tag found, cannot add CSS link")
+                return html_content
 
             logger.info(f"Added CSS link: {css_href}")
-            return str(soup)
+            return html_str
 
         except Exception as e:
             logger.error(f"Failed to add CSS link: {e}", exc_info=True)
@@ -726,6 +736,10 @@ img {{
             if not content or not isinstance(content, str):
                 return content
 
+            # Chapters keep their file names, so usually there is nothing to rewrite
+            if all(old_href == new_href for old_href, new_href in href_mapping.items()):
+                return content
+
             soup = BeautifulSoup(content, 'xml')
 
             # Update all anchor links
@@ -752,4 +766,54 @@ img {{
 
         except Exception as e:
             logger.warning(f"Failed to update internal links: {e}")
-            return content
\ No newline at end of file
+            return content
+
+
+_HEAD_OPEN = re.compile(r'<head(?:\s[^>]*)?>', re.IGNORECASE)
+_HEAD_EMPTY = re.compile(r'<head(?:\s[^>]*)?/>', re.IGNORECASE)
+_HTML_OPEN = re.compile(r'<html(?:\s[^>]*)?>', re.IGNORECASE)
+
+
+def _insert_into_head(html_str: str, markup: str, at_start: bool) -> Optional[str]:
+    """Insert markup into <head> by string splicing, without re-parsing the document.
+
+    Handles serialized empty heads (<head/>) and documents without a head
+    (one is created after <html>). Returns None if there is no <html> either.
+    """
+    empty_head = _HEAD_EMPTY.search(html_str)
+    if empty_head:
+        return (html_str[:empty_head.start()] + empty_head.group(0)[:-2] + '>' +
+                markup + '</head>' + html_str[empty_head.end():])
+
+    head_open = _HEAD_OPEN.search(html_str)
+    if head_open:
+        if not at_start:
+            head_close_pos = html_str.find('</head>', head_open.end())
+            if head_close_pos != -1:
+                return html_str[:head_close_pos] + markup + html_str[head_close_pos:]
+        return html_str[:head_open.end()] + markup + html_str[head_open.end():]
+
+    html_open = _HTML_OPEN.search(html_str)
+    if html_open:
+        return html_str[:html_open.end()] + '<head>' + markup + '</head>' + html_str[html_open.end():]
+
+    return None
+
+
+class SpineContentReader:
+    """Decodes spine documents' XHTML from the book on demand.
+
+    For spine documents read with ``load_content=False``: each document is
+    decoded only while it is segmented or assembled, so the worker never
+    holds a second copy of the whole book's XHTML. Reads go through the
+    ebooklib item rather than the raw zip member because ebooklib normalizes
+    documents on read, and segments must match the preview's and earlier
+    checkpoints' segmentation of the same book.
+    """
+
+    def __init__(self, book: epub.EpubBook):
+        self.book = book
+
+    def __call__(self, doc: Dict) -> str:
+        """Raw (unsanitized) XHTML of a spine document."""
+        return self.book.get_item_with_id(doc['id']).get_content().decode('utf-8', errors='ignore')
@@ -0,0 +1,293 @@
+"""EPUB writer that copies unchanged members from the input EPUB's zip.
+
+``epub.write_epub`` writes every item of a book, so the output EPUBs used to
+decompress and recompress all the images, fonts and stylesheets copied from
+the original book; for image-heavy books that was most of the CPU time of
+writing an EPUB. ZipCopyEpubWriter generates the same entries (ebooklib
+still builds the OPF, NCX and nav), but an item whose content is exactly the
+original zip member's (same size and CRC-32) is appended to the output as
+the member's compressed bytes, without decompressing or recompressing it.
+Only the rewritten documents, the package files and new items (e.g. the
+bilingual stylesheet) are compressed fresh.
+
+The writer finds the original zip through the book the items came from:
+books read with ``read_book`` (or ``EPUBProcessor.read_epub``) remember
+their source file.
+
+Copying compressed bytes isn't something ``zipfile.ZipFile`` supports
+publicly, so the output is written by EpubZipWriter, a small self-contained
+zip writer (local headers, central directory, end record; no zip64) rather
+than by patching ZipFile's private state.
+"""
+
+import posixpath
+import struct
+import time
+import weakref
+import zipfile
+import zlib
+from typing import BinaryIO, List, Optional, Tuple, Union
+
+from ebooklib import epub
+
+from app.logger import get_logger
+from app.pipeline.epub_assets import opf_path
+
+logger = get_logger(__name__)
+
+# Source EPUB file per book read from disk
+_book_sources: "weakref.WeakKeyDictionary[epub.EpubBook, str]" = weakref.WeakKeyDictionary()
+
+# Zip structures (APPNOTE.TXT 4.3.7, 4.3.12, 4.3.16)
+_LOCAL_HEADER = struct.Struct('<4sHHHHHIIIHH')
+_LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+_CENTRAL_HEADER = struct.Struct('<4sHHHHHHIIIHHHHHII')
+_CENTRAL_HEADER_SIGNATURE = b'PK\x01\x02'
+_END_RECORD = struct.Struct('<4sHHHHIIH')
+_END_RECORD_SIGNATURE = b'PK\x05\x06'
+
+_VERSION = 20  # 2.0: deflate, folders
+_MADE_BY = (3 << 8) | _VERSION  # Unix, like zipfile on Linux
+_UTF8_FLAG = 0x800
+_MAX_32 = 0xFFFFFFFF
+_MAX_16 = 0xFFFF
+_COPY_CHUNK = 1024 * 1024
+
+
+def read_book(epub_path: str) -> epub.EpubBook:
+    """Read an EPUB with ebooklib and remember its file for write_book."""
+    book = epub.read_epub(epub_path)
+    remember_source(book, epub_path)
+    return book
+
+
+def remember_source(book: epub.EpubBook, epub_path: str):
+    _book_sources[book] = epub_path
+
+
+def write_book(output_path: str, book: epub.EpubBook, original_book: Optional[epub.EpubBook] = None):
+    """Write book to output_path, copying members unchanged from original_book's zip.
+
+    Args:
+        output_path: Path of the EPUB to write
+        book: Book to write (as for epub.write_epub)
+        original_book: Book the unchanged items were copied from; without a
+            known source file every item is written fresh
+
+    Raises:
+        OSError, zipfile.BadZipFile: If the EPUB can't be written
+    """
+    source_path = _book_sources.get(original_book) if original_book is not None else None
+    writer = ZipCopyEpubWriter(output_path, book, source_path)
+    writer.process()
+    writer.write()
+
+
+class ZipCopyEpubWriter(epub.EpubWriter):
+    """ebooklib EpubWriter that raw-copies unchanged items from the source zip."""
+
+    def __init__(self, name: str, book: epub.EpubBook, source_path: Optional[str] = None, options=None):
+        super().__init__(name, book, options)
+        self.source_path = source_path
+        self.source: Optional[zipfile.ZipFile] = None
+        self.source_file: Optional[BinaryIO] = None
+        self.source_dir = ''
+
+    def write(self):
+        # Same entries in the same order as EpubWriter.write, written by EpubZipWriter
+        started = time.perf_counter()
+        self.stats = {'copied': 0, 'copied_bytes': 0, 'written': 0, 'written_bytes': 0}
+        if self.source_path:
+            self.source = zipfile.ZipFile(self.source_path)
+            self.source_file = open(self.source_path, 'rb')
+            self.source_dir = posixpath.dirname(opf_path(self.source))
+        try:
+            with EpubZipWriter(self.file_name, self.options['compresslevel']) as self.out:
+                self.out.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+                self._write_container()
+                self._write_opf()
+                self._write_items()
+        finally:
+            if self.source is not None:
+                self.source.close()
+                self.source_file.close()
+                self.source = self.source_file = None
+
+        logger.info(
+            f"📦 Wrote {self.file_name}: {self.stats['copied']} members copied as is "
+            f"({self.stats['copied_bytes'] / 1e6:.1f} MB), {self.stats['written']} compressed "
+            f"({self.stats['written_bytes'] / 1e6:.1f} MB) in {time.perf_counter() - started:.2f}s"
+        )
+
+    def _write_items(self):
+        # Same entries as EpubWriter._write_items
+        folder = self.book.FOLDER_NAME
+        for item in self.book.get_items():
+            if isinstance(item, epub.EpubNcx):
+                self._write_fresh(f"{folder}/{item.file_name}", self._get_ncx())
+            elif isinstance(item, epub.EpubNav):
+                self._write_fresh(f"{folder}/{item.file_name}", self._get_nav(item))
+            elif item.manifest:
+                content = item.get_content()
+                member = self._source_member(item, content)
+                if member is not None:
+                    self.out.copy_raw(self.source_file, member, f"{folder}/{item.file_name}")
+                    self.stats['copied'] += 1
+                    self.stats['copied_bytes'] += member.file_size
+                else:
+                    self._write_fresh(f"{folder}/{item.file_name}", content)
+            else:
+                self._write_fresh(item.file_name, item.get_content())
+
+    def _write_fresh(self, arcname: str, content):
+        self.out.writestr(arcname, content)
+        self.stats['written'] += 1
+        self.stats['written_bytes'] += len(content)
+
+    def _source_member(self, item, content) -> Optional[zipfile.ZipInfo]:
+        """The source zip member holding exactly this item's content, if any."""
+        if self.source is None or isinstance(content, str):
+            return None
+        name = posixpath.normpath(posixpath.join(self.source_dir, item.file_name))
+        try:
+            member = self.source.getinfo(name)
+        except KeyError:
+            return None
+        # Encrypted members can't be copied; size + CRC-32 identify unchanged content
+        if member.flag_bits & 0x1 or member.file_size != len(content):
+            return None
+        if member.CRC != zlib.crc32(content):
+            return None
+        return member
+
+
+class EpubZipWriter:
+    """Minimal zip writer for EPUBs: fresh entries and raw copies of other zips' members.
+
+    Writes what zipfile would for the same entries (deflate or stored, DOS
+    timestamps, 0o600 permissions) but only through public structures, so
+    compressed data can be copied from another zip without recompression.
+    Archives over 4 GB or 65535 entries (zip64) are not supported.
+    """
+
+    def __init__(self, path: str, compresslevel: Optional[int] = None):
+        self.compresslevel = -1 if compresslevel is None else compresslevel
+        self.fp = open(path, 'wb')
+        # (name, flags, method, dos time, dos date, crc, compressed size, size, external attr, offset)
+        self.entries: List[Tuple] = []
+        self.names = set()
+
+    def __enter__(self) -> "EpubZipWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.fp.close()
+
+    def writestr(
+        self,
+        arcname: str,
+        data: Union[str, bytes],
+        compress_type: int = zipfile.ZIP_DEFLATED
+    ):
+        """Add an entry with the given content (str is encoded as UTF-8)."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if compress_type == zipfile.ZIP_DEFLATED:
+            compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, -15)
+            compressed = compressor.compress(data) + compressor.flush()
+        elif compress_type == zipfile.ZIP_STORED:
+            compressed = data
+        else:
+            raise ValueError(f"Unsupported compression method: {compress_type}")
+
+        self._write_entry(
+            arcname, compress_type, time.localtime(time.time())[:6], zlib.crc32(data),
+            len(compressed), len(data), 0o600 << 16, 0, [compressed]
+        )
+
+    def copy_raw(self, source_file: BinaryIO, member: zipfile.ZipInfo, arcname: str):
+        """Add a zip member's compressed data as arcname (no recompression).
+
+        Args:
+            source_file: The source zip file, opened in binary mode
+            member: The member's ZipInfo in the source zip
+            arcname: Name of the entry in this zip
+        """
+        # Skip the member's local header (its name and extra field lengths may differ from the central directory's)
+        source_file.seek(member.header_offset)
+        header = source_file.read(_LOCAL_HEADER.size)
+        if len(header) != _LOCAL_HEADER.size or header[:4] != _LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"Bad local file header for {member.filename}")
+        name_length, extra_length = _LOCAL_HEADER.unpack(header)[-2:]
+        source_file.seek(member.header_offset + _LOCAL_HEADER.size + name_length + extra_length)
+
+        def chunks():
+            remaining = member.compress_size
+            while remaining:
+                chunk = source_file.read(min(remaining, _COPY_CHUNK))
+                if not chunk:
+                    raise zipfile.BadZipFile(f"Truncated data for {member.filename}")
+                remaining -= len(chunk)
+                yield chunk
+
+        # Keep the compression option bits; sizes go in the header, so no data descriptor
+        self._write_entry(
+            arcname, member.compress_type, member.date_time, member.CRC, member.compress_size,
+            member.file_size, member.external_attr, member.flag_bits & 0x6, chunks()
+        )
+
+    def _write_entry(self, arcname, method, date_time, crc, compress_size, file_size, external_attr, flags, chunks):
+        if arcname in self.names:
+            # zipfile allows these too (readers take the last one)
+            logger.debug(f"Duplicate zip entry: {arcname}")
+        offset = self.fp.tell()
+        if max(compress_size, file_size, offset) > _MAX_32 or len(self.entries) >= _MAX_16:
+            raise zipfile.LargeZipFile("EPUB too large for a zip without zip64 extensions")
+
+        name = arcname.encode('ascii', errors='ignore')
+        if name.decode('ascii') != arcname:
+            name = arcname.encode('utf-8')
+            flags |= _UTF8_FLAG
+        dos_time, dos_date = _dos_date_time(date_time)
+
+        self.fp.write(_LOCAL_HEADER.pack(
+            _LOCAL_HEADER_SIGNATURE, _VERSION, flags, method, dos_time, dos_date,
+            crc, compress_size, file_size, len(name), 0
+        ))
+        self.fp.write(name)
+        for chunk in chunks:
+            self.fp.write(chunk)
+
+        self.names.add(arcname)
+        self.entries.append((name, flags, method, dos_time, dos_date, crc, compress_size, file_size, external_attr, offset))
+
+    def close(self):
+        """Write the central directory and end record and close the file."""
+        if self.fp.closed:
+            return
+        directory_offset = self.fp.tell()
+        for name, flags, method, dos_time, dos_date, crc, compress_size, file_size, external_attr, offset in self.entries:
+            self.fp.write(_CENTRAL_HEADER.pack(
+                _CENTRAL_HEADER_SIGNATURE, _MADE_BY, _VERSION, flags, method, dos_time, dos_date,
+                crc, compress_size, file_size, len(name), 0, 0, 0, 0, external_attr, offset
+            ))
+            self.fp.write(name)
+        directory_size = self.fp.tell() - directory_offset
+        if directory_offset + directory_size > _MAX_32:
+            raise zipfile.LargeZipFile("EPUB too large for a zip without zip64 extensions")
+
+        self.fp.write(_END_RECORD.pack(
+            _END_RECORD_SIGNATURE, 0, 0, len(self.entries), len(self.entries),
+            directory_size, directory_offset, 0
+        ))
+        self.fp.close()
+
+
+def _dos_date_time(date_time: Tuple) -> Tuple[int, int]:
+    """(time, date) fields of a zip header for a (year, month, day, hour, minute, second) tuple."""
+    year, month, day, hour, minute, second = date_time[:6]
+    year = min(max(year, 1980), 2107)
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
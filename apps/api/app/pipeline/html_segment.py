@@ -1,6 +1,12 @@
-from typing import List, Dict, Tuple
-from bs4 import BeautifulSoup, NavigableString, Tag
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Callable, List, Dict, Optional, Tuple
 
+from bs4 import Tag
+
+from app.config import settings
+from app.pipeline.document import DocumentTemplate, ParsedDocument, get_document
+from app.pipeline.spool import TemplateSpool
 from app.logger import get_logger
 
 logger = get_logger(__name__)
@@ -9,10 +15,16 @@ logger = get_logger(__name__)
 class HTMLSegmenter:
     """DOM-aware HTML segmentation that preserves structure."""
     
-    def __init__(self):
-        # Tags that should not be translated (preserve content)
-        # Note: removed 'table' to allow TOC and other table content to be translated
-        self.no_translate_tags = {'pre', 'code', 'script', 'style', 'svg', 'image', 'img', 'a'}
+    def __init__(self, max_processes: Optional[int] = None, coalesce_blocks: Optional[bool] = None):
+        # Process pool size for large books (settings.segmentation_processes, 0 = CPU cores)
+        if max_processes is None:
+            max_processes = settings.segmentation_processes or os.cpu_count() or 1
+        self.max_processes = max_processes
+
+        # One segment per block (inline tags as placeholders) instead of per text node
+        if coalesce_blocks is None:
+            coalesce_blocks = settings.segment_coalesce_blocks
+        self.coalesce_blocks = coalesce_blocks
         
         # Block-level tags that define segment boundaries
         self.block_tags = {
@@ -20,17 +32,42 @@ class HTMLSegmenter:
             'div', 'section', 'article', 'blockquote', 'li'
         }
     
-    def segment_documents(self, docs: List[Dict]) -> Tuple[List[str], List[Dict]]:
+    def segment_documents(
+        self,
+        docs: List[Dict],
+        load_content: Optional[Callable[[Dict], str]] = None,
+        templates: Optional[TemplateSpool] = None
+    ) -> Tuple[List[str], List[Dict]]:
         """Segment multiple HTML documents into translatable text segments.
-        
+
+        Args:
+            docs: Spine documents
+            load_content: Reads a document's XHTML (e.g. SpineContentReader)
+                for documents without 'content'. Content loaded this way is
+                released again as soon as the document is segmented
+            templates: Spool to write each document's template to as soon as
+                it is segmented; the maps then hold no template and callers
+                pop it from the spool to reconstruct the document
+
         Returns:
             tuple: (segments, reconstruction_maps)
         """
         all_segments = []
         reconstruction_maps = []
         
-        for doc_idx, doc in enumerate(docs):
-            segments, doc_map = self.segment_html(doc['content'], doc_idx)
+        results = None
+        if self._should_use_process_pool(docs):
+            results = self._segment_in_process_pool(docs, load_content, templates)
+        if results is None:
+            results = []
+            for doc_idx, doc in enumerate(docs):
+                loaded = self._load_content(doc, load_content)
+                segments, doc_map, template = self.segment_document(doc, doc_idx)
+                results.append((segments, doc_map, self._keep_template(doc_idx, template, templates)))
+                if loaded:
+                    self._release_content(doc)
+        
+        for doc_idx, (doc, (segments, doc_map, template)) in enumerate(zip(docs, results)):
             all_segments.extend(segments)
             reconstruction_maps.append({
                 'doc_idx': doc_idx,
@@ -38,75 +75,173 @@ class HTMLSegmenter:
                 'doc_href': doc['href'],
                 'doc_title': doc['title'],
                 'segment_map': doc_map,
+                'template': template,
                 'segment_start': len(all_segments) - len(segments),
                 'segment_count': len(segments)
             })
         
         logger.info(f"Segmented {len(docs)} documents into {len(all_segments)} segments")
         return all_segments, reconstruction_maps
-    
+
+    @staticmethod
+    def _load_content(doc: Dict, load_content: Optional[Callable[[Dict], str]]) -> bool:
+        """Read a document's content if it isn't loaded (True if it was read here)."""
+        if doc.get('content') is not None or load_content is None:
+            return False
+        doc['content'] = load_content(doc)
+        doc['sanitized'] = False
+        return True
+
+    @staticmethod
+    def _release_content(doc: Dict):
+        # Read again from the EPUB (and sanitized again) if it is ever needed
+        doc['content'] = None
+        doc['sanitized'] = False
+
+    @staticmethod
+    def _keep_template(
+        doc_idx: int,
+        template: Optional[DocumentTemplate],
+        templates: Optional[TemplateSpool]
+    ) -> Optional[DocumentTemplate]:
+        """Spool a template if there is a spool; returns what the map should hold."""
+        if templates is None or template is None:
+            return template
+        templates.write(doc_idx, template)
+        return None
+
+    def _should_use_process_pool(self, docs: List[Dict]) -> bool:
+        """Use the process pool for large books whose documents aren't parsed yet."""
+        if len(docs) < 2 or self.max_processes < 2:
+            return False
+        if any(doc.get('document') is not None for doc in docs):
+            return False
+        return sum(_document_size(doc) for doc in docs) >= settings.segmentation_pool_min_chars
+
+    def _segment_in_process_pool(
+        self,
+        docs: List[Dict],
+        load_content: Optional[Callable[[Dict], str]] = None,
+        templates: Optional[TemplateSpool] = None
+    ) -> Optional[List[Tuple[List[str], Dict, Optional[DocumentTemplate]]]]:
+        """Parse, sanitize and segment documents in parallel worker processes.
+
+        Workers return only picklable results (segments, map, template and the
+        sanitized XHTML); the parse trees stay in the workers. Documents are
+        submitted a few per process at a time, so with ``load_content`` only
+        the documents in flight are held in memory. Returns None if the pool
+        fails, so the caller falls back to in-process segmentation.
+        """
+        processes = min(self.max_processes, len(docs))
+        # Largest documents first so one big chapter doesn't finish last
+        order = iter(sorted(range(len(docs)), key=lambda i: _document_size(docs[i]), reverse=True))
+        results = [None] * len(docs)
+
+        try:
+            with ProcessPoolExecutor(max_workers=processes) as pool:
+                pending = {}
+
+                def submit_next():
+                    doc_idx = next(order, None)
+                    if doc_idx is None:
+                        return
+                    doc = docs[doc_idx]
+                    loaded = self._load_content(doc, load_content)
+                    future = pool.submit(
+                        _segment_content,
+                        doc['content'],
+                        doc.get('sanitized') is False,
+                        doc_idx,
+                        self.coalesce_blocks
+                    )
+                    if loaded:
+                        self._release_content(doc)
+                    pending[future] = (doc_idx, loaded)
+
+                for _ in range(processes * 2):
+                    submit_next()
+
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        doc_idx, loaded = pending.pop(future)
+                        sanitized_content, segments, segment_map, template = future.result()
+                        if sanitized_content is not None and not loaded:
+                            docs[doc_idx]['content'] = sanitized_content
+                            docs[doc_idx]['sanitized'] = True
+                        results[doc_idx] = (segments, segment_map, self._keep_template(doc_idx, template, templates))
+                        submit_next()
+        except Exception as e:
+            logger.warning(f"Process pool segmentation failed, segmenting in-process: {e}")
+            return None
+
+        logger.info(f"⚡ Segmented {len(docs)} documents across {processes} processes")
+        return results
+
+    def segment_document(
+        self,
+        doc: Dict,
+        doc_idx: int
+    ) -> Tuple[List[str], Dict, Optional[DocumentTemplate]]:
+        """Segment a spine document dict, reusing its parsed document.
+
+        Returns:
+            tuple: (segments, segment_map, template) where template has one
+            text slot per segment, in order, for reconstruction
+        """
+
+        try:
+            # Reconstruction only needs the template, so don't keep a parse tree per document
+            document = get_document(doc, cache=False)
+            segments, segment_map = self._segment_parsed(document, doc_idx)
+            return segments, segment_map, document.template
+        except Exception as e:
+            logger.error(f"Failed to segment HTML: {e}")
+            return [], {}, None
+
     def segment_html(self, html_content: str, doc_idx: int) -> Tuple[List[str], Dict]:
         """Segment single HTML document into translatable segments."""
 
         try:
-            soup = BeautifulSoup(html_content, 'lxml-xml', from_encoding='utf-8')
-            segments = []
-            segment_map = {}
-            
-            # Find all text-containing elements
-            for idx, element in enumerate(soup.find_all(string=True)):
-                if isinstance(element, NavigableString) and element.strip():
-                    parent = element.parent
-                    
-                    # Skip non-translatable content
-                    if self._should_skip_translation(parent):
-                        continue
-                    
-                    text = element.strip()
-                    # More permissive: include any meaningful text (3+ chars)
-                    # Skip HTML artifacts and pure numbers
-                    if (len(text) >= 3 and 
-                        not text.isdigit() and 
-                        text.lower() not in ['html', 'head', 'body', 'div', 'span']):  # Skip HTML tag names
-                        segment_id = f"doc_{doc_idx}_seg_{len(segments)}"
-                        segments.append(text)
-                        
-                        # Store reconstruction info
-                        segment_map[segment_id] = {
-                            'original_text': text,
-                            'element_idx': idx,
-                            'parent_tag': parent.name if parent else None,
-                            'segment_idx': len(segments) - 1
-                        }
-            
-            logger.info(f"Extracted {len(segments)} segments from document {doc_idx}")
-            return segments, segment_map
-            
+            return self._segment_parsed(ParsedDocument.parse(html_content), doc_idx)
         except Exception as e:
             logger.error(f"Failed to segment HTML: {e}")
             return [], {}
-    
-    def _should_skip_translation(self, element: Tag) -> bool:
-        """Check if element content should be skipped for translation."""
-        if not element:
-            return True
-        
-        # Check if element or any parent is in no-translate tags
-        current = element
-        while current:
-            if hasattr(current, 'name') and current.name in self.no_translate_tags:
-                return True
-            current = current.parent if hasattr(current, 'parent') else None
-        
-        return False
+
+    def _segment_parsed(self, document: ParsedDocument, doc_idx: int) -> Tuple[List[str], Dict]:
+        document.set_block_tags(self.block_tags if self.coalesce_blocks else None)
+        segments = document.segments
+        segment_map = {}
+
+        for idx, (text, node) in enumerate(zip(segments, document.text_nodes)):
+            # Coalesced blocks are their own parent element
+            parent = node if isinstance(node, Tag) else node.parent
+            # Store reconstruction info (element_idx is the segment's template slot)
+            segment_map[f"doc_{doc_idx}_seg_{idx}"] = {
+                'original_text': text,
+                'element_idx': idx,
+                'parent_tag': parent.name if parent else None,
+                'segment_idx': idx
+            }
+
+        logger.info(f"Extracted {len(segments)} segments from document {doc_idx}")
+        return segments, segment_map
     
     def reconstruct_documents(
         self, 
         translated_segments: List[str],
         reconstruction_maps: List[Dict],
-        original_docs: List[Dict]
+        original_docs: List[Dict],
+        rtl: bool = False
     ) -> List[Dict]:
-        """Reconstruct HTML documents with translated segments."""
+        """Reconstruct HTML documents with translated segments.
+
+        Args:
+            translated_segments: All translated segments
+            reconstruction_maps: Maps from segment_documents
+            original_docs: Spine documents that were segmented
+            rtl: Set dir="rtl" on each document (RTL target languages)
+        """
         
         reconstructed_docs = []
         
@@ -123,9 +258,10 @@ class HTMLSegmenter:
             
             # Reconstruct HTML
             reconstructed_content = self._reconstruct_html(
-                original_doc['content'],
+                original_doc,
+                doc_map.get('template'),
                 doc_translated_segments,
-                doc_map['segment_map']
+                rtl
             )
             
             reconstructed_docs.append({
@@ -140,38 +276,17 @@ class HTMLSegmenter:
     
     def _reconstruct_html(
         self,
-        original_html: str,
+        original_doc: Dict,
+        template: Optional[DocumentTemplate],
         translated_segments: List[str],
-        segment_map: Dict
+        rtl: bool = False
     ) -> str:
-        """Reconstruct HTML with translated segments."""
+        """Reconstruct HTML by splicing translated segments into the document template."""
 
         try:
-            soup = BeautifulSoup(original_html, 'lxml-xml', from_encoding='utf-8')
-            segment_idx = 0
-            inline_elements = {'em', 'strong', 'b', 'i', 'a', 'span', 'code', 'sup', 'sub'}
-
-            # Replace text content with translations
-            for element in soup.find_all(string=True):
-                if isinstance(element, NavigableString) and element.strip():
-                    parent = element.parent
-
-                    if self._should_skip_translation(parent):
-                        continue
-
-                    text = element.strip()
-                    # Use same criteria as segmentation to maintain alignment
-                    if (len(text) >= 3 and
-                        not text.isdigit() and
-                        text.lower() not in ['html', 'head', 'body', 'div', 'span'] and
-                        segment_idx < len(translated_segments)):
-
-                        # Replace with translated text
-                        element.replace_with(translated_segments[segment_idx])
-                        segment_idx += 1
-
-            # Convert to string with proper UTF-8 encoding
-            final_html = str(soup)
+            if template is None:
+                template = get_document(original_doc).template
+            final_html = template.render(translated_segments, rtl=rtl)
 
             # Post-process: Apply chapter title translations in TOC documents
             final_html = self._apply_chapter_title_translations(final_html)
@@ -180,7 +295,7 @@ class HTMLSegmenter:
             
         except Exception as e:
             logger.error(f"Failed to reconstruct HTML: {e}")
-            return original_html
+            return original_doc['content']
     
     def _apply_chapter_title_translations(self, html_content: str) -> str:
         """Apply chapter title translations to fix TOC entries that AI didn't translate."""
@@ -268,4 +383,30 @@ class HTMLSegmenter:
                 else:
                     logger.debug(f"No exact match for '{original_title}'")
         
-        return html_content
\ No newline at end of file
+        return html_content
+
+
+def _document_size(doc: Dict) -> int:
+    """Size of a document's XHTML, loaded or not."""
+    if doc.get('content') is not None:
+        return len(doc['content'])
+    return doc.get('size', 0)
+
+
+def _segment_content(
+    content: str,
+    sanitize: bool,
+    doc_idx: int,
+    coalesce_blocks: bool = False
+) -> Tuple[Optional[str], List[str], Dict, Optional[DocumentTemplate]]:
+    """Process pool task: parse (and sanitize) one document and segment it.
+
+    Returns:
+        tuple: (sanitized content or None if not sanitized here, segments,
+        segment_map, template)
+    """
+    doc = {'content': content}
+    if sanitize:
+        doc['sanitized'] = False
+    segments, segment_map, template = HTMLSegmenter(max_processes=1, coalesce_blocks=coalesce_blocks).segment_document(doc, doc_idx)
+    return (doc['content'] if sanitize else None), segments, segment_map, template
@@ -0,0 +1,396 @@
+"""Output stage: render the job's deliverables concurrently and upload them.
+
+A finished job produces six files: the translation EPUB, PDF and TXT and
+the bilingual EPUB, PDF and TXT. They only depend on the assembled documents
+(spooled to disk), the original EPUB and the segments, not on each other, so
+each one is rendered by its own task in a process pool (the WeasyPrint PDFs
+are CPU-bound and would serialize on the GIL in threads). Each file is
+uploaded as soon as it is rendered while the other renders keep running, so
+the stage takes about as long as the slowest file instead of the sum.
+
+The renderers run in worker processes and only get picklable inputs: the
+spools (their metadata), the path of the input EPUB (re-read once per
+process) and plain strings/lists.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.logger import get_logger
+from app.pipeline.epub_io import EPUBProcessor
+from app.storage import get_storage
+
+# Enhanced PDF generation import (EPUB -> PDF fallback for the bilingual PDF)
+try:
+    # Add root directory to path for enhanced PDF converter
+    root_dir = Path(__file__).parent.parent.parent.parent
+    sys.path.insert(0, str(root_dir))
+    from epub_to_pdf_with_images import convert_epub_to_pdf
+    ENHANCED_PDF_AVAILABLE = True
+except Exception:
+    convert_epub_to_pdf = None
+    ENHANCED_PDF_AVAILABLE = False
+
+logger = get_logger(__name__)
+
+# Output key -> (storage key suffix, content type)
+ARTIFACTS = {
+    "epub": (".epub", "application/epub+zip"),
+    "pdf": (".pdf", "application/pdf"),
+    "txt": (".txt", "text/plain; charset=utf-8"),
+    "bilingual_epub": ("_bilingual.epub", "application/epub+zip"),
+    "bilingual_pdf": ("_bilingual.pdf", "application/pdf"),
+    "bilingual_txt": ("_bilingual.txt", "text/plain; charset=utf-8"),
+}
+
+# Slowest renders first, so a small pool doesn't leave a PDF for last
+RENDER_ORDER = ["bilingual_pdf", "pdf", "bilingual_epub", "epub", "txt", "bilingual_txt"]
+
+# Rendered at the same time, each with its own pool for a large book's chapter groups
+PDF_TASKS = ("bilingual_pdf", "pdf")
+
+# Original EPUB per path, read once per worker process
+_books: Dict[str, object] = {}
+
+
+def _import_common():
+    """Make the shared common/ package importable (project root on sys.path)."""
+    # 5 levels up from output_stage.py: pipeline -> app -> api -> apps -> project root
+    project_root = Path(__file__).parent.parent.parent.parent.parent
+    common_path = project_root / "common"
+    if not common_path.exists():
+        # Fallback: calculate from cwd (for testing environments)
+        common_path = Path(os.getcwd()) / "common"
+
+    if not common_path.exists():
+        raise ImportError(f"Could not find common module. Tried: {common_path}")
+    if str(common_path.parent) not in sys.path:
+        sys.path.insert(0, str(common_path.parent))
+
+
+def _original_book(context: Dict):
+    """The original EpubBook: the caller's object in-process, re-read from disk in workers."""
+    if context.get("original_book") is not None:
+        return context["original_book"]
+    epub_path = context["epub_path"]
+    if epub_path not in _books:
+        from app.pipeline.epub_writer import read_book
+        _books[epub_path] = read_book(epub_path)
+    return _books[epub_path]
+
+
+def _output_path(context: Dict, name: str) -> str:
+    suffix, _ = ARTIFACTS[name]
+    return os.path.join(context["temp_dir"], f"{context['job_id']}{suffix}")
+
+
+def _render_epub(context: Dict) -> Optional[str]:
+    """Translation EPUB (shared OutputGenerator, same file as the test pipelines)."""
+    _import_common()
+    from common.outputs import OutputGenerator
+
+    return asyncio.run(OutputGenerator().generate_epub(
+        context["temp_dir"], _original_book(context), context["translated_docs"], context["job_id"]
+    ))
+
+
+def _render_txt(context: Dict) -> Optional[str]:
+    """Formatted translation TXT."""
+    _import_common()
+    from common.outputs import OutputGenerator
+
+    return asyncio.run(OutputGenerator().generate_txt(
+        context["temp_dir"], context["translated_docs"], context["job_id"], context["metadata"]
+    ))
+
+
+def _render_bilingual_epub(context: Dict) -> Optional[str]:
+    """Bilingual EPUB with external CSS (EPUB standard)."""
+    output_path = _output_path(context, "bilingual_epub")
+    logger.info(f"Creating bilingual EPUB with external CSS at: {output_path}")
+
+    EPUBProcessor().write_bilingual_epub(
+        original_book=_original_book(context),
+        bilingual_docs=context["bilingual_docs"],
+        output_path=output_path,
+        source_lang=context["source_lang"],
+        target_lang=context["target_lang"]
+    )
+    logger.info("Created bilingual EPUB with external CSS file")
+    return output_path
+
+
+def _render_bilingual_pdf(context: Dict) -> Optional[str]:
+    """Bilingual PDF from HTML, which preserves the subtitle CSS.
+
+    (EPUB-to-PDF via Calibre loses the bilingual subtitle formatting; it is
+    only used as a fallback when this raises.)
+    """
+    from app.html_to_pdf import convert_bilingual_html_to_pdf
+    from app.pipeline.bilingual_html import BilingualHTMLGenerator
+
+    output_path = _output_path(context, "bilingual_pdf")
+    logger.info("📄 Converting bilingual HTML to PDF (preserves CSS styling)...")
+
+    # Get combined CSS (original + bilingual)
+    combined_css = f"{context['original_css']}\n\n/* Bilingual Layout */\n{BilingualHTMLGenerator().css}"
+
+    success = convert_bilingual_html_to_pdf(
+        bilingual_docs=context["bilingual_docs"],
+        css_content=combined_css,
+        output_path=output_path,
+        source_lang=context["source_lang"],
+        target_lang=context["target_lang"],
+        epub_path=context["epub_path"],
+        max_processes=context["pdf_render_processes"]
+    )
+    if success and os.path.exists(output_path):
+        return output_path
+    logger.error("Bilingual PDF generation failed")
+    return None
+
+
+def _render_bilingual_pdf_fallback(context: Dict, bilingual_epub_path: str) -> Optional[str]:
+    """Bilingual PDF converted from the bilingual EPUB (CSS styling may be lost)."""
+    logger.info("Falling back to EPUB-to-PDF conversion...")
+    pdf_path = convert_epub_to_pdf(bilingual_epub_path, context["temp_dir"])
+    if pdf_path and os.path.exists(pdf_path):
+        logger.warning("Used fallback PDF (CSS styling may be lost)")
+        return pdf_path
+    return None
+
+
+def _render_bilingual_txt(
+    context: Dict,
+    original_segments: List[str],
+    translated_segments: List[str]
+) -> Optional[str]:
+    """Bilingual TXT from the raw segments (clean format)."""
+    # Validate segment counts match
+    if len(original_segments) != len(translated_segments):
+        logger.warning(
+            f"Segment count mismatch for bilingual TXT: "
+            f"original={len(original_segments)}, translated={len(translated_segments)}. "
+            f"Using minimum length."
+        )
+
+    # Format: Clean separation between translation and original
+    bilingual_text_parts = []
+    for orig, trans in zip(original_segments, translated_segments):
+        orig_text = orig.strip()
+        trans_text = trans.strip()
+
+        if orig_text and trans_text:
+            bilingual_text_parts.append(f"{trans_text}\n    ({orig_text})\n")
+
+    output_path = _output_path(context, "bilingual_txt")
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(bilingual_text_parts))
+    return output_path
+
+
+def _render_pdf(context: Dict) -> Optional[str]:
+    """Translation PDF with WeasyPrint (superior to Calibre)."""
+    from app.html_to_pdf import convert_html_to_pdf
+
+    output_path = _output_path(context, "pdf")
+    logger.info("📄 Converting translation HTML to PDF with WeasyPrint (superior quality)...")
+
+    success = convert_html_to_pdf(
+        translated_docs=context["translated_docs"],
+        css_content=context["original_css"],
+        output_path=output_path,
+        target_lang=context["target_lang"],
+        epub_path=context["epub_path"],
+        max_processes=context["pdf_render_processes"]
+    )
+    if success and os.path.exists(output_path):
+        return output_path
+    logger.warning("Translation PDF generation failed with WeasyPrint")
+    return None
+
+
+RENDERERS: Dict[str, Callable[..., Optional[str]]] = {
+    "epub": _render_epub,
+    "txt": _render_txt,
+    "bilingual_epub": _render_bilingual_epub,
+    "bilingual_pdf": _render_bilingual_pdf,
+    "bilingual_pdf_fallback": _render_bilingual_pdf_fallback,
+    "bilingual_txt": _render_bilingual_txt,
+    "pdf": _render_pdf,
+}
+
+
+def _render_artifact(task: str, context: Dict, args: Tuple) -> Tuple[Optional[str], float]:
+    """Run one renderer (in a worker process); returns (path or None, seconds)."""
+    started = time.perf_counter()
+    path = RENDERERS[task](context, *args)
+    return path, time.perf_counter() - started
+
+
+class OutputStage:
+    """Render the six output files of a job concurrently and upload each when done."""
+
+    def __init__(
+        self,
+        job_id: str,
+        temp_dir: str,
+        epub_path: str,
+        original_book,
+        translated_docs,
+        bilingual_docs,
+        original_segments: List[str],
+        translated_segments: List[str],
+        source_lang: str,
+        target_lang: str,
+        max_processes: Optional[int] = None
+    ):
+        _import_common()
+        from common.outputs import extract_book_metadata
+
+        if max_processes is None:
+            max_processes = settings.output_processes or os.cpu_count() or 1
+        self.max_processes = max_processes
+        self.job_id = job_id
+        self.original_book = original_book
+        self.context = {
+            "job_id": job_id,
+            "temp_dir": temp_dir,
+            "epub_path": epub_path,
+            "translated_docs": translated_docs,
+            "bilingual_docs": bilingual_docs,
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "metadata": extract_book_metadata(original_book),
+            # Extracted once per book; both PDFs use it
+            "original_css": EPUBProcessor().extract_all_css_from_book(original_book),
+            # Both PDFs render at once, so they split one process budget for their chapter
+            # groups (their own stage processes just wait on the chunk pools meanwhile)
+            "pdf_render_processes": max(
+                1, (settings.pdf_render_processes or max_processes) // len(PDF_TASKS)
+            ),
+        }
+        self.task_args = {task: () for task in RENDER_ORDER}
+        self.task_args["bilingual_txt"] = (original_segments, translated_segments)
+
+        self.storage = get_storage()
+        self.output_keys: Dict[str, str] = {}
+        self.paths: Dict[str, str] = {}
+        self.timings: Dict[str, float] = {}
+        self.finished = set()
+        self.fallback_pending = False
+
+    def run(self) -> Dict[str, str]:
+        """Render and upload every output; returns {output key name: storage key}.
+
+        Raises if the bilingual EPUB can't be written (the job fails, as the
+        EPUBs are the primary deliverables).
+        """
+        started = time.perf_counter()
+        processes = min(self.max_processes, len(RENDER_ORDER))
+
+        try:
+            self._run_in_process_pool(processes)
+        except BrokenProcessPool as e:
+            logger.warning(f"Output process pool failed, rendering the rest in-process: {e}")
+            self._run_in_process()
+
+        wall = time.perf_counter() - started
+        if self.timings:
+            slowest = max(self.timings, key=self.timings.get)
+            logger.info(
+                f"⏱️ Output stage: {wall:.1f}s wall │ {sum(self.timings.values()):.1f}s of renders "
+                f"across {processes} processes │ slowest: {slowest} {self.timings[slowest]:.1f}s"
+            )
+        logger.info(f"Generated both formats: {list(self.output_keys.keys())}")
+        return self.output_keys
+
+    def _run_in_process_pool(self, processes: int):
+        # Workers re-read the original EPUB from epub_path instead of unpickling the book
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {
+                pool.submit(_render_artifact, task, self.context, self.task_args[task]): task
+                for task in RENDER_ORDER
+            }
+            while futures:
+                done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = futures.pop(future)
+                    error = future.exception()
+                    if isinstance(error, BrokenProcessPool):
+                        raise error
+                    if error is None:
+                        path, seconds = future.result()
+                        self._rendered(task, path, seconds)
+                    else:
+                        self._failed(task, error)
+
+                    fallback = self._fallback_task()
+                    if fallback:
+                        futures[pool.submit(_render_artifact, fallback, self.context, self.task_args[fallback])] = fallback
+
+    def _run_in_process(self):
+        """Render the outputs not finished yet one after another in this process."""
+        context = dict(self.context, original_book=self.original_book)
+        queue = [task for task in RENDER_ORDER if task not in self.finished]
+        while queue:
+            task = queue.pop(0)
+            try:
+                path, seconds = _render_artifact(task, context, self.task_args[task])
+            except Exception as e:
+                self._failed(task, e)
+            else:
+                self._rendered(task, path, seconds)
+
+            fallback = self._fallback_task()
+            if fallback:
+                queue.append(fallback)
+
+    def _fallback_task(self) -> Optional[str]:
+        """The EPUB -> PDF bilingual fallback, once it's needed and the bilingual EPUB exists."""
+        if not self.fallback_pending or "bilingual_epub" not in self.finished:
+            return None
+        self.fallback_pending = False
+        if not ENHANCED_PDF_AVAILABLE or not self.paths.get("bilingual_epub"):
+            return None
+        self.task_args["bilingual_pdf_fallback"] = (self.paths["bilingual_epub"],)
+        return "bilingual_pdf_fallback"
+
+    def _rendered(self, task: str, path: Optional[str], seconds: float):
+        """Record a finished render and upload it while the others keep rendering."""
+        self.finished.add(task)
+        name = "bilingual_pdf" if task == "bilingual_pdf_fallback" else task
+        self.timings[task] = seconds
+        if not path:
+            logger.warning(f"❌ {name}: not generated ({seconds:.1f}s)")
+            return
+        self.paths[name] = path
+
+        upload_started = time.perf_counter()
+        suffix, content_type = ARTIFACTS[name]
+        key = f"outputs/{self.job_id}{suffix}"
+        if self.storage.upload_file(path, key, content_type):
+            self.output_keys[name] = key
+        logger.info(
+            f"📦 {name}: rendered in {seconds:.1f}s, uploaded in {time.perf_counter() - upload_started:.1f}s "
+            f"({os.path.getsize(path) / 1e6:.1f} MB) │ {key}"
+        )
+
+    def _failed(self, task: str, error: BaseException):
+        self.finished.add(task)
+        if task == "bilingual_epub":
+            raise error
+        if task == "bilingual_pdf":
+            logger.error(f"Failed to generate bilingual PDF: {error}", exc_info=error)
+            self.fallback_pending = True
+        elif task == "bilingual_pdf_fallback":
+            logger.error(f"Fallback PDF generation also failed: {error}")
+        else:
+            logger.error(f"Failed to generate {task}: {error}", exc_info=error)
@@ -7,21 +7,28 @@ file for preview purposes, reusing the existing translation pipeline.
 import os
 import tempfile
 import asyncio
-import base64
+import html
 import re
 from typing import Optional, Tuple, List, Dict
 from bs4 import BeautifulSoup, NavigableString
 
+from app.config import settings
+from app.pipeline.epub_assets import EPUBAssets
+from app.pipeline.preview_assets import get_preview_asset_cache, preview_asset_url
 from app.pipeline.epub_io import EPUBProcessor
 from app.pipeline.html_segment import HTMLSegmenter
 from app.pipeline.translate import TranslationOrchestrator
+from app.pipeline.preview_store import get_preview_store
 from app.storage import get_storage
-from app.providers.factory import get_provider
+from app.providers.factory import get_shared_provider
 from app.logger import get_logger
 from app.config.models import get_default_model
 
 logger = get_logger(__name__)
 
+# src attribute of an <img> tag: (tag up to the value, quote, src)
+_IMG_SRC = re.compile(r'(<img\b[^>]*?\bsrc=)(["\'])(.*?)\2', re.IGNORECASE | re.DOTALL)
+
 
 class PreviewService:
     """Service for generating preview translations of EPUB files.
@@ -43,7 +50,8 @@ class PreviewService:
         provider: str = "groq",
         model: Optional[str] = None,
         progress_callback: Optional[callable] = None,
-        output_format: str = "translation"
+        output_format: str = "translation",
+        api_url: Optional[str] = None
     ) -> Tuple[str, str, int, str]:
         """Generate preview translations of the first N words of an EPUB in both formats.
 
@@ -54,6 +62,8 @@ class PreviewService:
             provider: Translation provider to use (default: 'groq' for speed/cost)
             model: Optional specific model (default: llama-3.1-8b-instant for groq)
             output_format: Deprecated - now always generates both formats
+            api_url: Public base URL of the API for image URLs (default:
+                settings.api_url; without either, images are left unresolved)
 
         Returns:
             Tuple of (translation_html, bilingual_html, actual_word_count, provider_used)
@@ -85,13 +95,10 @@ class PreviewService:
                 progress_callback("📖 Reading chapters...")
             book, spine_docs = self.epub_processor.read_epub(epub_path)
 
-            # Extract original CSS and images from EPUB
+            # Extract original CSS from EPUB
             css_content = self.epub_processor.extract_all_css_from_book(book)
             logger.info(f"Extracted {len(css_content)} chars of CSS from EPUB")
 
-            image_map = self._extract_images_from_epub(book)
-            logger.info(f"Extracted {len(set(image_map.values()))} unique images from EPUB")
-
             # Limit documents to first N words
             logger.info(f"📊 Before limiting: {len(spine_docs)} spine documents, target: {max_words} words")
             limited_docs, actual_words = self._limit_to_words(spine_docs, max_words, book)
@@ -111,8 +118,9 @@ class PreviewService:
             # - Groq Llama 3.1 8B (primary) - Fast & cheap for previews
             # - Gemini 2.5 Flash Lite (fallback) - For Tier 4 languages (auto-switched by TranslationOrchestrator)
             # Note: Full book translations ALWAYS use Gemini for best quality
-            primary_provider = get_provider("groq")
-            fallback_provider = get_provider("gemini")
+            # Shared providers keep their connection pools alive across previews
+            primary_provider = get_shared_provider("groq")
+            fallback_provider = get_shared_provider("gemini")
 
             # Translate segments with fun progress messages
             logger.info(f"Translating preview with Groq (Llama) primary + Gemini fallback (auto for Tier 4 langs)")
@@ -148,6 +156,13 @@ class PreviewService:
             total_cost = estimate_cost(provider_used, model, input_tokens, output_tokens)
 
             logger.info(f"✅ Translation completed using {provider_used}")
+
+            # Keep the translations so the paid job doesn't translate these segments again
+            get_preview_store().save(
+                r2_key, target_lang, segments, translated_segments,
+                providers=orchestrator.segment_translators,
+                failed=orchestrator.failed_segments
+            )
             logger.info(f"💰 Preview translation cost: ~${total_cost:.4f} USD ({tokens_used:,} tokens)")
 
             # Reconstruct HTML with translations
@@ -156,8 +171,15 @@ class PreviewService:
                 translated_segments, segment_maps, limited_docs
             )
 
-            # Filter image_map to only include images referenced in preview docs
-            filtered_image_map = self._filter_images_for_docs(limited_docs, image_map) if image_map else None
+            # Images are served from the EPUB zip by the preview asset route, so keep the book
+            # downloaded (the cache takes over the file) and link only the images these docs use
+            image_map = {}
+            api_url = api_url or settings.api_url
+            if api_url:
+                assets = get_preview_asset_cache().add(r2_key, epub_path)
+                image_map = self._referenced_images(limited_docs, assets, r2_key, api_url)
+            else:
+                logger.warning("No API URL for preview images - leaving image references as is")
 
             # Generate BOTH translation and bilingual previews
             logger.info("Generating both translation and bilingual previews")
@@ -177,10 +199,10 @@ class PreviewService:
 
             # Format both previews
             translation_html = self._format_preview_html(
-                translated_docs, css_content, filtered_image_map, target_lang, actual_words, is_bilingual=False
+                translated_docs, css_content, image_map, target_lang, actual_words, is_bilingual=False
             )
             bilingual_html = self._format_preview_html(
-                bilingual_docs, css_content, filtered_image_map, target_lang, actual_words, is_bilingual=True
+                bilingual_docs, css_content, image_map, target_lang, actual_words, is_bilingual=True
             )
 
             # Send language-specific completion message
@@ -510,85 +532,39 @@ class PreviewService:
             'content': str(soup)
         }
 
-    def _filter_images_for_docs(self, docs: List[dict], image_map: Dict[str, str]) -> Dict[str, str]:
-        """Filter image_map to only include images referenced in the given documents.
+    def _referenced_images(
+        self,
+        docs: List[dict],
+        assets: EPUBAssets,
+        r2_key: str,
+        api_url: str
+    ) -> Dict[str, str]:
+        """Map the images referenced in the given documents to preview asset URLs.
 
-        This prevents orphaned images from earlier/later chapters from appearing in preview.
+        Only images that exist in the EPUB zip are linked, which also keeps
+        orphaned images from earlier/later chapters out of the preview.
 
         Args:
             docs: List of document dicts to scan for image references
-            image_map: Full image map from EPUB
+            assets: Image index of the EPUB
+            r2_key: R2 storage key of the EPUB (identifies it to the asset route)
+            api_url: Public base URL of the API
 
         Returns:
-            Filtered image map with only referenced images
+            Dictionary mapping each referenced src to its asset URL
         """
-        if not image_map:
-            return {}
-
-        # Find all image src attributes in the documents
-        referenced_images = set()
-
-        for doc in docs:
-            content = doc['content']
-            # Find all img src attributes
-            img_srcs = re.findall(r'<img[^>]*src=(?:"([^"]*)"|\'([^\']*)\')', content, re.IGNORECASE)
-            for src_tuple in img_srcs:
-                src = src_tuple[0] or src_tuple[1]
-                # Add all variations that might match
-                referenced_images.add(src)
-                referenced_images.add(src.lstrip('/'))
-                referenced_images.add(src.lstrip('../'))
-                referenced_images.add(os.path.basename(src))
-
-        # Filter image_map to only referenced images
-        filtered_map = {}
-        for key, value in image_map.items():
-            if key in referenced_images:
-                filtered_map[key] = value
-
-        logger.info(f"Filtered images: {len(filtered_map)} of {len(image_map)} images referenced in preview docs")
-        return filtered_map
-
-    def _extract_images_from_epub(self, book) -> Dict[str, str]:
-        """Extract images from EPUB and encode as base64 data URIs.
-
-        Args:
-            book: EbookLib Book object
-
-        Returns:
-            Dictionary mapping image paths to base64 data URIs
-        """
-        import ebooklib
-
         image_map = {}
-        for item in book.get_items():
-            if item.get_type() == ebooklib.ITEM_IMAGE:
-                try:
-                    img_path = item.get_name()
-                    img_content = item.get_content()
-
-                    # Determine MIME type from extension
-                    ext = img_path.lower().split('.')[-1]
-                    mime_types = {
-                        'jpg': 'image/jpeg', 'jpeg': 'image/jpeg',
-                        'png': 'image/png', 'gif': 'image/gif',
-                        'svg': 'image/svg+xml', 'webp': 'image/webp'
-                    }
-                    mime_type = mime_types.get(ext, 'image/jpeg')
-
-                    # Encode as base64 data URI
-                    img_base64 = base64.b64encode(img_content).decode('utf-8')
-                    data_uri = f"data:{mime_type};base64,{img_base64}"
-
-                    # Store with multiple path variations for matching
-                    image_map[img_path] = data_uri
-                    image_map[img_path.lstrip('/')] = data_uri
-                    image_map[img_path.lstrip('../')] = data_uri
-                    image_map[os.path.basename(img_path)] = data_uri
-
-                except Exception as e:
-                    logger.warning(f"Failed to extract image {item.get_name()}: {e}")
+        for doc in docs:
+            for match in _IMG_SRC.finditer(doc['content']):
+                src = match.group(3)
+                if src in image_map:
+                    continue
+                member = assets.resolve(src, doc.get('href', ''))
+                if member is None:
+                    continue
+                image_map[src] = preview_asset_url(api_url, r2_key, member)
 
+        logger.info(f"Linking {len(image_map)} images referenced in preview docs")
         return image_map
 
     def _get_fun_progress_message(self, current_batch: int, total_batches: int, target_lang: str) -> str:
@@ -892,7 +868,7 @@ class PreviewService:
         Args:
             translated_docs: List of translated spine document dicts (from reconstruct_documents)
             css_content: Original CSS from the EPUB
-            image_map: Optional dictionary mapping image paths to base64 data URIs
+            image_map: Optional dictionary mapping image srcs to preview asset URLs
             target_lang: Target language code for RTL detection
             actual_word_count: Number of words in the preview
             is_bilingual: Whether this is a bilingual preview (adds bilingual CSS)
@@ -912,35 +888,18 @@ class PreviewService:
 
             combined_html.append(content)
 
-        # Join HTML and replace image src attributes with base64 data URIs
+        # Join HTML and point image src attributes at the preview asset route
         combined_html_str = ''.join(combined_html)
 
         if image_map:
-            # Replace all <img> tags with base64 data URIs
             def replace_img_src(match):
-                img_tag = match.group(0)
-                src_match = re.search(r'src=(?:"([^"]*)"|\'([^\']*)\')', img_tag, re.IGNORECASE)
-                if not src_match:
-                    return img_tag
-
-                src = src_match.group(1) or src_match.group(2)
-
-                # Try different path variations to find the image
-                for variant in [src, src.lstrip('/'), src.lstrip('../'), os.path.basename(src)]:
-                    if variant in image_map:
-                        data_uri = image_map[variant]
-                        # Replace src in the tag
-                        return img_tag.replace(f'src="{src}"', f'src="{data_uri}"').replace(f"src='{src}'", f"src='{data_uri}'")
-
-                logger.warning(f"Image not found in image_map: {src}")
-                return img_tag
-
-            combined_html_str = re.sub(
-                r'<img[^>]*>',
-                replace_img_src,
-                combined_html_str,
-                flags=re.IGNORECASE
-            )
+                url = image_map.get(match.group(3))
+                if url is None:
+                    logger.warning(f"Image not found in image_map: {match.group(3)}")
+                    return match.group(0)
+                return f"{match.group(1)}{match.group(2)}{html.escape(url)}{match.group(2)}"
+
+            combined_html_str = _IMG_SRC.sub(replace_img_src, combined_html_str)
 
         # Determine if RTL language
         rtl_languages = {'ar', 'he', 'fa', 'ur'}  # Arabic, Hebrew, Farsi, Urdu
@@ -0,0 +1,150 @@
+"""Images of previewed EPUBs, served by URL from the EPUB zip.
+
+Previews used to embed every referenced image as a base64 data URI, so the
+preview HTML (sent to the browser in one JSON/SSE payload) carried each image
+a third larger than its file. The preview now references images by URL under
+the preview asset route (GET /preview/assets), which reads the bytes from the
+EPUB zip through EPUBAssets. The EPUBs of recent previews stay downloaded in a
+small on-disk cache, so the image requests that follow a preview don't fetch
+the book from R2 again.
+
+Asset URLs are signed (HMAC over the book's key, the image path and an
+expiry), so the route only serves images a preview has linked and can't be
+used to read or download arbitrary uploaded books.
+"""
+
+import hashlib
+import hmac
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+from urllib.parse import urlencode
+
+from app.config import settings
+from app.pipeline.epub_assets import EPUBAssets
+from app.storage import get_storage
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+PREVIEW_ASSET_PATH = "/preview/assets"
+
+
+def preview_asset_url(api_url: str, r2_key: str, member: str, expires: Optional[int] = None) -> str:
+    """Signed URL of an image of a previewed EPUB on the preview asset route.
+
+    Args:
+        api_url: Public base URL of the API
+        r2_key: R2 storage key of the uploaded EPUB
+        member: The image's path in the EPUB zip (from EPUBAssets.resolve)
+        expires: Unix time the URL expires at (default: settings.preview_asset_url_ttl_seconds from now)
+    """
+    if expires is None:
+        expires = int(time.time()) + settings.preview_asset_url_ttl_seconds
+    query = urlencode({
+        'key': r2_key,
+        'path': member,
+        'expires': expires,
+        'sig': _sign(r2_key, member, expires)
+    })
+    return f"{api_url.rstrip('/')}{PREVIEW_ASSET_PATH}?{query}"
+
+
+def verify_asset_signature(r2_key: str, member: str, expires: int, signature: str) -> bool:
+    """Whether a preview asset URL was signed by this API and hasn't expired."""
+    if expires < time.time():
+        return False
+    return hmac.compare_digest(_sign(r2_key, member, expires), signature)
+
+
+@lru_cache()
+def _signing_key() -> bytes:
+    # Derived from a server-only secret, so every API process signs alike
+    return hmac.new(
+        settings.r2_secret_access_key.encode('utf-8'), b'preview-assets', hashlib.sha256
+    ).digest()
+
+
+def _sign(r2_key: str, member: str, expires: int) -> str:
+    message = f"{r2_key}\n{member}\n{expires}".encode('utf-8')
+    return hmac.new(_signing_key(), message, hashlib.sha256).hexdigest()
+
+
+class PreviewAssetCache:
+    """LRU cache of downloaded preview EPUBs and their image indexes.
+
+    Books are added by the preview that downloaded them and downloaded again
+    from R2 on a miss (e.g. a preview reopened after the book was evicted);
+    the route only asks for books of signed URLs, i.e. books a preview linked.
+    """
+
+    def __init__(self, max_books: int = settings.preview_asset_cache_books, directory: Optional[str] = None):
+        self.max_books = max_books
+        self.directory = directory or tempfile.mkdtemp(prefix="preview-assets-")
+        self._books: "OrderedDict[str, EPUBAssets]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, r2_key: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha256(r2_key.encode('utf-8')).hexdigest()}.epub")
+
+    def add(self, r2_key: str, epub_path: str) -> EPUBAssets:
+        """Move a downloaded EPUB into the cache and index its images.
+
+        Args:
+            r2_key: R2 storage key of the EPUB
+            epub_path: Downloaded EPUB; the file is moved, not copied
+        """
+        path = self._path(r2_key)
+        with self._lock:
+            stale = self._books.pop(r2_key, None)
+            if stale is not None:
+                stale.close()
+            shutil.move(epub_path, path)
+            assets = EPUBAssets(path)
+            self._books[r2_key] = assets
+            while len(self._books) > self.max_books:
+                _, evicted = self._books.popitem(last=False)
+                evicted.close()
+                os.unlink(evicted.epub_path)
+        return assets
+
+    def get(self, r2_key: str) -> Optional[EPUBAssets]:
+        """Image index of an EPUB, downloading it on a miss (None if it can't be downloaded)."""
+        with self._lock:
+            assets = self._books.get(r2_key)
+            if assets is not None:
+                self._books.move_to_end(r2_key)
+                return assets
+
+        fd, download_path = tempfile.mkstemp(suffix=".epub", dir=self.directory)
+        os.close(fd)
+        try:
+            if not get_storage().download_file(r2_key, download_path):
+                return None
+            return self.add(r2_key, download_path)
+        finally:
+            if os.path.exists(download_path):
+                os.unlink(download_path)
+
+    def read(self, r2_key: str, member: str) -> Optional[Tuple[bytes, str]]:
+        """(bytes, MIME type) of an image of a previewed EPUB, or None if unknown."""
+        assets = self.get(r2_key)
+        if assets is None:
+            return None
+        try:
+            return assets.read(member)
+        except (OSError, ValueError) as e:
+            # Evicted (and deleted) by another request while reading
+            logger.warning(f"Failed to read preview image {member} of {r2_key}: {e}")
+            return None
+
+
+@lru_cache()
+def get_preview_asset_cache() -> PreviewAssetCache:
+    """Get the process-wide preview asset cache."""
+    return PreviewAssetCache()
@@ -0,0 +1,169 @@
+"""Persist preview translations so the paid job can reuse them.
+
+A preview translates the opening words of a book; when the user then pays,
+the worker would translate those same segments again. Preview results are
+kept in a Redis hash per uploaded book and target language (keyed by the R2
+``source_key``), with one field per source segment hash, and the worker seeds
+its output from them before translating the remainder.
+
+Seeded segments skip the paid job's own validation, so only preview
+translations that passed validation are stored, each with the provider that
+produced it, and the worker re-validates them and drops those from providers
+the job itself would not translate with (e.g. Groq output for a Gemini job).
+"""
+
+import hashlib
+import json
+from functools import lru_cache
+from typing import AbstractSet, Dict, List, Optional
+
+import redis
+
+from app.config import settings
+from app.logger import get_logger
+from app.pipeline.validation import TranslationValidator
+
+logger = get_logger(__name__)
+
+
+class PreviewTranslationStore:
+    """Redis-backed store of preview segment translations.
+
+    Like the translation memory this is best effort: Redis errors are logged
+    and the preview or job simply proceeds without reuse.
+    """
+
+    KEY_PREFIX = "preview-segments"
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        ttl_seconds: int = settings.preview_reuse_ttl_seconds
+    ):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+
+    def _get_client(self) -> redis.Redis:
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(
+                settings.redis_url, socket_connect_timeout=2, socket_timeout=5
+            )
+        return self.redis_client
+
+    def _make_key(self, source_key: str, target_lang: str) -> str:
+        return f"{self.KEY_PREFIX}:{source_key}:{target_lang.lower()}"
+
+    @staticmethod
+    def segment_hash(segment: str) -> str:
+        """Hash a source segment for use as a hash field."""
+        return hashlib.sha256(segment.encode("utf-8")).hexdigest()
+
+    def save(
+        self,
+        source_key: str,
+        target_lang: str,
+        segments: List[str],
+        translated_segments: List[str],
+        providers: List[Optional[str]],
+        failed: AbstractSet[int] = frozenset()
+    ):
+        """Persist preview translations for a book.
+
+        Args:
+            source_key: R2 storage key of the uploaded EPUB
+            target_lang: Target language code
+            segments: Original preview segments
+            translated_segments: Translations, aligned with segments
+            providers: Provider that produced each translation
+            failed: Indices accepted although they failed validation (not stored)
+        """
+        mapping = {
+            self.segment_hash(segment): json.dumps({"translation": translation, "provider": provider})
+            for i, (segment, translation, provider) in enumerate(zip(segments, translated_segments, providers))
+            if translation and provider and i not in failed
+        }
+        if not mapping:
+            return
+
+        key = self._make_key(source_key, target_lang)
+        try:
+            pipe = self._get_client().pipeline(transaction=False)
+            pipe.hset(key, mapping=mapping)
+            pipe.expire(key, self.ttl_seconds)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to persist preview translations for reuse: {e}")
+            return
+
+        logger.info(f"💾 Saved {len(mapping)} preview translations for reuse ({source_key}, {target_lang})")
+
+    def seed(
+        self,
+        source_key: str,
+        target_lang: str,
+        segments: List[str],
+        providers: AbstractSet[str],
+        validator: TranslationValidator,
+        source_lang: Optional[str] = None
+    ) -> Dict[int, str]:
+        """Find book segments that were already translated by a preview.
+
+        Args:
+            source_key: R2 storage key of the uploaded EPUB
+            target_lang: Target language code
+            segments: All segments of the book
+            providers: Providers the job translates with; other preview output is dropped
+            validator: Validator the job's own translations go through
+            source_lang: Source language code (for the untranslated check)
+
+        Returns:
+            Mapping of segment index to preview translation
+        """
+        try:
+            stored = self._get_client().hgetall(self._make_key(source_key, target_lang))
+        except redis.RedisError as e:
+            logger.warning(f"Failed to load preview translations, translating everything: {e}")
+            return {}
+
+        if not stored:
+            return {}
+
+        entries = {}
+        for field, value in stored.items():
+            try:
+                entry = json.loads(value)
+            except ValueError:
+                # Stored before provenance was recorded
+                continue
+            if entry.get("provider") in providers:
+                entries[field.decode("utf-8")] = entry["translation"]
+
+        candidates = {}
+        for i, segment in enumerate(segments):
+            translation = entries.get(self.segment_hash(segment))
+            if translation is not None:
+                candidates[i] = translation
+        if not candidates:
+            logger.info(f"♻️ No reusable preview segments ({len(stored)} stored, providers {sorted(providers)})")
+            return {}
+
+        indices = list(candidates)
+        report = validator.validate(
+            [segments[i] for i in indices], [candidates[i] for i in indices],
+            target_lang, source_lang=source_lang
+        )
+        for j in report.failed_indices:
+            del candidates[indices[j]]
+
+        logger.info(
+            f"♻️ Reusing {len(candidates)}/{len(segments)} segments from preview "
+            f"({len(stored)} stored, {len(stored) - len(entries)} from other providers, "
+            f"{len(indices) - len(candidates)} failed validation)"
+        )
+        return candidates
+
+
+@lru_cache()
+def get_preview_store() -> PreviewTranslationStore:
+    """Get the process-wide preview translation store."""
+    return PreviewTranslationStore()
@@ -0,0 +1,124 @@
+"""Disk-backed lists of rendered spine documents and segmentation templates.
+
+The worker renders translated and bilingual documents chapter by chapter while
+translation is still running. Instead of keeping every rendered document in
+memory until the output stage, each one is written to the job's temp directory
+as soon as it is rendered and read back only when an output writer iterates
+over it. Likewise the template of each segmented document is written to disk
+as soon as it is segmented and loaded back only to assemble that document.
+"""
+
+import os
+import pickle
+import threading
+from collections.abc import Sequence
+from typing import Any, Dict, Iterator, List, Union
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class DocumentSpool(Sequence):
+    """Sequence of document dicts ({'id', 'href', 'title', 'content'}) stored on disk.
+
+    Only the metadata is kept in memory; indexing or iterating loads one
+    document's content at a time, so writers that handle documents one by
+    one never hold the whole book.
+
+    Documents can be written out of order (``write``) as they finish
+    rendering; once all are written, positions run from 0 to len - 1.
+    A spool pickles as its metadata only, so output renderers in other
+    processes read the same files.
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.directory = os.path.join(directory, name)
+        os.makedirs(self.directory, exist_ok=True)
+        self._entries: Dict[int, Dict] = {}
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+    def write(self, position: int, doc: Dict):
+        """Write a rendered document to disk at its position in the book."""
+        path = os.path.join(self.directory, f"{position:05d}.xhtml")
+        data = doc['content'].encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(data)
+
+        entry = {key: value for key, value in doc.items() if key != 'content'}
+        entry['path'] = path
+        with self._lock:
+            self._entries[position] = entry
+            self.total_bytes += len(data)
+
+    def append(self, doc: Dict):
+        self.write(len(self._entries), doc)
+
+    def extend(self, docs: List[Dict]):
+        for doc in docs:
+            self.append(doc)
+
+    def __getstate__(self) -> Dict:
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state: Dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("DocumentSpool index out of range")
+        entry = self._entries[index]
+        with open(entry['path'], 'rb') as f:
+            content = f.read().decode('utf-8')
+        doc = {key: value for key, value in entry.items() if key != 'path'}
+        doc['content'] = content
+        return doc
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+class TemplateSpool:
+    """Segmentation templates (or any picklable object) stored on disk per document.
+
+    ``pop`` loads a document's template and deletes the file, so each one is
+    in memory only while its document is assembled.
+    """
+
+    def __init__(self, directory: str, name: str):
+        self.directory = os.path.join(directory, name)
+        os.makedirs(self.directory, exist_ok=True)
+        self.total_bytes = 0
+
+    def _path(self, doc_idx: int) -> str:
+        return os.path.join(self.directory, f"{doc_idx:05d}.pickle")
+
+    def write(self, doc_idx: int, template: Any):
+        data = pickle.dumps(template, protocol=pickle.HIGHEST_PROTOCOL)
+        with open(self._path(doc_idx), 'wb') as f:
+            f.write(data)
+        self.total_bytes += len(data)
+
+    def pop(self, doc_idx: int) -> Any:
+        """Load and remove a document's template (None if none was written)."""
+        path = self._path(doc_idx)
+        try:
+            with open(path, 'rb') as f:
+                template = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        os.remove(path)
+        return template
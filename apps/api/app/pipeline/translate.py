@@ -1,20 +1,35 @@
-from typing import List, Optional, Dict, Callable
+from typing import List, Optional, Dict, Callable, Set, Union
 from langdetect import detect
 
 from app.providers.base import TranslationProvider
+from app.providers.sharded import ShardedProvider
 from app.pipeline.placeholders import PlaceholderManager
+from app.pipeline.validation import TranslationValidator, ValidationFailure
+from app.pipeline.translation_memory import TranslationMemory, get_translation_memory
 from app.config import settings
+from app.utils.cost_tracker import CostTracker
 from app.logger import get_logger
 
 logger = get_logger(__name__)
 
+# A single provider, or a ShardedProvider spreading batches over several
+Provider = Union[TranslationProvider, ShardedProvider]
+
 
 class TranslationOrchestrator:
     """Orchestrate translation with validation and quality checks."""
     
-    def __init__(self):
+    def __init__(self, translation_memory: Optional[TranslationMemory] = None):
         self.placeholder_manager = PlaceholderManager()
+        self.validator = TranslationValidator(self.placeholder_manager.combined_pattern)
+        self.translation_memory = translation_memory or get_translation_memory()
+        self.segment_providers: List[Optional[str]] = []
+        self.segment_translators: List[Optional[str]] = []
+        self.failed_segments: Set[int] = set()
         self.max_validation_failures = 2
+        # Share of segments allowed to still fail quality checks (length ratio, untranslated,
+        # wrong script) after all retries; placeholder and missing failures are never allowed
+        self.max_segment_failure_rate = 0.1
 
         # Low-resource languages that should use Gemini only for better quality
         # These languages have limited training data in Llama models
@@ -56,13 +71,25 @@ class TranslationOrchestrator:
         self,
         segments: List[str],
         target_lang: str,
-        primary_provider: TranslationProvider,
+        primary_provider: Provider,
         fallback_provider: Optional[TranslationProvider] = None,
         source_lang: Optional[str] = None,
-        progress_callback: Optional[Callable[[int, int], None]] = None
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        checkpoint_callback: Optional[Callable[[Dict[int, str]], None]] = None
     ) -> tuple[List[str], int, str]:
         """Translate segments with validation and fallback.
+
+        After each call ``segment_providers`` holds every segment's provenance
+        for cost accounting ("memory"/"duplicate" for segments that cost
+        nothing), ``segment_translators`` the provider whose output each
+        segment is, and ``failed_segments`` the indices accepted although
+        they still fail validation.
         
+        Args:
+            checkpoint_callback: Called as each provider batch completes with
+                {segment_index: translation} for the batch's segments that pass
+                validation, so a restarted job can resume from them
+
         Returns:
             tuple: (translated_segments, tokens_actual, provider_used)
         """
@@ -75,78 +102,286 @@ class TranslationOrchestrator:
             source_lang = self._detect_source_language(segments[:5])  # Sample first 5
         
         # Check if we should force Gemini for low-resource languages
-        provider_to_use = self._select_provider(
+        provider_to_use = self.select_provider(
             target_lang, primary_provider, fallback_provider
         )
         
-        validation_failures = 0
-        
-        while validation_failures < self.max_validation_failures:
+        # Step 1: Apply placeholder protection (once - retries reuse the same map)
+        protected_segments, placeholder_map = self.placeholder_manager.protect_segments(segments)
+
+        translated_segments: List[Optional[str]] = [None] * len(segments)
+        # Provenance for cost accounting: provider name per segment ("memory" for cache hits)
+        self.segment_providers: List[Optional[str]] = [None] * len(segments)
+        self.segment_translators: List[Optional[str]] = [None] * len(segments)
+        self.failed_segments = set()
+        pending = list(range(len(segments)))
+        provider_used = None
+        attempts = 0
+        # Why each still-pending segment failed its latest validation
+        failure_flags: Dict[int, ValidationFailure] = {}
+
+        # Translate every segment once, then re-dispatch only the segments that
+        # failed placeholder or quality validation instead of the whole book
+        while pending and attempts < self.max_validation_failures:
+            attempts += 1
+            is_retry = provider_used is not None
+
             try:
-                # Step 1: Apply placeholder protection
-                protected_segments, placeholder_map = self.placeholder_manager.protect_segments(segments)
-                
-                # Step 2: Translate protected segments
-                translated_protected = await provider_to_use.translate_segments(
-                    protected_segments,
+                # Step 2: Translate protected segments (all of them, or just the failures),
+                # serving what we can from the translation memory
+                pending_protected = [protected_segments[i] for i in pending]
+                translated_protected, cached, sources = await self._translate_with_memory(
+                    provider_to_use,
+                    pending_protected,
                     source_lang,
                     target_lang,
-                    progress_callback=progress_callback
+                    # Progress tracks the full pass only; retry batches are a small tail
+                    progress_callback=None if is_retry else progress_callback,
+                    batch_callback=self._make_checkpoint_batch_callback(
+                        checkpoint_callback, pending, segments, placeholder_map, source_lang, target_lang
+                    ) if checkpoint_callback else None
                 )
-                
+
                 # Step 3: Restore placeholders
-                translated_segments, placeholder_valid = self.placeholder_manager.restore_segments(
-                    translated_protected, placeholder_map
+                restored, placeholder_failed = self.placeholder_manager.restore_segments(
+                    translated_protected,
+                    {j: placeholder_map[i] for j, i in enumerate(pending)}
                 )
 
                 # Step 4: Validate translation quality (with language-specific thresholds)
-                quality_valid = self.placeholder_manager.validate_translation_quality(
-                    segments, translated_segments, target_lang
+                report = self.validator.validate(
+                    [segments[i] for i in pending], restored, target_lang,
+                    source_lang=source_lang, placeholder_failed=placeholder_failed
                 )
-                
-                # Check if validation passed
-                if placeholder_valid and quality_valid:
-                    tokens_actual = self._estimate_tokens_used(segments, translated_segments)
-                    logger.info(
-                        f"Translation successful: {len(segments)} segments, "
-                        f"{tokens_actual} tokens, provider: {provider_to_use.name}"
+
+                # Splice results back in place and keep only failing segments pending
+                for j, i in enumerate(pending):
+                    translated_segments[i] = restored[j]
+                    self.segment_providers[i] = sources[j]
+                    # Memory hits and repeats come from the provider's own earlier output
+                    self.segment_translators[i] = (
+                        provider_to_use.name if sources[j] in ("memory", "duplicate") else sources[j]
                     )
-                    return translated_segments, tokens_actual, provider_to_use.name
-                
-                # Validation failed
-                validation_failures += 1
-                logger.warning(
-                    f"Translation validation failed (attempt {validation_failures}). "
-                    f"Placeholder valid: {placeholder_valid}, Quality valid: {quality_valid}"
+
+                failing = set(report.failed_indices)
+                for j in failing:
+                    failure_flags[pending[j]] = report.failures(j)
+
+                # Only translations that passed validation are worth remembering
+                self.translation_memory.store(
+                    {
+                        pending_protected[j]: translated_protected[j]
+                        for j in range(len(pending))
+                        if j not in failing and j not in cached
+                    },
+                    source_lang,
+                    target_lang,
+                    self._memory_model(provider_to_use)
                 )
-                
-                # Try fallback provider if available and we haven't tried it yet
-                if (validation_failures == 1 and 
-                    fallback_provider and 
-                    provider_to_use.name != fallback_provider.name):
-                    
-                    logger.info(f"Switching to fallback provider: {fallback_provider.name}")
-                    provider_to_use = fallback_provider
-                
+
+                pending = [pending[j] for j in sorted(failing)]
+
+                if provider_used is None:
+                    provider_used = provider_to_use.name
+
+                if pending:
+                    logger.warning(
+                        f"Translation validation failed for {len(pending)} segments "
+                        f"(attempt {attempts}): {report.summary()['reasons']}"
+                    )
+
             except Exception as e:
-                validation_failures += 1
                 logger.error(
-                    f"Translation attempt {validation_failures} failed: {e}"
+                    f"Translation attempt {attempts} failed for {len(pending)} segments: {e}"
                 )
-                
-                # Try fallback provider on error
-                if (validation_failures == 1 and 
-                    fallback_provider and 
-                    provider_to_use.name != fallback_provider.name):
-                    
-                    logger.info(f"Switching to fallback provider due to error: {fallback_provider.name}")
-                    provider_to_use = fallback_provider
-        
-        # All attempts failed
-        raise Exception(
-            f"Translation failed after {self.max_validation_failures} attempts"
+
+            # Try fallback provider if available and we haven't tried it yet
+            if (pending and
+                fallback_provider and
+                provider_to_use.name != fallback_provider.name):
+
+                logger.info(
+                    f"Switching to fallback provider: {fallback_provider.name} "
+                    f"for {len(pending)} segments"
+                )
+                provider_to_use = fallback_provider
+
+        # Segments that were never translated mean the provider calls themselves failed
+        if provider_used is None or any(segment is None for segment in translated_segments):
+            raise Exception(
+                f"Translation failed after {self.max_validation_failures} attempts"
+            )
+
+        # Lost/invented placeholders and missing translations are never shipped
+        broken = [
+            i for i in pending
+            if failure_flags.get(i, 0) & (ValidationFailure.PLACEHOLDERS | ValidationFailure.MISSING)
+        ]
+        if broken:
+            raise Exception(
+                f"Translation failed after {self.max_validation_failures} attempts: "
+                f"{len(broken)} segments still have missing translations or placeholders"
+            )
+
+        # Keep the best effort for a small tail of quality failures, fail otherwise
+        failure_rate = len(pending) / len(segments)
+        if failure_rate > self.max_segment_failure_rate:
+            raise Exception(
+                f"Translation failed after {self.max_validation_failures} attempts: "
+                f"{len(pending)}/{len(segments)} segments still failing validation"
+            )
+
+        self.failed_segments = set(pending)
+        if pending:
+            logger.warning(
+                f"Accepting {len(pending)}/{len(segments)} segments that still fail "
+                f"quality checks ({failure_rate:.1%}): {pending[:20]}"
+            )
+
+        tokens_actual = self._estimate_tokens_used(segments, translated_segments)
+        logger.info(
+            f"Translation successful: {len(segments)} segments, "
+            f"{tokens_actual} tokens, provider: {provider_used}"
         )
+        return translated_segments, tokens_actual, provider_used
     
+    async def _translate_with_memory(
+        self,
+        provider: Provider,
+        protected_segments: List[str],
+        source_lang: str,
+        target_lang: str,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        batch_callback: Optional[Callable[[List[int], List[str]], None]] = None
+    ) -> tuple[List[str], set, List[str]]:
+        """Translate protected segments, sending only translation memory misses to the provider.
+
+        Identical misses (running heads, "CHAPTER I", repeated TOC entries) are
+        sent once and the translation is fanned out to every occurrence;
+        dedup happens after placeholder protection, so "Page 12" and "Page 13"
+        share one request too and are restored with their own numbers.
+
+        batch_callback receives (positions in protected_segments, translations)
+        for every provider batch as it completes.
+
+        Returns:
+            tuple: (translated_protected_segments, indices served from memory,
+            name of the provider that translated each segment, "memory" or
+            "duplicate" for repeated occurrences)
+        """
+        cached = self.translation_memory.lookup(
+            protected_segments, source_lang, target_lang, self._memory_model(provider)
+        )
+        misses = [j for j in range(len(protected_segments)) if j not in cached]
+
+        translated = [cached.get(j) for j in range(len(protected_segments))]
+        sources = ["memory"] * len(protected_segments)
+
+        if misses:
+            # Positions of every occurrence of each distinct miss, in first-seen order
+            occurrences: Dict[str, List[int]] = {}
+            for j in misses:
+                occurrences.setdefault(protected_segments[j], []).append(j)
+            unique_texts = list(occurrences)
+            unique_positions = list(occurrences.values())
+            self._log_dedup(provider, unique_texts, unique_positions, target_lang)
+
+            def fan_out_batch(offset: int, batch: List[str]):
+                batch_positions = unique_positions[offset:offset + len(batch)]
+                batch_callback(
+                    [j for positions in batch_positions for j in positions],
+                    [result for positions, result in zip(batch_positions, batch) for _ in positions]
+                )
+
+            provider_results = await provider.translate_segments(
+                unique_texts,
+                source_lang,
+                target_lang,
+                progress_callback=progress_callback,
+                batch_callback=fan_out_batch if batch_callback else None
+            )
+
+            if len(provider_results) != len(unique_texts):
+                raise Exception(
+                    f"Provider returned {len(provider_results)} segments "
+                    f"for {len(unique_texts)} inputs"
+                )
+
+            # Sharded providers report which member translated each segment
+            miss_sources = getattr(provider, "last_segment_providers", None) or [provider.name] * len(unique_texts)
+
+            for positions, result, source in zip(unique_positions, provider_results, miss_sources):
+                for k, j in enumerate(positions):
+                    translated[j] = result
+                    # Repeats were never sent, so they cost nothing
+                    sources[j] = source if k == 0 else "duplicate"
+
+        return translated, set(cached), sources
+
+    def _log_dedup(
+        self,
+        provider: Provider,
+        unique_texts: List[str],
+        unique_positions: List[List[int]],
+        target_lang: str
+    ):
+        """Report how many segments dedup kept from being sent."""
+        duplicates = [
+            text for text, positions in zip(unique_texts, unique_positions)
+            for _ in range(len(positions) - 1)
+        ]
+        if not duplicates:
+            return
+
+        # A sharded provider has no price of its own; price the savings at its first member's rate
+        priced = provider.members[0] if isinstance(provider, ShardedProvider) else provider
+        estimator = priced.token_estimator
+        CostTracker.log_segment_dedup(
+            provider=priced.name,
+            model=priced.model,
+            total_segments=len(unique_texts) + len(duplicates),
+            unique_segments=len(unique_texts),
+            saved_input_tokens=sum(estimator.estimate(text) for text in duplicates),
+            saved_output_tokens=sum(estimator.estimate_translation(text, target_lang) for text in duplicates)
+        )
+
+    def _make_checkpoint_batch_callback(
+        self,
+        checkpoint_callback: Callable[[Dict[int, str]], None],
+        pending: List[int],
+        segments: List[str],
+        placeholder_map: Dict,
+        source_lang: Optional[str],
+        target_lang: str
+    ) -> Callable[[List[int], List[str]], None]:
+        """Build a batch callback that checkpoints a batch's validated translations."""
+
+        def checkpoint_batch(positions: List[int], translated_protected: List[str]):
+            indices = [pending[j] for j in positions]
+            restored, placeholder_failed = self.placeholder_manager.restore_segments(
+                translated_protected,
+                {k: placeholder_map[i] for k, i in enumerate(indices)}
+            )
+            report = self.validator.validate(
+                [segments[i] for i in indices], restored, target_lang,
+                source_lang=source_lang, placeholder_failed=placeholder_failed
+            )
+            failing = set(report.failed_indices)
+
+            try:
+                checkpoint_callback({
+                    i: restored[k] for k, i in enumerate(indices) if k not in failing
+                })
+            except Exception as e:
+                # A lost checkpoint only costs a re-translation on resume
+                logger.warning(f"Failed to checkpoint batch: {e}")
+
+        return checkpoint_batch
+
+    def _memory_model(self, provider: Provider) -> str:
+        """Identify the model a translation came from in translation memory keys."""
+        return f"{provider.name}:{provider.model}"
+
     def _detect_source_language(self, sample_segments: List[str]) -> str:
         """Auto-detect source language from sample text."""
         try:
@@ -162,16 +397,21 @@ class TranslationOrchestrator:
             logger.warning(f"Language detection failed: {e}. Defaulting to 'en'")
             return "en"
     
-    def _select_provider(
+    def select_provider(
         self,
         target_lang: str,
-        primary_provider: TranslationProvider,
+        primary_provider: Provider,
         fallback_provider: Optional[TranslationProvider]
-    ) -> TranslationProvider:
+    ) -> Provider:
         """Select appropriate provider based on target language."""
         
         # Force Gemini for low-resource languages
         if target_lang.lower() in self.gemini_only_languages:
+            if isinstance(primary_provider, ShardedProvider):
+                gemini_shards = primary_provider.restricted_to({"gemini"})
+                if gemini_shards:
+                    logger.info(f"Sharding across Gemini keys only for low-resource language: {target_lang}")
+                    return gemini_shards
             if primary_provider.name == "gemini":
                 logger.info(f"Using Gemini for low-resource language: {target_lang}")
                 return primary_provider
@@ -0,0 +1,172 @@
+"""Translation memory shared by preview generation and translation jobs.
+
+Segments are cached in Redis under a content-addressed key derived from the
+placeholder-protected source text, the language pair and the provider model,
+so repeated content (previews followed by the paid job, Gutenberg licences,
+boilerplate front matter) never goes back to the API.
+
+Every hit refreshes the entry's TTL, so rarely used translations expire first;
+with Redis configured for ``allkeys-lru`` the least recently used entries are
+also evicted under memory pressure.
+"""
+
+import hashlib
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+import redis
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TranslationMemory:
+    """Redis-backed content-addressed store of segment translations.
+
+    The memory is a cache: any Redis error disables it for the rest of the
+    process and translation carries on against the provider as usual.
+    """
+
+    KEY_PREFIX = "tm"
+    STATS_KEY = "tm:stats"
+    MGET_CHUNK_SIZE = 500
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        ttl_seconds: int = settings.translation_memory_ttl_seconds,
+        enabled: bool = settings.translation_memory_enabled
+    ):
+        self.redis_client = redis_client
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def _get_client(self) -> redis.Redis:
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(
+                settings.redis_url, socket_connect_timeout=2, socket_timeout=5
+            )
+        return self.redis_client
+
+    def _disable(self, error: Exception):
+        logger.warning(f"Translation memory unavailable, continuing without cache: {error}")
+        self.enabled = False
+
+    def make_key(self, text: str, source_lang: Optional[str], target_lang: str, model: str) -> str:
+        """Build the cache key for one segment."""
+        digest = hashlib.sha256(
+            f"{source_lang or ''}\x1f{target_lang}\x1f{model}\x1f{text}".encode("utf-8")
+        ).hexdigest()
+        return f"{self.KEY_PREFIX}:{digest}"
+
+    def lookup(
+        self,
+        texts: List[str],
+        source_lang: Optional[str],
+        target_lang: str,
+        model: str
+    ) -> Dict[int, str]:
+        """Look up cached translations.
+
+        Args:
+            texts: Source segments (placeholder-protected)
+            source_lang: Source language code
+            target_lang: Target language code
+            model: Provider model identifier (e.g. "gemini:gemini-2.5-flash-lite")
+
+        Returns:
+            Mapping of index in ``texts`` to cached translation
+        """
+        if not self.enabled or not texts:
+            return {}
+
+        keys = [self.make_key(text, source_lang, target_lang, model) for text in texts]
+        found: Dict[int, str] = {}
+
+        try:
+            client = self._get_client()
+            for start in range(0, len(keys), self.MGET_CHUNK_SIZE):
+                chunk = keys[start:start + self.MGET_CHUNK_SIZE]
+                values = client.mget(chunk)
+
+                # Sliding expiry: entries that keep getting hit stay cached
+                pipe = client.pipeline(transaction=False)
+                for offset, value in enumerate(values):
+                    if value is not None:
+                        found[start + offset] = value.decode("utf-8")
+                        pipe.expire(chunk[offset], self.ttl_seconds)
+                pipe.execute()
+
+            hits = len(found)
+            misses = len(texts) - hits
+            self.hits += hits
+            self.misses += misses
+            client.hincrby(self.STATS_KEY, "hits", hits)
+            client.hincrby(self.STATS_KEY, "misses", misses)
+        except redis.RedisError as e:
+            self._disable(e)
+            return {}
+
+        logger.info(
+            f"🧠 Translation memory: {len(found)}/{len(texts)} segments cached "
+            f"({len(found) / len(texts):.1%} hit rate, model: {model})"
+        )
+        return found
+
+    def store(
+        self,
+        entries: Dict[str, str],
+        source_lang: Optional[str],
+        target_lang: str,
+        model: str
+    ):
+        """Store validated translations.
+
+        Args:
+            entries: Mapping of source segment (placeholder-protected) to translation
+            source_lang: Source language code
+            target_lang: Target language code
+            model: Provider model identifier
+        """
+        if not self.enabled or not entries:
+            return
+
+        try:
+            pipe = self._get_client().pipeline(transaction=False)
+            for text, translation in entries.items():
+                pipe.setex(
+                    self.make_key(text, source_lang, target_lang, model),
+                    self.ttl_seconds,
+                    translation
+                )
+            pipe.execute()
+        except redis.RedisError as e:
+            self._disable(e)
+            return
+
+        logger.info(f"🧠 Stored {len(entries)} translations in translation memory")
+
+    def get_stats(self) -> Dict[str, int]:
+        """Get hit/miss counters for this process and across all processes."""
+        stats = {"hits": self.hits, "misses": self.misses}
+        if not self.enabled:
+            return stats
+
+        try:
+            totals = self._get_client().hgetall(self.STATS_KEY)
+            stats["total_hits"] = int(totals.get(b"hits", 0))
+            stats["total_misses"] = int(totals.get(b"misses", 0))
+        except redis.RedisError as e:
+            self._disable(e)
+
+        return stats
+
+
+@lru_cache()
+def get_translation_memory() -> TranslationMemory:
+    """Get the process-wide translation memory instance."""
+    return TranslationMemory()
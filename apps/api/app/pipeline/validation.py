@@ -0,0 +1,225 @@
+"""Per-segment translation quality validation.
+
+Every translated segment is checked for:
+- a length ratio outside the expected range for the target language
+- a missing (empty) translation, e.g. an ID dropped from a batch response
+- an untranslated segment returned identical to the source
+- a translation mostly in another script than the target language's (e.g.
+  left in English for a Russian target). Targets whose script is unknown
+  are not checked, and Latin names and acronyms kept in a non-Latin
+  translation don't count
+- placeholders that did not survive translation (reported by
+  PlaceholderManager.restore_segments)
+
+The result is a ValidationReport: one bitmask per segment plus summary
+stats, so the orchestrator re-dispatches only the failing segments and can
+tell why they failed. Per-string features are collected in one pass over the
+segments; the length ratios and the mask are computed with NumPy.
+"""
+
+import re
+from enum import IntFlag
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.utils.token_estimator import LANGUAGE_SCRIPTS, LATIN_LANGUAGES, count_script_chars
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Everything that is not a letter (digits, punctuation, whitespace, underscore)
+_NON_LETTERS = re.compile(r'[\W\d_]+')
+
+# Capitalized Latin words and acronyms (names, brands, abbreviations)
+_LATIN_NAMES = re.compile(r'\b[A-Z][A-Za-z]*\b')
+
+
+class ValidationFailure(IntFlag):
+    """Reasons a segment failed validation (bits of ValidationReport.mask)."""
+    LENGTH_RATIO = 1
+    MISSING = 2
+    UNTRANSLATED = 4
+    WRONG_SCRIPT = 8
+    PLACEHOLDERS = 16
+
+
+class ValidationReport:
+    """Validation result for a list of segments.
+
+    ``mask`` holds one ValidationFailure bitmask per segment (0 = passed);
+    ``ratios`` the translated/original length ratio per segment.
+    """
+
+    def __init__(self, mask: np.ndarray, ratios: List[float]):
+        self.mask = mask
+        self.ratios = ratios
+
+    def __len__(self) -> int:
+        return len(self.mask)
+
+    def failures(self, index: int) -> ValidationFailure:
+        return ValidationFailure(int(self.mask[index]))
+
+    @property
+    def failed_indices(self) -> List[int]:
+        return np.flatnonzero(self.mask).tolist()
+
+    def count(self, failure: ValidationFailure) -> int:
+        return int(np.count_nonzero(self.mask & failure))
+
+    def summary(self) -> Dict:
+        """Segment and failure counts (overall and per reason) for logging."""
+        failed = len(self.failed_indices)
+        counts = {failure.name.lower(): self.count(failure) for failure in ValidationFailure}
+        return {
+            'segments': len(self.mask),
+            'failed': failed,
+            'failure_rate': round(failed / max(len(self.mask), 1), 4),
+            'reasons': {reason: count for reason, count in counts.items() if count},
+        }
+
+
+class TranslationValidator:
+    """Validate translated segments against their originals."""
+
+    # Length ratio thresholds (translated / original characters)
+    # CJK and Thai languages naturally compress text (use fewer characters)
+    COMPACT_LANGUAGES = {'zh', 'ja', 'ko', 'th'}
+    COMPACT_RATIO_RANGE = (0.2, 2.5)
+    RATIO_RANGE = (0.6, 1.8)
+
+    # Only segments with at least this many letters are checked for script and
+    # identity, so names, numerals and short titles can legitimately carry over
+    MIN_SCRIPT_LETTERS = 8
+    MIN_UNTRANSLATED_LETTERS = 20
+
+    def __init__(self, protected_pattern: Optional[re.Pattern] = None):
+        # Content that is never translated (tags, URLs, ...), ignored by the script check
+        self.protected_pattern = protected_pattern
+
+    def validate(
+        self,
+        original_segments: List[str],
+        translated_segments: List[str],
+        target_lang: str = "en",
+        source_lang: Optional[str] = None,
+        placeholder_failed: Iterable[int] = ()
+    ) -> ValidationReport:
+        """Validate translations segment by segment.
+
+        Args:
+            original_segments: Original text segments
+            translated_segments: Translated (placeholder-restored) segments
+            target_lang: Target language code for thresholds and script
+            source_lang: Source language code; identical output only counts as
+                untranslated when it differs from the target
+            placeholder_failed: Indices whose placeholders did not survive
+
+        Returns:
+            ValidationReport (every segment MISSING if the counts don't match)
+        """
+        n = len(original_segments)
+        if len(translated_segments) != n:
+            logger.error(f"Segment count mismatch: {n} -> {len(translated_segments)}")
+            return ValidationReport(_mask([(ValidationFailure.MISSING, [True] * n)], n), [0.0] * n)
+
+        target = _base_language(target_lang)
+        min_ratio, max_ratio = (
+            self.COMPACT_RATIO_RANGE if target in self.COMPACT_LANGUAGES else self.RATIO_RANGE
+        )
+        target_script = _language_script(target)
+        check_identity = bool(source_lang) and _base_language(source_lang) != target
+
+        # Per-string features (one pass); empty originals are never failures
+        has_text = [bool(original.strip()) for original in original_segments]
+        missing = [
+            present and not translated.strip()
+            for present, translated in zip(has_text, translated_segments)
+        ]
+        ratios = _length_ratios(original_segments, translated_segments)
+        bad_ratio = [
+            present and not is_missing and not (min_ratio <= ratio <= max_ratio)
+            for present, is_missing, ratio in zip(has_text, missing, ratios)
+        ]
+        untranslated = [
+            check_identity and translated.strip() == original.strip()
+            and len(_NON_LETTERS.sub('', original)) >= self.MIN_UNTRANSLATED_LETTERS
+            for original, translated in zip(original_segments, translated_segments)
+        ]
+        wrong_script = [
+            target_script is not None and not is_missing
+            and self._dominant_script(translated, target_script) not in (None, target_script)
+            for translated, is_missing in zip(translated_segments, missing)
+        ]
+        placeholders = [False] * n
+        for i in placeholder_failed:
+            placeholders[i] = True
+
+        mask = _mask([
+            (ValidationFailure.LENGTH_RATIO, bad_ratio),
+            (ValidationFailure.MISSING, missing),
+            (ValidationFailure.UNTRANSLATED, untranslated),
+            (ValidationFailure.WRONG_SCRIPT, wrong_script),
+            (ValidationFailure.PLACEHOLDERS, placeholders),
+        ], n)
+        report = ValidationReport(mask, ratios)
+
+        summary = report.summary()
+        logger.info(
+            f"Translation quality check: {summary['failed']}/{n} "
+            f"suspicious segments ({summary['failure_rate']:.1%})"
+            + (f" {summary['reasons']}" if summary['reasons'] else "")
+        )
+        return report
+
+    def _dominant_script(self, text: str, target_script: str) -> Optional[str]:
+        """Script of most of the letters in text (None if too few letters to tell).
+
+        Protected content (tags, URLs, emails) is ignored, so markup and links
+        don't make e.g. a Russian translation look Latin. For non-Latin
+        targets, capitalized Latin words and acronyms are ignored too: names
+        like "NASA" or "London" are often kept as is.
+        """
+        if self.protected_pattern is not None:
+            text = self.protected_pattern.sub('', text)
+        if target_script != 'latin':
+            text = _LATIN_NAMES.sub('', text)
+        letters = _NON_LETTERS.sub('', text)
+        if len(letters) < self.MIN_SCRIPT_LETTERS:
+            return None
+        # Fast path for the common case of plain ASCII text
+        if letters.isascii():
+            return 'latin'
+        counts = count_script_chars(letters)
+        return max(counts, key=counts.get)
+
+
+def _base_language(lang: str) -> str:
+    return (lang or '').lower().split('-')[0]
+
+
+def _language_script(lang: str) -> Optional[str]:
+    """Script a language is written in (None if unknown: not checked)."""
+    if lang in LANGUAGE_SCRIPTS:
+        return LANGUAGE_SCRIPTS[lang]
+    return 'latin' if lang in LATIN_LANGUAGES else None
+
+
+def _length_ratios(original_segments: List[str], translated_segments: List[str]) -> List[float]:
+    """Translated/original length per segment (0.0 for empty originals)."""
+    original_lengths = np.fromiter(map(len, original_segments), dtype=np.float64, count=len(original_segments))
+    translated_lengths = np.fromiter(map(len, translated_segments), dtype=np.float64, count=len(translated_segments))
+    ratios = np.divide(
+        translated_lengths, original_lengths,
+        out=np.zeros_like(translated_lengths), where=original_lengths > 0
+    )
+    return ratios.tolist()
+
+
+def _mask(checks: List[tuple], n: int) -> np.ndarray:
+    """Combine (flag, per-segment booleans) checks into one bitmask per segment."""
+    mask = np.zeros(n, dtype=np.uint8)
+    for flag, check in checks:
+        mask |= np.fromiter(check, dtype=bool, count=n).astype(np.uint8) * np.uint8(flag)
+    return mask
@@ -2,33 +2,26 @@ import os
 import tempfile
 import uuid
 import asyncio
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
-
-# Enhanced PDF generation import
-try:
-    import sys
-    from pathlib import Path
-    # Add root directory to path for enhanced PDF converter
-    root_dir = Path(__file__).parent.parent.parent.parent
-    sys.path.insert(0, str(root_dir))
-    from epub_to_pdf_with_images import convert_epub_to_pdf
-    ENHANCED_PDF_AVAILABLE = True
-except Exception:
-    convert_epub_to_pdf = None
-    ENHANCED_PDF_AVAILABLE = False
-from bs4 import BeautifulSoup
+from rq import get_current_job
 from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.db import SessionLocal
 from app.models import Job
 from app.storage import get_storage
-from app.providers.factory import get_provider
-from app.pipeline.epub_io import EPUBProcessor
+from app.providers.factory import get_provider, get_sharded_provider
+from app.providers.sharded import ShardedProvider
+from app.pipeline.epub_io import EPUBProcessor, SpineContentReader
 from app.pipeline.html_segment import HTMLSegmenter
 from app.pipeline.translate import TranslationOrchestrator
-from app.pricing import calculate_provider_cost_cents
+from app.pipeline.preview_store import get_preview_store
+from app.pipeline.checkpoints import get_checkpoint_store
+from app.pipeline.spool import DocumentSpool, TemplateSpool
+from app.pricing import calculate_segment_cost_cents
 from app.logger import get_logger, set_request_id, setup_logging
 
 # Initialize logging for worker process
@@ -57,6 +50,7 @@ def translate_epub(job_id: str):
     
     # Get database session
     db = SessionLocal()
+    job = None
     
     try:
         # Retrieve job details from database
@@ -65,6 +59,11 @@ def translate_epub(job_id: str):
             logger.error(f"Job {job_id} not found in database")
             return
 
+        if job.status == "done":
+            # Retried after the worker died between completing and returning
+            logger.info(f"Job {job_id} already completed - nothing to do")
+            return
+
         logger.info(f"🚀 Starting translation │ Job: {job_id[:13]}... │ Lang: {job.target_lang} │ Provider: {job.provider}")
         logger.info(f"📥 WORKER READ FROM DB: job_id={job_id}, output_format={repr(job.output_format)}")
         
@@ -100,8 +99,16 @@ def translate_epub(job_id: str):
             epub_processor = EPUBProcessor()
             segmenter = HTMLSegmenter()
             
-            original_book, spine_docs = epub_processor.read_epub(epub_path)
-            segments, reconstruction_maps = segmenter.segment_documents(spine_docs)
+            # Documents are parsed, sanitized and segmented together (in a process pool for large books).
+            # Each document's XHTML is decoded only while it is segmented, and its template is
+            # spooled to disk right away: until assembly only the segment texts stay in memory
+            original_book, spine_docs = epub_processor.read_epub(epub_path, parse_documents=False, load_content=False)
+            spine_reader = SpineContentReader(original_book)
+            templates = TemplateSpool(temp_dir, "templates")
+            segments, reconstruction_maps = segmenter.segment_documents(
+                spine_docs, load_content=spine_reader, templates=templates
+            )
+            logger.info(f"📝 Spooled {templates.total_bytes / 1e6:.1f} MB of document templates to disk")
             
             if not segments:
                 raise Exception("No translatable content found in EPUB")
@@ -114,44 +121,46 @@ def translate_epub(job_id: str):
             # Full book translations ALWAYS use Gemini for best quality
             # (provider_name is set to "gemini" in checkout.py and skip_payment.py)
             # Fallback to Groq only for error recovery (should rarely happen)
-            primary_provider = get_provider(provider_name)
+            # With sharding enabled, batches are spread over every Gemini/Groq key instead
+            if settings.provider_sharding_enabled:
+                primary_provider = get_sharded_provider()
+            else:
+                primary_provider = get_provider(provider_name)
             fallback_provider = get_provider("groq" if provider_name == "gemini" else "gemini")
 
             orchestrator = TranslationOrchestrator()
 
-            # Create progress callback for batch-level updates
-            def update_translation_progress(batch_index: int, total_batches: int):
-                """Update job progress based on batch completion."""
-                # Translation phase is 30%-60% of total progress
-                progress = 30 + int((batch_index / total_batches) * 30)
-                job.progress_percent = min(progress, 60)  # Cap at 60%
-                db.commit()
-                logger.info(f"⚡ Translation progress: {job.progress_percent}% │ Batch: {batch_index}/{total_batches} │ Job: {job_id[:13]}...")
-
-            translated_segments, tokens_actual, provider_used = asyncio.run(
-                orchestrator.translate_segments(
-                    segments=segments,
-                    target_lang=target_lang,
-                    primary_provider=primary_provider,
-                    fallback_provider=fallback_provider,
-                    source_lang=job.source_lang,
-                    progress_callback=update_translation_progress
-                )
+            # Seed the output with segments the user's preview already translated,
+            # plus any batches checkpointed by a previous run of this job
+            checkpoint_store = get_checkpoint_store()
+            segments_fingerprint = checkpoint_store.fingerprint(segments)
+            translated_segments = [None] * len(segments)
+            # Provenance per segment for cost accounting (preview reuse is free for the job)
+            segment_providers = [None] * len(segments)
+            # Only previews from the providers this job translates with are reused
+            job_provider = orchestrator.select_provider(target_lang, primary_provider, fallback_provider)
+            job_providers = (
+                {member.name for member in job_provider.members}
+                if isinstance(job_provider, ShardedProvider) else {job_provider.name}
             )
-            
-            # Update job with actual usage
-            job.tokens_actual = tokens_actual
-            job.provider = provider_used
-            job.provider_cost_cents = calculate_provider_cost_cents(tokens_actual, provider_used)
-            
-            # Handle provider fallback tracking
-            if provider_used != provider_name:
-                job.failover_count += 1
-            
-            # Step 4: Reconstruct documents
-            job.progress_step = "assembling"
-            job.progress_percent = 60
-            db.commit()
+            seeded = get_preview_store().seed(
+                source_key, target_lang, segments, job_providers,
+                orchestrator.validator, source_lang=job.source_lang
+            )
+            for i in seeded:
+                segment_providers[i] = "preview"
+            checkpointed = checkpoint_store.load(job_id, segments_fingerprint)
+            for i in checkpointed:
+                segment_providers[i] = provider_name
+            seeded.update(checkpointed)
+            for i, translation in seeded.items():
+                translated_segments[i] = translation
+            remaining = [i for i in range(len(segments)) if i not in seeded]
+            seeded_fraction = len(seeded) / len(segments)
+
+            if seeded:
+                job.progress_percent = 30 + int(seeded_fraction * 30)
+                db.commit()
 
             # Check output format (for user download access control)
             output_format = getattr(job, 'output_format', 'translation')
@@ -161,23 +170,169 @@ def translate_epub(job_id: str):
             # ALWAYS generate both translation and bilingual versions
             from app.pipeline.bilingual_html import create_bilingual_documents
 
-            # Reconstruct standard translation documents
-            translated_docs = segmenter.reconstruct_documents(
-                translated_segments, reconstruction_maps, spine_docs
-            )
+            # Translate one window of chapters at a time and assemble each spine document
+            # as soon as all of its segments are final: a document whose segments all
+            # passed validation in checkpointed batches is rendered on the assembly pool
+            # while translation continues, the rest as soon as their window is done.
+            # Templates are loaded from disk one document at a time and rendered documents
+            # are spooled back to disk. What stays in memory for the whole book is the
+            # segment text (source and translated: the checkpoint fingerprint, preview
+            # reuse, cost accounting and the bilingual TXT need it) and ebooklib's
+            # original_book, which the EPUB and PDF writers copy every item from
+            windows = _chapter_windows(reconstruction_maps, segments, settings.translation_window_chars)
+            rtl = orchestrator.should_use_rtl_layout(target_lang)
+            translated_docs = DocumentSpool(temp_dir, "translated")
+            bilingual_docs = DocumentSpool(temp_dir, "bilingual")
+            remaining_set = set(remaining)
+            tokens_actual, provider_used = 0, None
+            logger.info(f"📚 Processing {len(reconstruction_maps)} documents in {len(windows)} chapter windows")
+
+            # Document of each segment, and segments per document still awaiting a final translation
+            segment_docs = [None] * len(segments)
+            untranslated_counts = {}
+            for doc_map in reconstruction_maps:
+                start = doc_map['segment_start']
+                segment_docs[start:start + doc_map['segment_count']] = [doc_map['doc_idx']] * doc_map['segment_count']
+                untranslated_counts[doc_map['doc_idx']] = 0
+            for i in remaining:
+                untranslated_counts[segment_docs[i]] += 1
+
+            # Rendering holds the GIL, so one thread is enough to overlap it with the API calls.
+            # The assembly thread must not touch `job`: its attributes expire on every commit
+            # and reloading them would share the session with the main thread
+            source_lang = job.source_lang or "en"
+            assembly_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="assembly")
+            assembly_futures = {}
+
+            def assemble_document(doc_map: dict):
+                """Render a document's translated and bilingual versions, spool them and free its template."""
+                doc_idx = doc_map['doc_idx']
+                doc_map['template'] = templates.pop(doc_idx)
+                if doc_map['template'] is None:
+                    # Segmentation failed: reconstruction falls back to the document itself
+                    spine_docs[doc_idx]['content'] = spine_reader(spine_docs[doc_idx])
+                # Reconstruct with RTL layout if needed
+                translated_docs.write(doc_idx, segmenter.reconstruct_documents(
+                    translated_segments, [doc_map], spine_docs, rtl=rtl
+                )[0])
+                bilingual_docs.write(doc_idx, create_bilingual_documents(
+                    original_segments=segments,
+                    translated_segments=translated_segments,
+                    reconstruction_maps=[doc_map],
+                    spine_docs=spine_docs,
+                    source_lang=source_lang,
+                    target_lang=target_lang
+                )[0])
+                doc_map['template'] = None
+                spine_docs[doc_idx] = None
+
+            def submit_assembly(doc_idx: int):
+                if doc_idx not in assembly_futures:
+                    assembly_futures[doc_idx] = assembly_pool.submit(assemble_document, reconstruction_maps[doc_idx])
+
+            async def translate_windows():
+                nonlocal tokens_actual, provider_used
+                translated_before = 0  # remaining segments finished in earlier windows
+
+                try:
+                    for window in windows:
+                        window_start = window[0]['segment_start']
+                        window_end = window[-1]['segment_start'] + window[-1]['segment_count']
+                        window_remaining = [i for i in range(window_start, window_end) if i in remaining_set]
+
+                        # Documents seeded entirely by the preview or a checkpoint are ready now
+                        for doc_map in window:
+                            if untranslated_counts[doc_map['doc_idx']] == 0:
+                                submit_assembly(doc_map['doc_idx'])
+
+                        if window_remaining:
+                            def update_translation_progress(batch_index: int, total_batches: int):
+                                """Update job progress based on batch completion."""
+                                # Translation phase is 30%-60% of total progress (seeded segments count as done)
+                                window_done = len(window_remaining) * batch_index / total_batches
+                                remaining_fraction = (translated_before + window_done) / len(remaining)
+                                done_fraction = seeded_fraction + (1 - seeded_fraction) * remaining_fraction
+                                progress = 30 + int(done_fraction * 30)
+                                job.progress_percent = min(progress, 60)  # Cap at 60%
+                                db.commit()
+                                logger.info(f"⚡ Translation progress: {job.progress_percent}% │ Batch: {batch_index}/{total_batches} │ Job: {job_id[:13]}...")
+
+                            def save_checkpoint(batch_translations: dict):
+                                """Persist completed batches (indices are relative to `window_remaining`)."""
+                                validated = {
+                                    window_remaining[k]: translation for k, translation in batch_translations.items()
+                                }
+                                # Validated translations are final, so finished documents can be assembled now
+                                for i, translation in validated.items():
+                                    if translated_segments[i] is None:
+                                        translated_segments[i] = translation
+                                        untranslated_counts[segment_docs[i]] -= 1
+                                        if untranslated_counts[segment_docs[i]] == 0:
+                                            submit_assembly(segment_docs[i])
+                                checkpoint_store.save(job_id, segments_fingerprint, validated)
+
+                            window_translations, window_tokens, window_provider = await orchestrator.translate_segments(
+                                segments=[segments[i] for i in window_remaining],
+                                target_lang=target_lang,
+                                primary_provider=primary_provider,
+                                fallback_provider=fallback_provider,
+                                source_lang=job.source_lang,
+                                progress_callback=update_translation_progress,
+                                checkpoint_callback=save_checkpoint
+                            )
+                            for i, translation, source in zip(
+                                window_remaining, window_translations, orchestrator.segment_providers
+                            ):
+                                translated_segments[i] = translation
+                                segment_providers[i] = source
+
+                            tokens_actual += window_tokens
+                            # Any window that needed the fallback counts as a failover
+                            if provider_used is None or window_provider != primary_provider.name:
+                                provider_used = window_provider
+                            translated_before += len(window_remaining)
+
+                        # Everything in the window is final now (including accepted retries)
+                        for doc_map in window:
+                            submit_assembly(doc_map['doc_idx'])
+                finally:
+                    # The pools belong to this event loop, so close them before asyncio.run() tears it down
+                    await primary_provider.aclose()
+                    await fallback_provider.aclose()
 
-            # Apply RTL layout if needed
-            if orchestrator.should_use_rtl_layout(target_lang):
-                translated_docs = _apply_rtl_layout(translated_docs)
-
-            # Create bilingual documents
-            bilingual_docs = create_bilingual_documents(
-                original_segments=segments,
-                translated_segments=translated_segments,
-                reconstruction_maps=reconstruction_maps,
-                spine_docs=spine_docs,
-                source_lang=job.source_lang or "en",
-                target_lang=target_lang
+            try:
+                asyncio.run(translate_windows())
+                # Wait for the last documents to be assembled (re-raises assembly errors)
+                for future in assembly_futures.values():
+                    future.result()
+            finally:
+                assembly_pool.shutdown(wait=True, cancel_futures=True)
+
+            if not remaining:
+                provider_used = provider_name
+                logger.info("All segments were translated by the preview - skipping provider calls")
+            
+            # Update job with actual usage
+            job.tokens_actual = tokens_actual
+            job.provider = provider_used
+            if isinstance(primary_provider, ShardedProvider) and provider_used == primary_provider.name:
+                # Job.provider names one provider (a retry reads it back): record the busiest member
+                job.provider = _dominant_provider(segment_providers, primary_provider, provider_name)
+            job.provider_cost_cents = calculate_segment_cost_cents(
+                segments, translated_segments, segment_providers
+            )
+            
+            # Handle provider fallback tracking (nothing was sent if the preview covered everything)
+            if remaining and provider_used != primary_provider.name:
+                job.failover_count += 1
+            
+            # Step 4: Documents were assembled window by window during translation
+            job.progress_step = "assembling"
+            job.progress_percent = 60
+            db.commit()
+            logger.info(
+                f"🧩 Assembled {len(translated_docs)} documents "
+                f"({(translated_docs.total_bytes + bilingual_docs.total_bytes) / 1e6:.1f} MB spooled to disk)"
             )
 
             # Step 5: Generate all outputs (6 files total)
@@ -187,7 +342,7 @@ def translate_epub(job_id: str):
 
             # Generate all 6 files
             output_keys = _generate_both_outputs(
-                job_id, temp_dir, original_book,
+                job_id, temp_dir, epub_path, original_book,
                 translated_docs, translated_segments,
                 bilingual_docs,
                 segments,  # Pass original segments for bilingual TXT
@@ -208,7 +363,9 @@ def translate_epub(job_id: str):
             job.status = "done"
             job.progress_step = "done"
             job.progress_percent = 100
+            job.error = None  # From an earlier failed attempt
             db.commit()
+            checkpoint_store.clear(job_id)
             
             logger.info(f"✅ Job completed │ {job_id[:13]}... │ Tokens: {tokens_actual} │ Provider: {provider_used}")
             
@@ -221,11 +378,26 @@ def translate_epub(job_id: str):
                     # Don't fail the job for email issues
     
     except Exception as e:
+        if job is None:
+            raise
+
+        rq_job = get_current_job()
+        job.error = str(e)
+        if rq_job is not None and rq_job.retries_left:
+            # RQ runs the job again, resuming from its checkpoint: only the last attempt fails it
+            logger.warning(
+                f"🔁 Job attempt failed │ {job_id[:13]}... │ Error: {str(e)[:100]} │ "
+                f"Retries left: {rq_job.retries_left}"
+            )
+            job.status = "queued"
+            job.progress_step = "queued"
+            db.commit()
+            raise
+
         logger.error(f"❌ Job failed │ {job_id[:13]}... │ Error: {str(e)[:100]}")
         
         # Update job status
         job.status = "failed"
-        job.error = str(e)
         db.commit()
         
         # Send failure email if provided
@@ -234,6 +406,9 @@ def translate_epub(job_id: str):
                 _send_failure_email(job, email, str(e))
             except Exception as email_error:
                 logger.error(f"Failed to send failure email: {email_error}")
+
+        # Let RQ record the failure too (and keep the traceback in its failed registry)
+        raise
     
     finally:
         db.close()
@@ -415,6 +590,7 @@ def _generate_bilingual_outputs(
 def _generate_both_outputs(
     job_id: str,
     temp_dir: str,
+    epub_path: str,
     original_book,
     translated_docs: list,
     translated_segments: list,
@@ -428,232 +604,23 @@ def _generate_both_outputs(
     Files generated:
     - Translation: {job_id}.epub, {job_id}.pdf, {job_id}.txt
     - Bilingual: {job_id}_bilingual.epub, {job_id}_bilingual.pdf, {job_id}_bilingual.txt
-    """
-    import sys
-    import os
-    import asyncio
-    from pathlib import Path
 
-    # Add common modules to path (3 levels up from worker.py: pipeline -> app -> api -> project root)
-    project_root = Path(__file__).parent.parent.parent.parent.parent
-    common_path = project_root / "common"
-    if not common_path.exists():
-        # Fallback: calculate from cwd (for testing environments)
-        project_root = Path(os.getcwd())
-        common_path = project_root / "common"
-
-    if common_path.exists():
-        sys.path.insert(0, str(common_path.parent))
-    else:
-        raise ImportError(f"Could not find common module. Tried: {common_path}")
-
-    from common.outputs import generate_outputs_with_metadata, OutputGenerator
-
-    storage = get_storage()
-    output_keys = {}
+    The files are rendered concurrently in a process pool and each is
+    uploaded as soon as it is ready (see OutputStage).
+    """
+    from app.pipeline.output_stage import OutputStage
 
     try:
-        # Generate standard translation outputs (EPUB + TXT, PDF via WeasyPrint)
-        logger.info("Generating standard translation outputs...")
-
-        # Generate EPUB + TXT using common module (PDF will be replaced by WeasyPrint version)
-        translation_results = asyncio.run(generate_outputs_with_metadata(
-            output_dir=temp_dir,
-            job_id=job_id,
-            original_book=original_book,
-            translated_docs=translated_docs,
-            translated_segments=translated_segments
-        ))
-
-        # Generate bilingual outputs (3 files) - CRITICAL: Use write_bilingual_epub for proper CSS
-        logger.info("Generating bilingual outputs with external CSS...")
-
-        # Create bilingual EPUB with external CSS (EPUB standard)
-        from app.pipeline.epub_io import EPUBProcessor
-        epub_processor = EPUBProcessor()
-
-        bilingual_epub_path = os.path.join(temp_dir, f"{job_id}_bilingual.epub")
-        logger.info(f"Creating bilingual EPUB with external CSS at: {bilingual_epub_path}")
-
-        epub_processor.write_bilingual_epub(
-            original_book=original_book,
-            bilingual_docs=bilingual_docs,
-            output_path=bilingual_epub_path,
-            source_lang=source_lang,
-            target_lang=target_lang
-        )
-        logger.info("Created bilingual EPUB with external CSS file")
-
-        # Upload bilingual EPUB
-        epub_key = f"outputs/{job_id}_bilingual.epub"
-        if storage.upload_file(bilingual_epub_path, epub_key, "application/epub+zip"):
-            output_keys["bilingual_epub"] = epub_key
-            logger.info(f"Uploaded bilingual EPUB: {epub_key}")
-
-        # Generate bilingual PDF - Use HTML-to-PDF to preserve CSS styling
-        # (EPUB-to-PDF via Calibre loses the bilingual subtitle formatting)
-        try:
-            from app.html_to_pdf import convert_bilingual_html_to_pdf
-
-            bilingual_pdf_path = os.path.join(temp_dir, f"{job_id}_bilingual.pdf")
-            logger.info("📄 Converting bilingual HTML to PDF (preserves CSS styling)...")
-
-            # Get combined CSS (original + bilingual)
-            original_css = epub_processor.extract_all_css_from_book(original_book)
-            from app.pipeline.bilingual_html import BilingualHTMLGenerator
-            gen = BilingualHTMLGenerator()
-            combined_css = f"{original_css}\n\n/* Bilingual Layout */\n{gen.css}"
-
-            # Convert HTML → PDF with preserved styling
-            success = convert_bilingual_html_to_pdf(
-                bilingual_docs=bilingual_docs,
-                css_content=combined_css,
-                output_path=bilingual_pdf_path,
-                source_lang=source_lang,
-                target_lang=target_lang,
-                original_book=original_book
-            )
-
-            if success and os.path.exists(bilingual_pdf_path):
-                pdf_key = f"outputs/{job_id}_bilingual.pdf"
-                if storage.upload_file(bilingual_pdf_path, pdf_key, "application/pdf"):
-                    output_keys["bilingual_pdf"] = pdf_key
-                    logger.info(f"Uploaded bilingual PDF with preserved CSS: {pdf_key}")
-            else:
-                logger.error("Bilingual PDF generation failed")
-        except Exception as e:
-            logger.error(f"Failed to generate bilingual PDF: {e}", exc_info=True)
-            # Fallback to EPUB-based PDF if HTML-to-PDF fails
-            try:
-                logger.info("Falling back to EPUB-to-PDF conversion...")
-                if ENHANCED_PDF_AVAILABLE:
-                    bilingual_pdf_path = convert_epub_to_pdf(bilingual_epub_path, temp_dir)
-                    if bilingual_pdf_path and os.path.exists(bilingual_pdf_path):
-                        pdf_key = f"outputs/{job_id}_bilingual.pdf"
-                        if storage.upload_file(bilingual_pdf_path, pdf_key, "application/pdf"):
-                            output_keys["bilingual_pdf"] = pdf_key
-                            logger.warning("Used fallback PDF (CSS styling may be lost)")
-            except Exception as fallback_error:
-                logger.error(f"Fallback PDF generation also failed: {fallback_error}")
-
-        # Generate bilingual TXT from raw segments (clean format)
-        try:
-            bilingual_text_parts = []
-
-            # Validate segment counts match
-            if len(original_segments) != len(translated_segments):
-                logger.warning(
-                    f"Segment count mismatch for bilingual TXT: "
-                    f"original={len(original_segments)}, translated={len(translated_segments)}. "
-                    f"Using minimum length."
-                )
-                min_len = min(len(original_segments), len(translated_segments))
-                original_segments_safe = original_segments[:min_len]
-                translated_segments_safe = translated_segments[:min_len]
-            else:
-                original_segments_safe = original_segments
-                translated_segments_safe = translated_segments
-
-            # Format: Clean separation between translation and original
-            for orig, trans in zip(original_segments_safe, translated_segments_safe):
-                orig_text = orig.strip()
-                trans_text = trans.strip()
-
-                if orig_text and trans_text:
-                    bilingual_text_parts.append(
-                        f"{trans_text}\n    ({orig_text})\n"
-                    )
-
-            bilingual_txt_path = os.path.join(temp_dir, f"{job_id}_bilingual.txt")
-            with open(bilingual_txt_path, "w", encoding="utf-8") as f:
-                f.write("\n".join(bilingual_text_parts))
-
-            txt_key = f"outputs/{job_id}_bilingual.txt"
-            if storage.upload_file(bilingual_txt_path, txt_key, "text/plain; charset=utf-8"):
-                output_keys["bilingual_txt"] = txt_key
-                logger.info(f"Uploaded bilingual TXT: {txt_key}")
-        except Exception as e:
-            logger.error(f"Failed to generate bilingual TXT: {e}")
-
-        # Generate translation PDF with WeasyPrint (superior to Calibre)
-        try:
-            from app.html_to_pdf import convert_html_to_pdf
-            from app.pipeline.epub_io import EPUBProcessor
-
-            translation_pdf_path = os.path.join(temp_dir, f"{job_id}.pdf")
-            logger.info("📄 Converting translation HTML to PDF with WeasyPrint (superior quality)...")
-
-            # Get CSS from original book
-            epub_processor = EPUBProcessor()
-            original_css = epub_processor.extract_all_css_from_book(original_book)
-
-            # Convert HTML → PDF with WeasyPrint
-            success = convert_html_to_pdf(
-                translated_docs=translated_docs,
-                css_content=original_css,
-                output_path=translation_pdf_path,
-                target_lang=target_lang,
-                original_book=original_book
-            )
-
-            if success and os.path.exists(translation_pdf_path):
-                pdf_key = f"outputs/{job_id}.pdf"
-                if storage.upload_file(translation_pdf_path, pdf_key, "application/pdf"):
-                    output_keys["pdf"] = pdf_key
-                    logger.info(f"✅ Uploaded translation PDF (WeasyPrint): {pdf_key}")
-            else:
-                logger.warning("Translation PDF generation failed with WeasyPrint")
-        except Exception as e:
-            logger.error(f"Failed to generate translation PDF with WeasyPrint: {e}", exc_info=True)
-
-        # Upload all translation outputs to storage
-        output_generator = OutputGenerator()
-        trans_files = output_generator.get_output_files(temp_dir, job_id)
-
-        if translation_results.get("epub") and trans_files.get("epub"):
-            epub_key = f"outputs/{job_id}.epub"
-            if storage.upload_file(trans_files["epub"], epub_key, "application/epub+zip"):
-                output_keys["epub"] = epub_key
-                logger.info(f"Uploaded translation EPUB: {epub_key}")
-
-        if translation_results.get("txt") and trans_files.get("txt"):
-            txt_key = f"outputs/{job_id}.txt"
-            if storage.upload_file(trans_files["txt"], txt_key, "text/plain; charset=utf-8"):
-                output_keys["txt"] = txt_key
-                logger.info(f"Uploaded translation TXT: {txt_key}")
-
-        logger.info(f"Generated both formats: {list(output_keys.keys())}")
-
+        return OutputStage(
+            job_id, temp_dir, epub_path, original_book,
+            translated_docs, bilingual_docs,
+            original_segments, translated_segments,
+            source_lang, target_lang
+        ).run()
     except Exception as e:
         logger.error(f"Failed to generate both outputs: {e}")
         raise
 
-    return output_keys
-
-
-def _apply_rtl_layout(translated_docs: list) -> list:
-    """Apply RTL layout to translated documents."""
-
-    for doc in translated_docs:
-        try:
-            soup = BeautifulSoup(doc['content'], 'xml')
-
-            # Set dir="rtl" on html or body element
-            html_tag = soup.find('html')
-            if html_tag:
-                html_tag['dir'] = 'rtl'
-            else:
-                body_tag = soup.find('body')
-                if body_tag:
-                    body_tag['dir'] = 'rtl'
-
-            doc['content'] = str(soup)
-
-        except Exception as e:
-            logger.warning(f"Failed to apply RTL layout: {e}")
-
-    return translated_docs
-
 
 def _send_completion_email(job: Job, email: str):
     """Send completion email with download links."""
@@ -728,4 +695,37 @@ def _send_failure_email(job: Job, email: str, error_message: str):
     if success:
         logger.info(f"Sent failure email to {email} for job {job.id}")
     else:
-        logger.error(f"Failed to send failure email to {email}")
\ No newline at end of file
+        logger.error(f"Failed to send failure email to {email}")
+
+
+def _chapter_windows(reconstruction_maps: list, segments: list, max_chars: int) -> list:
+    """Group consecutive documents into windows of about max_chars of source text.
+
+    A document longer than max_chars gets a window of its own.
+    """
+    windows = []
+    current = []
+    current_chars = 0
+    for doc_map in reconstruction_maps:
+        start = doc_map['segment_start']
+        doc_chars = sum(len(segment) for segment in segments[start:start + doc_map['segment_count']])
+        if current and current_chars + doc_chars > max_chars:
+            windows.append(current)
+            current = []
+            current_chars = 0
+        current.append(doc_map)
+        current_chars += doc_chars
+    if current:
+        windows.append(current)
+    return windows
+
+
+def _dominant_provider(segment_providers: list, sharded: ShardedProvider, default: str) -> str:
+    """Name of the sharded provider's member that translated the most segments.
+
+    Segments reused from a preview, the translation memory or a repeat don't
+    count; default is returned if the members translated none.
+    """
+    members = {member.name for member in sharded.members}
+    counts = Counter(source for source in segment_providers if source in members)
+    return counts.most_common(1)[0][0] if counts else default
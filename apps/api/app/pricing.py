@@ -1,7 +1,7 @@
 import math
 import zipfile
 import xml.etree.ElementTree as ET
-from typing import Optional
+from typing import List, Optional
 from decimal import Decimal, ROUND_HALF_UP
 from pathlib import Path
 import re
@@ -212,20 +212,25 @@ def validate_price_match_from_file(
     return is_valid
 
 
+# Actual provider costs in dollars per 1M tokens
+# Translation workloads are typically ~20% input, ~80% output tokens
+PROVIDER_COST_PER_MILLION_TOKENS = {
+    "gemini": Decimal("0.34"),    # $0.34 per 1M tokens for Gemini 2.5 Flash-Lite (20% input $0.10 + 80% output $0.40)
+    "groq": Decimal("0.074"),     # $0.074 per 1M tokens for Llama-3.1-8b Instant (20% input $0.05 + 80% output $0.08)
+}
+
+# Segment sources that cost nothing for the job (translation memory hits, preview reuse,
+# repeats of a segment that was translated once)
+FREE_SEGMENT_SOURCES = {"memory", "preview", "duplicate"}
+
+
 def calculate_provider_cost_cents(tokens_actual: int, provider: str) -> int:
     """Calculate actual provider cost in cents for database storage.
     
     Used for margin tracking and cost monitoring.
     Returns integer cents to avoid SQLite Decimal issues.
     """
-    # Actual provider costs in dollars per 1M tokens
-    # Translation workloads are typically ~20% input, ~80% output tokens
-    cost_per_million_tokens = {
-        "gemini": Decimal("0.34"),    # $0.34 per 1M tokens for Gemini 2.5 Flash-Lite (20% input $0.10 + 80% output $0.40)
-        "groq": Decimal("0.074"),     # $0.074 per 1M tokens for Llama-3.1-8b Instant (20% input $0.05 + 80% output $0.08)
-    }
-    
-    rate = cost_per_million_tokens.get(provider, Decimal("0.15"))
+    rate = PROVIDER_COST_PER_MILLION_TOKENS.get(provider, Decimal("0.15"))
     
     # Calculate precise cost in dollars
     cost_dollars = Decimal(str(tokens_actual)) / Decimal("1000000") * rate
@@ -238,6 +243,39 @@ def calculate_provider_cost_cents(tokens_actual: int, provider: str) -> int:
     return cost_cents
 
 
+def calculate_segment_cost_cents(
+    original_segments: List[str],
+    translated_segments: List[str],
+    segment_providers: List[Optional[str]]
+) -> int:
+    """Calculate provider cost in cents from per-segment provenance.
+
+    Used when a book is split across providers (sharding) or partly served from
+    the translation memory / preview: each segment's tokens are charged at the
+    rate of the provider that translated it.
+    """
+    tokens_by_provider: dict = {}
+    for original, translated, provider in zip(original_segments, translated_segments, segment_providers):
+        if provider is None or provider in FREE_SEGMENT_SOURCES:
+            continue
+        tokens = len(original) // 4 + len(translated or "") // 4
+        tokens_by_provider[provider] = tokens_by_provider.get(provider, 0) + tokens
+
+    cost_dollars = sum(
+        (
+            Decimal(str(tokens)) / Decimal("1000000")
+            * PROVIDER_COST_PER_MILLION_TOKENS.get(provider, Decimal("0.15"))
+            for provider, tokens in tokens_by_provider.items()
+        ),
+        Decimal("0")
+    )
+    cost_cents = int(cost_dollars * 100)
+
+    logger.info(f"Provider cost by segment provenance: {tokens_by_provider} tokens = ${cost_dollars:.6f} = {cost_cents} cents")
+
+    return cost_cents
+
+
 def calculate_provider_cost_display(tokens_actual: int, provider: str) -> str:
     """Calculate provider cost with precise display formatting."""
     cost = calculate_provider_cost_cents(tokens_actual, provider)
@@ -1,16 +1,218 @@
+import asyncio
+import importlib.util
 from abc import ABC, abstractmethod
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Callable
+
+import httpx
+
+from app.config import settings
+from app.logger import get_logger
+from app.utils.token_estimator import TokenEstimator, get_token_estimator
+
+logger = get_logger(__name__)
+
+# HTTP/2 needs h2, installed with the httpx[http2] dependency; environments without it
+# (e.g. an older install) fall back to HTTP/1.1 keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
 
 
 class TranslationProvider(ABC):
     """Abstract base class for translation providers."""
     
     name: str = "base"
+    max_output_tokens: int = 8192  # Model's completion limit (caps the per-request output budget)
     
     def __init__(self, api_key: str, model: str):
         self.api_key = api_key
         self.model = model
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._http_client_loop = None
+        self.max_batch_tokens = settings.max_batch_tokens
+        self.token_estimator: TokenEstimator = get_token_estimator(self.name)
+
+    def _get_http_client(self) -> httpx.AsyncClient:
+        """Get the provider's pooled HTTP client, creating it on first use.
+
+        The client keeps connections alive between batches so TCP/TLS setup is
+        paid once per pool slot instead of once per request. Connections belong
+        to the event loop that opened them, so a new client is created when the
+        provider is used from a different loop.
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self._http_client is None
+            or self._http_client.is_closed
+            or self._http_client_loop is not loop
+        ):
+            self._http_client = httpx.AsyncClient(
+                timeout=settings.http_timeout_seconds,
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=settings.http_max_connections,
+                    max_keepalive_connections=settings.http_max_keepalive_connections,
+                    keepalive_expiry=settings.http_keepalive_expiry_seconds,
+                ),
+            )
+            self._http_client_loop = loop
+        return self._http_client
+
+    async def aclose(self):
+        """Close the pooled HTTP client and the rate limiter's connections (safe to call more than once)."""
+        rate_limiter = getattr(self, "rate_limiter", None)
+        if rate_limiter is not None:
+            await rate_limiter.aclose()
+        if self._http_client is not None and not self._http_client.is_closed:
+            try:
+                await self._http_client.aclose()
+            except RuntimeError:
+                # Owning event loop already closed - connections are gone with it
+                pass
+        self._http_client = None
+        self._http_client_loop = None
     
+    def _create_batches(self, segments: List[str]) -> List[List[str]]:
+        """Split segments into batches based on token estimates.
+
+        Batches are packed to max_batch_tokens * batch_fill_ratio using the
+        provider's calibrated, script-aware token estimator, leaving headroom
+        for estimation error without under-filling requests.
+        """
+        token_budget = max(1, int(self.max_batch_tokens * settings.batch_fill_ratio))
+        batches = []
+        batch_tokens = []
+        current_batch = []
+        current_tokens = 0
+        
+        for segment in segments:
+            segment_tokens = self.token_estimator.estimate(segment)
+            
+            if current_tokens + segment_tokens > token_budget and current_batch:
+                batches.append(current_batch)
+                batch_tokens.append(current_tokens)
+                current_batch = [segment]
+                current_tokens = segment_tokens
+            else:
+                current_batch.append(segment)
+                current_tokens += segment_tokens
+        
+        if current_batch:
+            batches.append(current_batch)
+            batch_tokens.append(current_tokens)
+        
+        fill_ratio = sum(batch_tokens) / (len(batch_tokens) * self.max_batch_tokens) if batch_tokens else 0
+        logger.info(
+            f"Created {len(batches)} batches from {len(segments)} segments "
+            f"(~{sum(batch_tokens):,} tokens, {fill_ratio:.0%} average fill)"
+        )
+        return batches
+
+    def batch_end(self, segments: List[str], start: int, end: Optional[int] = None) -> int:
+        """End index of the batch starting at segments[start] that fits this provider.
+
+        Packs segments[start:end] (end defaults to len(segments)) to
+        max_batch_tokens * batch_fill_ratio like _create_batches, taking at
+        least one segment.
+        """
+        end = len(segments) if end is None else end
+        token_budget = max(1, int(self.max_batch_tokens * settings.batch_fill_ratio))
+        stop = start
+        batch_tokens = 0
+        while stop < end:
+            segment_tokens = self.token_estimator.estimate(segments[stop])
+            if batch_tokens + segment_tokens > token_budget and stop > start:
+                break
+            batch_tokens += segment_tokens
+            stop += 1
+        return stop
+
+    def _estimate_request_tokens(self, batch: List[str], system_hint: str, tgt_lang: str) -> int:
+        """Estimate tokens a batch request consumes against the TPM budget (input + output)."""
+        estimator = self.token_estimator
+        return estimator.estimate(system_hint) + sum(
+            estimator.estimate(segment) + estimator.estimate_translation(segment, tgt_lang)
+            for segment in batch
+        )
+
+    def _output_token_budget(self, text: str, tgt_lang: str) -> int:
+        """Output token limit for translating text: twice the expected size plus headroom."""
+        expected = self.token_estimator.estimate_translation(text, tgt_lang)
+        return min(self.max_output_tokens, expected * 2 + 256)
+
+    async def _translate_batch(
+        self,
+        batch: List[str],
+        src_lang: Optional[str],
+        tgt_lang: str,
+        system_hint: str
+    ) -> List[str]:
+        """Translate a batch with the ID-tagged JSON protocol.
+
+        Translations are aligned by segment ID; IDs missing from a response
+        are re-requested on their own. Segments still missing after
+        settings.batch_missing_id_rounds requests come back as empty strings,
+        which quality validation flags for retry instead of letting the
+        untranslated source leak into the output.
+        """
+        pending = dict(enumerate(batch))
+        translations: Dict[int, str] = {}
+
+        for request_round in range(settings.batch_missing_id_rounds):
+            translations.update(
+                await self._request_batch(pending, src_lang, tgt_lang, system_hint)
+            )
+            pending = {i: segment for i, segment in pending.items() if i not in translations}
+            if not pending or request_round == settings.batch_missing_id_rounds - 1:
+                break
+
+            logger.warning(
+                f"{self.name}: {len(pending)}/{len(batch)} segments missing from batch response "
+                f"(round {request_round + 1}), re-requesting IDs {sorted(pending)[:10]}"
+            )
+
+        if pending:
+            logger.error(
+                f"{self.name}: {len(pending)} segments still missing after "
+                f"{settings.batch_missing_id_rounds} requests"
+            )
+
+        return [translations.get(i, "") for i in range(len(batch))]
+
+    @abstractmethod
+    async def _request_batch(
+        self,
+        items: Dict[int, str],
+        src_lang: Optional[str],
+        tgt_lang: str,
+        system_hint: str
+    ) -> Dict[int, str]:
+        """Send one request for ID-tagged segments.
+
+        Args:
+            items: Mapping of segment ID to (placeholder-protected) text
+
+        Returns:
+            Mapping of segment ID to translation for the IDs the model returned
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def translate_batch(
+        self,
+        batch: List[str],
+        src_lang: Optional[str],
+        tgt_lang: str,
+        system_hint: str
+    ) -> List[str]:
+        """Translate one batch (within this provider's batch limit) with retries.
+
+        Returns:
+            Translations aligned with batch ("" for segments the model never returned)
+
+        Raises:
+            Exception: If the batch still fails after the provider's retries
+        """
+        raise NotImplementedError
+
     @abstractmethod
     async def translate_segments(
         self,
@@ -19,6 +221,8 @@ class TranslationProvider(ABC):
         tgt_lang: str,
         system_hint: Optional[str] = None,
         glossary: Optional[Dict[str, str]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        batch_callback: Optional[Callable[[int, List[str]], None]] = None
     ) -> List[str]:
         """Translate a list of text segments.
         
@@ -28,6 +232,9 @@ class TranslationProvider(ABC):
             tgt_lang: Target language code
             system_hint: Optional system prompt hint
             glossary: Optional translation glossary
+            progress_callback: Called with (completed_batches, total_batches)
+            batch_callback: Called with (offset of the batch's first segment,
+                translated batch) as each batch completes, e.g. for checkpointing
             
         Returns:
             List of translated segments (1:1 mapping with input)
@@ -0,0 +1,90 @@
+"""ID-tagged JSON protocol for batch translation requests.
+
+Segments are sent as a JSON array of {"id", "text"} items and the model is
+asked for the same structure back (Gemini ``responseSchema``, OpenAI-style
+JSON mode for Groq). Translations are aligned by ID rather than by position,
+so a dropped, merged or extra segment only affects its own ID and the
+provider can re-request exactly the IDs that are missing.
+"""
+
+import json
+import re
+from typing import Dict, List, Optional
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Gemini responseSchema for an array of {"id", "text"} items
+GEMINI_RESPONSE_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {
+            "id": {"type": "INTEGER"},
+            "text": {"type": "STRING"},
+        },
+        "required": ["id", "text"],
+    },
+}
+
+_CODE_FENCE = re.compile(r'^\s*```(?:json)?\s*|\s*```\s*$')
+
+
+def build_batch_items(segments: Dict[int, str]) -> str:
+    """Serialize {id: segment} as the JSON array sent to the model."""
+    return json.dumps(
+        [{"id": segment_id, "text": text} for segment_id, text in segments.items()],
+        ensure_ascii=False
+    )
+
+
+def parse_batch_response(response_text: str, expected_ids: List[int]) -> Dict[int, str]:
+    """Parse a model response into {id: translation}.
+
+    Accepts a bare array or an object wrapping it (JSON mode requires an
+    object, e.g. {"translations": [...]}). Unknown IDs, duplicates and items
+    without text are ignored; the caller re-requests whatever is missing.
+
+    Args:
+        response_text: Raw model output
+        expected_ids: IDs that were sent
+
+    Returns:
+        Mapping of ID to translated text for the IDs that came back
+    """
+    try:
+        data = json.loads(_CODE_FENCE.sub('', response_text))
+    except (json.JSONDecodeError, TypeError) as e:
+        logger.warning(f"Could not parse batch response as JSON: {e}")
+        return {}
+
+    items = _find_items(data)
+    if items is None:
+        logger.warning("Batch response JSON contains no list of translations")
+        return {}
+
+    expected = set(expected_ids)
+    translations = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            segment_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        text = item.get("text")
+        if segment_id in expected and segment_id not in translations and isinstance(text, str):
+            translations[segment_id] = text
+
+    return translations
+
+
+def _find_items(data) -> Optional[list]:
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for value in data.values():
+            if isinstance(value, list):
+                return value
+    return None
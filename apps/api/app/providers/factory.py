@@ -5,10 +5,16 @@ with the correct configuration. It's separated from deps.py to avoid circular
 dependencies and heavy imports like redis.
 """
 
+from typing import Dict, List
+
 from app.config import settings
 from app.providers.base import TranslationProvider
 from app.providers.gemini import GeminiFlashProvider
 from app.providers.groq import GroqLlamaProvider
+from app.providers.sharded import ShardedProvider
+
+# Long-lived providers for the API process (keyed by provider name)
+_shared_providers: Dict[str, TranslationProvider] = {}
 
 
 def get_provider(name: str) -> TranslationProvider:
@@ -38,3 +44,58 @@ def get_provider(name: str) -> TranslationProvider:
             api_key=settings.gemini_api_key,
             model=settings.gemini_model
         )
+
+
+def get_api_keys(name: str) -> List[str]:
+    """Get all configured API keys for a provider (primary key first, no duplicates)."""
+    if name == "groq":
+        primary, extra = settings.groq_api_key, settings.groq_api_keys
+    else:
+        primary, extra = settings.gemini_api_key, settings.gemini_api_keys
+
+    keys = [primary] + [key.strip() for key in extra.split(",") if key.strip()]
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+def get_sharded_provider() -> ShardedProvider:
+    """Get a provider that shards batches across Gemini and Groq and all their API keys.
+
+    Each API key gets its own provider instance (and so its own rate limiter),
+    since quotas are enforced per key.
+
+    Returns:
+        ShardedProvider over one Gemini/Groq instance per configured key
+    """
+    members = [
+        GeminiFlashProvider(api_key=key, model=settings.gemini_model)
+        for key in get_api_keys("gemini")
+    ] + [
+        GroqLlamaProvider(api_key=key, model=settings.groq_model)
+        for key in get_api_keys("groq")
+    ]
+    return ShardedProvider(members)
+
+
+def get_shared_provider(name: str) -> TranslationProvider:
+    """Get a process-wide provider instance that reuses its HTTP connection pool.
+
+    Intended for the API process, where all requests run on one event loop
+    (e.g. preview generation). Close them with close_shared_providers() on
+    shutdown. Workers should use get_provider() per job and close it when done.
+
+    Args:
+        name: Provider name ("groq" or "gemini")
+
+    Returns:
+        Shared TranslationProvider instance
+    """
+    if name not in _shared_providers:
+        _shared_providers[name] = get_provider(name)
+    return _shared_providers[name]
+
+
+async def close_shared_providers():
+    """Close the connection pools of all shared providers."""
+    for provider in list(_shared_providers.values()):
+        await provider.aclose()
+    _shared_providers.clear()
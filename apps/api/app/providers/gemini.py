@@ -1,7 +1,12 @@
 import asyncio
-import httpx
 from typing import List, Optional, Dict, Callable
 from app.providers.base import TranslationProvider
+from app.providers.rate_limit import create_rate_limiter
+from app.providers.batch_protocol import (
+    GEMINI_RESPONSE_SCHEMA,
+    build_batch_items,
+    parse_batch_response,
+)
 from app.config import settings
 from app.logger import get_logger
 from app.utils.cost_tracker import CostTracker
@@ -13,16 +18,20 @@ class GeminiFlashProvider(TranslationProvider):
     """Gemini 2.5 Flash-Lite translation provider."""
     
     name = "gemini"
+    max_output_tokens = 65536
     
     def __init__(self, api_key: str, model: str):
         super().__init__(api_key, model)
-        self.base_url = "https://generativelanguage.googleapis.com/v1/models"
-        self.max_batch_tokens = settings.max_batch_tokens
+        self.base_url = "https://generativelanguage.googleapis.com/v1beta/models"
         self.retry_limit = settings.retry_limit
         # Gemini 2.5 Flash-Lite Tier 1: 4,000 RPM, 4M TPM (work at 95% safety barrier)
-        self.requests_per_minute = 3800  # 95% of 4,000 RPM  
+        self.requests_per_minute = 3800  # 95% of 4,000 RPM
         self.tokens_per_minute = 3800000  # 95% of 4M TPM
-    
+        self.max_concurrent_batches = settings.gemini_max_concurrent_batches
+        self.rate_limiter = create_rate_limiter(
+            self.name, api_key, self.requests_per_minute, self.tokens_per_minute
+        )
+
     async def translate_segments(
         self,
         segments: List[str],
@@ -30,7 +39,8 @@ class GeminiFlashProvider(TranslationProvider):
         tgt_lang: str,
         system_hint: Optional[str] = None,
         glossary: Optional[Dict[str, str]] = None,
-        progress_callback: Optional[Callable[[int, int], None]] = None
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        batch_callback: Optional[Callable[[int, List[str]], None]] = None
     ) -> List[str]:
         """Translate segments using Gemini Flash-Lite with batching and retries."""
         
@@ -42,55 +52,60 @@ class GeminiFlashProvider(TranslationProvider):
         
         # Process in batches to stay within token limits
         batches = self._create_batches(segments)
-        logger.info(f"Processing {len(segments)} segments in {len(batches)} batches")
-        translated_batches = []
-        
-        for i, batch in enumerate(batches):
-            logger.info(f"Translating batch {i+1}/{len(batches)} with {len(batch)} segments")
+        logger.info(
+            f"Processing {len(segments)} segments in {len(batches)} batches "
+            f"({self.max_concurrent_batches} in flight)"
+        )
+
+        # Keep up to max_concurrent_batches requests in flight, paced by the
+        # RPM/TPM token bucket; results are written back by batch index so the
+        # output order matches the input regardless of completion order
+        translated_by_batch: List[Optional[List[str]]] = [None] * len(batches)
+        batch_offsets = [0]
+        for batch in batches[:-1]:
+            batch_offsets.append(batch_offsets[-1] + len(batch))
+        semaphore = asyncio.Semaphore(self.max_concurrent_batches)
+        completed_batches = 0
 
-            # Rate limiting: 3,800 RPM (95% of limit) = 1 request every 0.0158 seconds
-            # Safe approach: 1 request every 0.016 seconds = 62.5 RPS = 3,750 RPM (well within 95% limit)
-            if i > 0:
-                await asyncio.sleep(0.016)  # 16ms delay = max 62.5 requests/second = 3,750 RPM
+        async def run_batch(i: int, batch: List[str]):
+            nonlocal completed_batches
 
-            translated_batch = await self._translate_batch_with_retry(
-                batch, src_lang, tgt_lang, system_hint
-            )
+            # Each request (including retries) waits on the RPM/TPM token bucket
+            async with semaphore:
+                logger.info(f"Translating batch {i+1}/{len(batches)} with {len(batch)} segments")
+                translated_batch = await self.translate_batch(
+                    batch, src_lang, tgt_lang, system_hint
+                )
+
+            translated_by_batch[i] = translated_batch
+            completed_batches += 1
             logger.info(f"Batch {i+1} completed: {len(translated_batch)} translations")
-            translated_batches.extend(translated_batch)
 
-            # Report progress after each batch
+            if batch_callback:
+                batch_callback(batch_offsets[i], translated_batch)
+
+            # Report the number of finished batches (monotonic, unlike batch indices)
             if progress_callback:
-                progress_callback(i + 1, len(batches))
-        
-        logger.info(f"Translated {len(segments)} segments → {len(translated_batches)} results via Gemini")
-        return translated_batches
-    
-    def _create_batches(self, segments: List[str]) -> List[List[str]]:
-        """Split segments into batches based on token estimates."""
-        batches = []
-        current_batch = []
-        current_tokens = 0
-        
-        for segment in segments:
-            # Rough token estimate: ~4 chars per token
-            segment_tokens = len(segment) // 4
-            
-            if current_tokens + segment_tokens > self.max_batch_tokens and current_batch:
-                batches.append(current_batch)
-                current_batch = [segment]
-                current_tokens = segment_tokens
-            else:
-                current_batch.append(segment)
-                current_tokens += segment_tokens
-        
-        if current_batch:
-            batches.append(current_batch)
-        
-        logger.info(f"Created {len(batches)} batches from {len(segments)} segments")
-        return batches
-    
-    async def _translate_batch_with_retry(
+                progress_callback(completed_batches, len(batches))
+
+        tasks = [asyncio.create_task(run_batch(i, batch)) for i, batch in enumerate(batches)]
+        try:
+            await asyncio.gather(*tasks)
+        except Exception:
+            # One batch exhausted its retries - stop the others before re-raising
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        translated_segments = [
+            segment for translated_batch in translated_by_batch for segment in translated_batch
+        ]
+
+        logger.info(f"Translated {len(segments)} segments → {len(translated_segments)} results via Gemini")
+        return translated_segments
+
+    async def translate_batch(
         self,
         batch: List[str],
         src_lang: Optional[str],
@@ -122,20 +137,25 @@ class GeminiFlashProvider(TranslationProvider):
                     logger.error(f"Gemini translation failed after {self.retry_limit} attempts")
                     raise
     
-    async def _translate_batch(
+    async def _request_batch(
         self,
-        batch: List[str],
+        items: Dict[int, str],
         src_lang: Optional[str],
         tgt_lang: str,
         system_hint: str
-    ) -> List[str]:
-        """Translate a single batch via Gemini API."""
+    ) -> Dict[int, str]:
+        """Request translations for ID-tagged segments via Gemini API."""
         
-        # Combine segments with separators for batch processing
-        separator = "\n---SEGMENT---\n"
-        combined_text = separator.join(batch)
-        
-        prompt = f"{system_hint}\n\nTranslate this text:\n{combined_text}"
+        await self.rate_limiter.acquire(
+            self._estimate_request_tokens(list(items.values()), system_hint, tgt_lang)
+        )
+
+        items_json = build_batch_items(items)
+        prompt = (
+            f"{system_hint}\n\n"
+            f"Translate the \"text\" of every item in this JSON array. Return a JSON array "
+            f"with one item per input item, keeping each \"id\" unchanged:\n{items_json}"
+        )
         
         payload = {
             "contents": [{
@@ -143,55 +163,44 @@ class GeminiFlashProvider(TranslationProvider):
             }],
             "generationConfig": {
                 "temperature": 0.1,
-                "maxOutputTokens": len(combined_text) * 2,  # Conservative estimate
+                "maxOutputTokens": self._output_token_budget(items_json, tgt_lang),
+                "responseMimeType": "application/json",
+                "responseSchema": GEMINI_RESPONSE_SCHEMA,
             }
         }
         
-        async with httpx.AsyncClient(timeout=60) as client:
-            response = await client.post(
-                f"{self.base_url}/{self.model}:generateContent?key={self.api_key}",
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            if response.status_code == 429:
-                raise Exception("Rate limited by Gemini API")
-            
-            response.raise_for_status()
-            result = response.json()
-
-            if "candidates" not in result or not result["candidates"]:
-                raise Exception("No translation candidates returned")
-
-            translated_text = result["candidates"][0]["content"]["parts"][0]["text"]
-
-            # Extract token usage from response if available
-            usage_metadata = result.get("usageMetadata", {})
-            input_tokens = usage_metadata.get("promptTokenCount", None)
-            output_tokens = usage_metadata.get("candidatesTokenCount", None)
-
-            # Log API call with cost estimation
-            CostTracker.log_api_call(
-                provider="gemini",
-                model=self.model,
-                input_text=prompt,
-                output_text=translated_text,
-                input_tokens=input_tokens,
-                output_tokens=output_tokens,
-                request_id=None
-            )
-
-            # Split back into segments
-            translated_segments = translated_text.split(separator)
-            
-            # Validate segment count matches
-            if len(translated_segments) != len(batch):
-                logger.warning(
-                    f"Segment count mismatch: input {len(batch)}, output {len(translated_segments)}"
-                )
-                # Pad or truncate to match input length
-                while len(translated_segments) < len(batch):
-                    translated_segments.append(batch[len(translated_segments)])
-                translated_segments = translated_segments[:len(batch)]
-            
-            return translated_segments
\ No newline at end of file
+        client = self._get_http_client()
+        response = await client.post(
+            f"{self.base_url}/{self.model}:generateContent?key={self.api_key}",
+            json=payload,
+            headers={"Content-Type": "application/json"}
+        )
+
+        if response.status_code == 429:
+            raise Exception("Rate limited by Gemini API")
+
+        response.raise_for_status()
+        result = response.json()
+
+        if "candidates" not in result or not result["candidates"]:
+            raise Exception("No translation candidates returned")
+
+        translated_text = result["candidates"][0]["content"]["parts"][0]["text"]
+
+        # Extract token usage from response if available
+        usage_metadata = result.get("usageMetadata", {})
+        input_tokens = usage_metadata.get("promptTokenCount", None)
+        output_tokens = usage_metadata.get("candidatesTokenCount", None)
+
+        # Log API call with cost estimation
+        CostTracker.log_api_call(
+            provider="gemini",
+            model=self.model,
+            input_text=prompt,
+            output_text=translated_text,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            request_id=None
+        )
+
+        return parse_batch_response(translated_text, list(items))
@@ -0,0 +1,331 @@
+"""Rate limiting for translation provider API calls.
+
+Providers publish their quota as requests-per-minute (RPM) and
+tokens-per-minute (TPM). The token buckets below enforce both budgets at once
+so that batches can be dispatched concurrently without exceeding either limit.
+
+TokenBucketRateLimiter keeps the bucket in process memory. When several RQ
+workers share one API key, RedisTokenBucketRateLimiter keeps the bucket in
+Redis instead (one per provider and API key) so all workers draw from the
+same quota.
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import Dict, Optional
+
+import redis
+import redis.asyncio as aioredis
+
+from app.config import settings
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class RateLimitMetrics:
+    """Counters for time spent waiting on a rate limiter."""
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.delayed = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record(self, waited: float):
+        self.acquisitions += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if waited > 0.01:
+            self.delayed += 1
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "acquisitions": self.acquisitions,
+            "delayed": self.delayed,
+            "total_wait_seconds": round(self.total_wait_seconds, 3),
+            "avg_wait_seconds": round(self.total_wait_seconds / max(self.acquisitions, 1), 4),
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+        }
+
+
+class TokenBucketRateLimiter:
+    """Async token bucket enforcing an RPM and a TPM budget together.
+
+    Both buckets refill continuously at their per-minute rate and hold at most
+    ``burst_seconds`` worth of capacity, so a cold start cannot fire a whole
+    minute of quota in one instant. A request larger than the token bucket
+    capacity is admitted once the bucket is full and leaves it in debt, which
+    delays the following requests accordingly.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        burst_seconds: float = 1.0
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+        self._request_rate = requests_per_minute / 60.0
+        self._token_rate = tokens_per_minute / 60.0
+        self._request_capacity = max(1.0, self._request_rate * burst_seconds)
+        self._token_capacity = max(1.0, self._token_rate * burst_seconds)
+
+        self._requests = self._request_capacity
+        self._tokens = self._token_capacity
+        self._updated_at = time.monotonic()
+
+        # asyncio.Lock binds to the loop it is first used on; the worker runs
+        # each job in a fresh loop, so the lock is recreated per loop.
+        self._lock: Optional[asyncio.Lock] = None
+        self._lock_loop = None
+
+        self.metrics = RateLimitMetrics()
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated_at
+        self._updated_at = now
+        self._requests = min(self._request_capacity, self._requests + elapsed * self._request_rate)
+        self._tokens = min(self._token_capacity, self._tokens + elapsed * self._token_rate)
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Wait until one request and ``tokens`` tokens fit in the budget.
+
+        Args:
+            tokens: Estimated tokens (input + output) the request will consume
+
+        Returns:
+            Seconds spent waiting for capacity
+        """
+        started = time.monotonic()
+
+        # Waiters queue on the lock, so capacity is granted in FIFO order
+        async with self._get_lock():
+            while True:
+                self._refill()
+                needed_tokens = min(tokens, self._token_capacity)
+
+                if self._requests >= 1 and self._tokens >= needed_tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    break
+
+                wait_time = max(
+                    (1 - self._requests) / self._request_rate,
+                    (needed_tokens - self._tokens) / self._token_rate,
+                    0.001
+                )
+                await asyncio.sleep(wait_time)
+
+        waited = time.monotonic() - started
+        self.metrics.record(waited)
+        if waited > 1:
+            logger.debug(f"Rate limiter delayed request by {waited:.2f}s ({tokens} tokens)")
+        return waited
+
+    async def aclose(self):
+        """Nothing to release (same interface as RedisTokenBucketRateLimiter)."""
+
+
+# Atomically refill and try to take one request plus N tokens from the bucket.
+# Returns "0" when granted, otherwise the seconds to wait before retrying.
+# Uses the Redis server clock so workers on different hosts agree on time.
+_ACQUIRE_SCRIPT = """
+local req_rate = tonumber(ARGV[1])
+local tok_rate = tonumber(ARGV[2])
+local req_cap = tonumber(ARGV[3])
+local tok_cap = tonumber(ARGV[4])
+local tokens = tonumber(ARGV[5])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'ts')
+local requests = tonumber(state[1]) or req_cap
+local available = tonumber(state[2]) or tok_cap
+local ts = tonumber(state[3]) or now
+
+local elapsed = math.max(0, now - ts)
+requests = math.min(req_cap, requests + elapsed * req_rate)
+available = math.min(tok_cap, available + elapsed * tok_rate)
+
+local needed = math.min(tokens, tok_cap)
+local wait = 0
+if requests >= 1 and available >= needed then
+    requests = requests - 1
+    available = available - tokens
+else
+    wait = math.max((1 - requests) / req_rate, (needed - available) / tok_rate, 0.001)
+end
+
+redis.call('HSET', KEYS[1], 'requests', requests, 'tokens', available, 'ts', now)
+redis.call('EXPIRE', KEYS[1], 120)
+return tostring(wait)
+"""
+
+
+class RedisTokenBucketRateLimiter:
+    """Token bucket shared by every worker process through Redis.
+
+    Same budgets and interface as TokenBucketRateLimiter, but the bucket state
+    lives in one Redis hash per provider and API key and is updated by a Lua
+    script, so concurrent workers cannot overdraw it. Wait-time metrics are
+    also accumulated in Redis (see get_rate_limit_metrics). If Redis becomes
+    unreachable the limiter falls back to a local bucket for this process and
+    tries Redis again after settings.distributed_rate_limit_retry_seconds.
+    """
+
+    KEY_PREFIX = "ratelimit"
+
+    def __init__(
+        self,
+        provider: str,
+        api_key: str,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        burst_seconds: float = 1.0
+    ):
+        self.provider = provider
+        # Never store the key itself in Redis, only a short fingerprint
+        key_id = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+        self.bucket_key = f"{self.KEY_PREFIX}:{provider}:{key_id}"
+        self.metrics_key = f"{self.KEY_PREFIX}:metrics:{provider}"
+
+        self._request_rate = requests_per_minute / 60.0
+        self._token_rate = tokens_per_minute / 60.0
+        self._request_capacity = max(1.0, self._request_rate * burst_seconds)
+        self._token_capacity = max(1.0, self._token_rate * burst_seconds)
+
+        self.metrics = RateLimitMetrics()
+        self._local_fallback = TokenBucketRateLimiter(
+            requests_per_minute, tokens_per_minute, burst_seconds
+        )
+        # While Redis is failing: monotonic time of the next attempt to use it
+        self._redis_retry_at: Optional[float] = None
+
+        # redis.asyncio connections belong to the loop that opened them
+        self._client: Optional[aioredis.Redis] = None
+        self._client_loop = None
+        self._script = None
+
+    async def _get_script(self):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            # The previous loop's connections can't be reused from this one
+            await self.aclose()
+            self._client = aioredis.from_url(
+                settings.redis_url, socket_connect_timeout=2, socket_timeout=5
+            )
+            self._client_loop = loop
+            self._script = self._client.register_script(_ACQUIRE_SCRIPT)
+        return self._script
+
+    async def aclose(self):
+        """Close the Redis client (safe to call more than once)."""
+        client, self._client, self._client_loop, self._script = self._client, None, None, None
+        if client is None:
+            return
+        try:
+            await client.aclose()
+        except (RuntimeError, redis.RedisError, OSError):
+            # Owning event loop already closed - its connections went with it
+            pass
+
+    async def acquire(self, tokens: int = 0) -> float:
+        """Wait until one request and ``tokens`` tokens fit in the shared budget.
+
+        Args:
+            tokens: Estimated tokens (input + output) the request will consume
+
+        Returns:
+            Seconds spent waiting for capacity
+        """
+        if self._redis_retry_at is not None:
+            if time.monotonic() < self._redis_retry_at:
+                return await self._local_fallback.acquire(tokens)
+            logger.info(f"Retrying distributed rate limiter for {self.provider}")
+
+        started = time.monotonic()
+        try:
+            script = await self._get_script()
+            while True:
+                wait_time = float(await script(
+                    keys=[self.bucket_key],
+                    args=[
+                        self._request_rate,
+                        self._token_rate,
+                        self._request_capacity,
+                        self._token_capacity,
+                        tokens,
+                    ],
+                ))
+                if wait_time <= 0:
+                    break
+                await asyncio.sleep(wait_time)
+        except redis.RedisError as e:
+            logger.warning(
+                f"Distributed rate limiter for {self.provider} unavailable, falling back to "
+                f"per-process limits for {settings.distributed_rate_limit_retry_seconds}s: {e}"
+            )
+            self._redis_retry_at = time.monotonic() + settings.distributed_rate_limit_retry_seconds
+            return await self._local_fallback.acquire(tokens)
+
+        if self._redis_retry_at is not None:
+            logger.info(f"Distributed rate limiter for {self.provider} is back")
+            self._redis_retry_at = None
+
+        waited = time.monotonic() - started
+        self.metrics.record(waited)
+        await self._record_wait(waited)
+        if waited > 1:
+            logger.debug(f"Distributed rate limiter delayed {self.provider} request by {waited:.2f}s ({tokens} tokens)")
+        return waited
+
+    async def _record_wait(self, waited: float):
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            pipe.hincrby(self.metrics_key, "acquisitions", 1)
+            pipe.hincrbyfloat(self.metrics_key, "total_wait_seconds", waited)
+            if waited > 0.01:
+                pipe.hincrby(self.metrics_key, "delayed", 1)
+            await pipe.execute()
+        except redis.RedisError as e:
+            logger.debug(f"Failed to record rate limiter metrics: {e}")
+
+
+def create_rate_limiter(provider: str, api_key: str, requests_per_minute: int, tokens_per_minute: int):
+    """Create the rate limiter a provider instance should acquire before every call.
+
+    Uses the Redis-backed limiter (shared by all workers using the same API key)
+    when settings.distributed_rate_limit_enabled, otherwise a per-process bucket.
+    """
+    if settings.distributed_rate_limit_enabled:
+        return RedisTokenBucketRateLimiter(provider, api_key, requests_per_minute, tokens_per_minute)
+    return TokenBucketRateLimiter(requests_per_minute, tokens_per_minute)
+
+
+def get_rate_limit_metrics(redis_client: redis.Redis, providers=("gemini", "groq")) -> Dict[str, Dict[str, float]]:
+    """Read the cross-worker rate limiter wait metrics from Redis."""
+    metrics = {}
+    for provider in providers:
+        raw = redis_client.hgetall(f"{RedisTokenBucketRateLimiter.KEY_PREFIX}:metrics:{provider}")
+        acquisitions = int(raw.get(b"acquisitions", 0))
+        total_wait = float(raw.get(b"total_wait_seconds", 0))
+        metrics[provider] = {
+            "acquisitions": acquisitions,
+            "delayed": int(raw.get(b"delayed", 0)),
+            "total_wait_seconds": round(total_wait, 3),
+            "avg_wait_seconds": round(total_wait / max(acquisitions, 1), 4),
+        }
+    return metrics
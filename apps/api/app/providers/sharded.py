@@ -0,0 +1,171 @@
+"""Shard one book's batches across several providers and API keys.
+
+Every member (a provider instance bound to one API key) runs its own pool of
+workers that pull the next batch from a shared cursor, sized to that member's
+batch limit, and send it through the member's RPM/TPM token bucket. A member
+that is throttled or slow simply claims fewer batches, so the book is spread
+across members in proportion to the quota each one has left and one job can
+saturate the combined quota. The segments of a member's failed batch are
+handed to the remaining members, each re-batching them to its own limit (a
+Gemini-sized batch would overflow Groq's).
+
+ShardedProvider is not a TranslationProvider: it makes no requests itself,
+but it offers the same translate_segments/aclose interface the orchestrator
+uses and drives its members through their public per-batch API.
+"""
+
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.providers.base import TranslationProvider
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class ShardedProvider:
+    """Translate one segment list concurrently across member providers.
+
+    After each call ``last_segment_providers`` holds, for every input segment,
+    the name of the member provider that translated it (for cost accounting).
+    """
+
+    name = "sharded"
+
+    def __init__(self, members: List[TranslationProvider]):
+        if not members:
+            raise ValueError("ShardedProvider needs at least one member provider")
+        self.model = "+".join(sorted({m.model for m in members}))
+        self.members = members
+        self.last_segment_providers: List[str] = []
+
+    def restricted_to(self, provider_names: Iterable[str]) -> Optional["ShardedProvider"]:
+        """Get a sharded provider over the members with the given provider names."""
+        names = set(provider_names)
+        members = [member for member in self.members if member.name in names]
+        if not members:
+            return None
+        return ShardedProvider(members)
+
+    async def aclose(self):
+        for member in self.members:
+            await member.aclose()
+
+    def _next_batch(
+        self,
+        member: TranslationProvider,
+        segments: List[str],
+        state: Dict
+    ) -> Optional[Tuple[int, List[str]]]:
+        """Claim the next batch for a member, sized to the member's batch limit.
+
+        Handed-back segment ranges come first; the member takes as much of a
+        range as fits one of its batches and leaves the rest queued.
+        """
+        if state["requeued"]:
+            start, end = state["requeued"].pop()
+            stop = member.batch_end(segments, start, end)
+            if stop < end:
+                state["requeued"].append((stop, end))
+            return start, segments[start:stop]
+
+        start = state["cursor"]
+        if start >= len(segments):
+            return None
+
+        stop = member.batch_end(segments, start)
+        state["cursor"] = stop
+        return start, segments[start:stop]
+
+    async def translate_segments(
+        self,
+        segments: List[str],
+        src_lang: Optional[str],
+        tgt_lang: str,
+        system_hint: Optional[str] = None,
+        glossary: Optional[Dict[str, str]] = None,
+        progress_callback: Optional[Callable[[int, int], None]] = None,
+        batch_callback: Optional[Callable[[int, List[str]], None]] = None
+    ) -> List[str]:
+        """Translate segments with all members pulling batches from a shared cursor.
+
+        Progress is reported as (translated_segments, total_segments) because
+        batch sizes differ between members.
+        """
+        self.last_segment_providers = []
+        if not segments:
+            return []
+
+        if system_hint is None:
+            system_hint = self.members[0].get_default_system_hint(tgt_lang)
+
+        translated: List[Optional[str]] = [None] * len(segments)
+        provenance: List[Optional[str]] = [None] * len(segments)
+        state = {"cursor": 0, "requeued": [], "completed": 0}
+
+        async def run_member_worker(member: TranslationProvider, label: str):
+            while True:
+                claimed = self._next_batch(member, segments, state)
+                if claimed is None:
+                    return
+                start, batch = claimed
+
+                try:
+                    translated_batch = await member.translate_batch(
+                        batch, src_lang, tgt_lang, system_hint
+                    )
+                except Exception as e:
+                    # Hand the segments to the other workers and retire this one
+                    state["requeued"].append((start, start + len(batch)))
+                    logger.error(f"Shard {label} failed, handing its batch to other members: {e}")
+                    raise
+
+                translated[start:start + len(batch)] = translated_batch
+                provenance[start:start + len(batch)] = [member.name] * len(batch)
+                state["completed"] += len(batch)
+
+                if batch_callback:
+                    batch_callback(start, translated_batch)
+                if progress_callback:
+                    progress_callback(state["completed"], len(segments))
+
+        async def run_member(member: TranslationProvider, label: str) -> bool:
+            """Run a member's workers; returns False if any of them failed."""
+            concurrency = getattr(member, "max_concurrent_batches", 1)
+            results = await asyncio.gather(
+                *(run_member_worker(member, label) for _ in range(concurrency)),
+                return_exceptions=True
+            )
+            return not any(isinstance(result, Exception) for result in results)
+
+        active = list(zip(self.members, self._member_labels()))
+        logger.info(
+            f"Sharding {len(segments)} segments across {len(self.members)} providers: "
+            f"{', '.join(label for _, label in active)}"
+        )
+
+        # Healthy members pick up handed-back batches while they run; batches handed
+        # back after they finished get another round without the failed members
+        while active:
+            healthy = await asyncio.gather(*(run_member(member, label) for member, label in active))
+            active = [shard for shard, ok in zip(active, healthy) if ok]
+            if not state["requeued"]:
+                break
+
+        if any(segment is None for segment in translated):
+            raise Exception(
+                f"Sharded translation failed: {sum(s is None for s in translated)} segments untranslated"
+            )
+
+        self.last_segment_providers = provenance
+        shares = {name: provenance.count(name) for name in set(provenance)}
+        logger.info(f"Translated {len(segments)} segments via shards: {shares}")
+        return translated
+
+    def _member_labels(self) -> List[str]:
+        counts: Dict[str, int] = {}
+        labels = []
+        for member in self.members:
+            counts[member.name] = counts.get(member.name, 0) + 1
+            labels.append(f"{member.name}#{counts[member.name]}")
+        return labels
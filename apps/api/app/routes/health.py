@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 from app.db import get_db
 from app.deps import get_queue, get_redis_client
 from app.models import Job
+from app.providers.rate_limit import get_rate_limit_metrics
 from app.schemas import HealthResponse
 
 router = APIRouter()
@@ -39,9 +40,16 @@ async def health_check(
     
     err_rate_15m = failed_recent / max(total_recent, 1) * 100
     
+    # Time workers spent waiting on the shared provider rate limits
+    try:
+        rate_limit_wait = get_rate_limit_metrics(redis_client)
+    except Exception:
+        rate_limit_wait = None
+    
     return HealthResponse(
         status="ok",
         queue_depth=queue_depth,
         jobs_inflight=jobs_inflight,
-        err_rate_15m=round(err_rate_15m, 2)
+        err_rate_15m=round(err_rate_15m, 2),
+        rate_limit_wait=rate_limit_wait
     )
\ No newline at end of file
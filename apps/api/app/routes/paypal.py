@@ -44,14 +44,14 @@ async def paypal_success(
         
         # Queue translation job
         from app.pipeline.worker import translate_epub
-        from rq import Queue
+        from rq import Queue, Retry
         import redis
         from app.config import settings
         
         try:
             r = redis.Redis.from_url(settings.redis_url)
             queue = Queue(name="translate", connection=r)
-            queue.enqueue(translate_epub, job_id)
+            queue.enqueue(translate_epub, job_id, retry=Retry(max=settings.job_retry_max))
             logger.info(f"Translation job queued after PayPal payment: {job_id}")
         except Exception as e:
             logger.error(f"Failed to queue translation after PayPal payment: {e}")
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response, StreamingResponse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from pydantic import BaseModel
@@ -8,6 +8,7 @@ import asyncio
 
 from app.config import settings
 from app.pipeline.preview import PreviewService
+from app.pipeline.preview_assets import PREVIEW_ASSET_PATH, get_preview_asset_cache, verify_asset_signature
 from app.logger import get_logger
 from app.config.models import get_default_model
 
@@ -74,7 +75,8 @@ async def generate_preview(
             r2_key=data.key,
             target_lang=data.target_lang,
             max_words=data.max_words,
-            output_format=data.output_format
+            output_format=data.output_format,
+            api_url=settings.api_url or str(request.base_url)
         )
 
         # Parse provider name and model from provider_used string (e.g., "groq" or "gemini")
@@ -168,7 +170,8 @@ async def stream_preview(
                         target_lang=target_lang,
                         max_words=max_words,
                         progress_callback=progress_callback,
-                        output_format=output_format
+                        output_format=output_format,
+                        api_url=settings.api_url or str(request.base_url)
                     )
                     await progress_queue.put(("done", result))
                 except Exception as e:
@@ -235,3 +238,39 @@ async def stream_preview(
             "X-Accel-Buffering": "no"  # Disable nginx buffering
         }
     )
+
+
+@router.get(PREVIEW_ASSET_PATH)
+async def preview_asset(key: str, path: str, expires: int, sig: str):
+    """Serve an image of a previewed EPUB straight from its zip.
+
+    Preview HTML references its images here instead of embedding them as
+    data URIs. Only the signed URLs a preview generated are served, so
+    the EPUB is only looked up (or downloaded) for images a preview linked.
+
+    Args:
+        key: R2 storage key of the uploaded EPUB
+        path: The image's path in the EPUB zip
+        expires: Unix time the URL expires at
+        sig: Signature of key, path and expires
+
+    Returns:
+        The image bytes with their MIME type
+
+    Raises:
+        HTTPException: 403 if the signature is invalid or expired, 404 if
+            the EPUB or image doesn't exist
+    """
+    if not verify_asset_signature(key, path, expires, sig):
+        raise HTTPException(status_code=403, detail="Invalid or expired image URL")
+
+    asset = await asyncio.to_thread(get_preview_asset_cache().read, key, path)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+
+    data, mime_type = asset
+    return Response(
+        content=data,
+        media_type=mime_type,
+        headers={"Cache-Control": f"private, max-age={settings.preview_asset_url_ttl_seconds}"}
+    )
@@ -132,13 +132,13 @@ async def skip_payment(
 
         # Start translation job immediately
         from app.pipeline.worker import translate_epub
-        from rq import Queue
+        from rq import Queue, Retry
         import redis
 
         try:
             r = redis.Redis.from_url(settings.redis_url)
             queue = Queue(name="translate", connection=r)
-            queue.enqueue(translate_epub, job_id)
+            queue.enqueue(translate_epub, job_id, retry=Retry(max=settings.job_retry_max))
             logger.info(f"Translation job queued (skip payment): {job_id}")
         except Exception as e:
             logger.error(f"Failed to queue translation: {e}")
@@ -56,4 +56,7 @@ class HealthResponse(BaseModel):
     status: str = Field(default="ok", description="Health status")
     queue_depth: int = Field(..., description="Number of queued jobs")
     jobs_inflight: int = Field(..., description="Number of processing jobs")
-    err_rate_15m: float = Field(..., description="Error rate in last 15 minutes")
\ No newline at end of file
+    err_rate_15m: float = Field(..., description="Error rate in last 15 minutes")
+    rate_limit_wait: Optional[Dict[str, Dict[str, float]]] = Field(
+        None, description="Provider rate limiter wait time across all workers"
+    )
\ No newline at end of file
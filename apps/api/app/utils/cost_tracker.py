@@ -10,6 +10,7 @@ app.config.models. This module uses that as the single source of truth.
 from typing import Optional
 from app.logger import get_logger
 from app.config.models import estimate_cost as calculate_cost, get_model_pricing
+from app.utils.token_estimator import get_token_estimator
 
 logger = get_logger(__name__)
 
@@ -89,6 +90,11 @@ class CostTracker:
         Returns:
             Dictionary with cost information
         """
+        # Real counts from the API calibrate the batch-packing token estimator
+        estimator = get_token_estimator(provider)
+        estimator.calibrate(input_text, input_tokens)
+        estimator.calibrate(output_text, output_tokens)
+
         # Use actual tokens if provided, otherwise estimate
         if input_tokens is None:
             input_tokens = cls.estimate_tokens(input_text)
@@ -122,3 +128,51 @@ class CostTracker:
         )
 
         return log_data
+
+    @classmethod
+    def log_segment_dedup(
+        cls,
+        provider: str,
+        model: str,
+        total_segments: int,
+        unique_segments: int,
+        saved_input_tokens: int,
+        saved_output_tokens: int,
+        request_id: Optional[str] = None
+    ) -> dict:
+        """Log segments that were not sent because an identical segment was.
+
+        Args:
+            provider: Provider name
+            model: Model name
+            total_segments: Segments to translate before dedup
+            unique_segments: Distinct segments actually sent
+            saved_input_tokens: Estimated input tokens of the repeats
+            saved_output_tokens: Estimated output tokens of the repeats
+            request_id: Optional request ID for tracking
+
+        Returns:
+            Dictionary with dedup information
+        """
+        saved_cost = cls.estimate_cost(provider, model, saved_input_tokens, saved_output_tokens)
+        dedup_ratio = 1 - unique_segments / total_segments if total_segments else 0.0
+
+        log_data = {
+            "provider": provider,
+            "model": model,
+            "total_segments": total_segments,
+            "unique_segments": unique_segments,
+            "dedup_ratio": dedup_ratio,
+            "saved_tokens": saved_input_tokens + saved_output_tokens,
+            "saved_cost_usd": saved_cost,
+            "request_id": request_id,
+        }
+
+        logger.info(
+            f"♻️ Segment dedup | Provider: {provider} | Model: {model} | "
+            f"Segments: {total_segments:,} → {unique_segments:,} unique ({dedup_ratio:.1%} deduplicated) | "
+            f"Saved: ~{saved_input_tokens + saved_output_tokens:,} tokens, ${saved_cost:.6f} USD"
+            + (f" | Request ID: {request_id}" if request_id else "")
+        )
+
+        return log_data
@@ -0,0 +1,145 @@
+"""Script-aware token estimation for batch packing.
+
+A flat "4 characters per token" rule is close for English but badly wrong for
+other scripts: Chinese or Japanese text costs roughly one token per character,
+Thai and Indic scripts one per one or two characters, Cyrillic one per two or
+three. Estimates are made per script and then calibrated per provider from the
+real token counts the APIs return (fed in by CostTracker.log_api_call).
+"""
+
+import re
+from typing import Dict, Optional
+
+from app.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Unicode ranges per script; anything not matched counts as Latin
+SCRIPT_PATTERNS = {
+    # Kana, CJK ideographs, Hangul, CJK compatibility and fullwidth forms
+    'cjk': re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]+'),
+    'thai': re.compile(r'[\u0e00-\u0eff]+'),  # Thai and Lao
+    'indic': re.compile(r'[\u0900-\u0dff]+'),  # Devanagari through Sinhala
+    'cyrillic': re.compile(r'[\u0370-\u052f]+'),  # Greek and Cyrillic
+    'rtl': re.compile(r'[\u0590-\u06ff\u0750-\u077f]+'),  # Hebrew and Arabic
+    'other': re.compile(r'[\u0530-\u058f\u10a0-\u10ff\u1780-\u17ff]+'),  # Armenian, Georgian, Khmer
+}
+
+# Starting point before calibration: characters per token for each script
+DEFAULT_CHARS_PER_TOKEN = {
+    'latin': 4.0,
+    'cyrillic': 2.5,
+    'rtl': 2.5,
+    'other': 2.0,
+    'thai': 1.8,
+    'indic': 1.5,
+    'cjk': 1.2,
+}
+
+# Target language -> script of the translated text (for output budgets)
+LANGUAGE_SCRIPTS = {
+    'zh': 'cjk', 'ja': 'cjk', 'ko': 'cjk',
+    'th': 'thai', 'lo': 'thai',
+    'hi': 'indic', 'bn': 'indic', 'ta': 'indic', 'te': 'indic', 'mr': 'indic',
+    'gu': 'indic', 'kn': 'indic', 'ml': 'indic', 'pa': 'indic', 'ne': 'indic',
+    'ru': 'cyrillic', 'bg': 'cyrillic', 'sr': 'cyrillic', 'uk': 'cyrillic',
+    'mk': 'cyrillic', 'tg': 'cyrillic', 'el': 'cyrillic',
+    'ar': 'rtl', 'he': 'rtl', 'fa': 'rtl', 'ur': 'rtl',
+    'hy': 'other', 'ka': 'other', 'km': 'other',
+}
+
+# Languages written in Latin script (languages in neither map have no known script)
+LATIN_LANGUAGES = {
+    'af', 'az', 'ca', 'cs', 'cy', 'da', 'de', 'en', 'eo', 'es', 'et', 'eu', 'fi',
+    'fil', 'fr', 'ga', 'gl', 'hr', 'hu', 'id', 'is', 'it', 'la', 'lt', 'lv', 'ms',
+    'mt', 'nb', 'nl', 'nn', 'no', 'pl', 'pt', 'ro', 'sk', 'sl', 'sq', 'sv', 'sw',
+    'tl', 'tr', 'vi',
+}
+
+
+def count_script_chars(text: str) -> Dict[str, int]:
+    """Count characters of each script in text."""
+    counts = {}
+    non_latin = 0
+    for script, pattern in SCRIPT_PATTERNS.items():
+        script_chars = sum(len(run) for run in pattern.findall(text))
+        if script_chars:
+            counts[script] = script_chars
+            non_latin += script_chars
+    counts['latin'] = len(text) - non_latin
+    return counts
+
+
+class TokenEstimator:
+    """Per-provider token estimator calibrated from observed usage.
+
+    Each script has a correction factor that starts at 1.0 and moves towards
+    actual/estimated whenever the API reports real token counts for a text
+    dominated by that script.
+    """
+
+    # Weight of each new observation and bounds on the correction factor
+    SMOOTHING = 0.2
+    MIN_FACTOR = 0.4
+    MAX_FACTOR = 3.0
+    MIN_CALIBRATION_TOKENS = 50
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.factors = {script: 1.0 for script in DEFAULT_CHARS_PER_TOKEN}
+        self.observations = 0
+
+    def estimate_counts(self, counts: Dict[str, int]) -> float:
+        return sum(
+            chars / DEFAULT_CHARS_PER_TOKEN[script] * self.factors[script]
+            for script, chars in counts.items()
+        )
+
+    def estimate(self, text: str) -> int:
+        """Estimate the token count of text."""
+        if not text:
+            return 0
+        return max(1, round(self.estimate_counts(count_script_chars(text))))
+
+    def estimate_translation(self, text: str, target_lang: Optional[str]) -> int:
+        """Estimate the token count of text once translated to target_lang.
+
+        Translations keep roughly the same number of characters outside CJK,
+        so the source is re-costed as if written in the target script and the
+        larger of the two estimates is used.
+        """
+        source_tokens = self.estimate(text)
+        script = LANGUAGE_SCRIPTS.get((target_lang or '').lower().split('-')[0], 'latin')
+        target_tokens = round(self.estimate_counts({script: len(text)}))
+        return max(source_tokens, target_tokens)
+
+    def calibrate(self, text: str, actual_tokens: Optional[int]):
+        """Update the dominant script's factor from an actual token count."""
+        if not text or not actual_tokens:
+            return
+
+        counts = count_script_chars(text)
+        estimated = self.estimate_counts(counts)
+        if estimated < self.MIN_CALIBRATION_TOKENS:
+            return
+
+        script = max(counts, key=counts.get)
+        ratio = actual_tokens / estimated
+        factor = self.factors[script] * (1 + self.SMOOTHING * (ratio - 1))
+        self.factors[script] = min(self.MAX_FACTOR, max(self.MIN_FACTOR, factor))
+        self.observations += 1
+
+        logger.debug(
+            f"Token estimator {self.provider}/{script}: estimated {estimated:.0f}, "
+            f"actual {actual_tokens} → factor {self.factors[script]:.2f}"
+        )
+
+
+_estimators: Dict[str, TokenEstimator] = {}
+
+
+def get_token_estimator(provider: str) -> TokenEstimator:
+    """Get the process-wide token estimator for a provider."""
+    if provider not in _estimators:
+        _estimators[provider] = TokenEstimator(provider)
+    return _estimators[provider]
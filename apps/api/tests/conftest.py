@@ -0,0 +1,11 @@
+import os
+
+# Settings requires these; unit tests never reach the services they configure
+for name in (
+    "R2_ACCOUNT_ID", "R2_ACCESS_KEY_ID", "R2_SECRET_ACCESS_KEY",
+    "PAYPAL_CLIENT_ID", "PAYPAL_CLIENT_SECRET", "PAYPAL_WEBHOOK_ID",
+    "GEMINI_API_KEY", "GROQ_API_KEY", "RESEND_API_KEY",
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379")
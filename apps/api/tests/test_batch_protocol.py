@@ -0,0 +1,80 @@
+import json
+from typing import Dict, List
+
+import pytest
+
+from app.config import settings
+from app.providers.base import TranslationProvider
+from app.providers.batch_protocol import build_batch_items, parse_batch_response
+
+
+class StubProvider(TranslationProvider):
+    """Provider whose requests are answered from a list of canned responses."""
+
+    name = "stub"
+
+    def __init__(self, responses: List[Dict[int, str]]):
+        super().__init__("key", "model")
+        self.responses = responses
+        self.requests: List[Dict[int, str]] = []
+
+    async def _request_batch(self, items, src_lang, tgt_lang, system_hint):
+        self.requests.append(dict(items))
+        return self.responses.pop(0)
+
+    async def translate_batch(self, batch, src_lang, tgt_lang, system_hint):
+        return await self._translate_batch(batch, src_lang, tgt_lang, system_hint)
+
+    async def translate_segments(self, segments, src_lang, tgt_lang, system_hint=None,
+                                 glossary=None, progress_callback=None, batch_callback=None):
+        return await self.translate_batch(segments, src_lang, tgt_lang, system_hint or "")
+
+
+@pytest.mark.asyncio
+async def test_translations_are_aligned_by_id():
+    provider = StubProvider([{2: "c", 0: "a", 1: "b"}])
+
+    assert await provider.translate_batch(["A", "B", "C"], "en", "es", "") == ["a", "b", "c"]
+    assert provider.requests == [{0: "A", 1: "B", 2: "C"}]
+
+
+@pytest.mark.asyncio
+async def test_only_missing_ids_are_re_requested(monkeypatch):
+    monkeypatch.setattr(settings, "batch_missing_id_rounds", 3)
+    provider = StubProvider([{0: "a", 3: "d"}, {2: "c"}, {1: "b"}])
+
+    assert await provider.translate_batch(["A", "B", "C", "D"], "en", "es", "") == ["a", "b", "c", "d"]
+    assert provider.requests == [{0: "A", 1: "B", 2: "C", 3: "D"}, {1: "B", 2: "C"}, {1: "B"}]
+
+
+@pytest.mark.asyncio
+async def test_segments_missing_after_every_round_come_back_empty(monkeypatch):
+    monkeypatch.setattr(settings, "batch_missing_id_rounds", 2)
+    provider = StubProvider([{0: "a"}, {}])
+
+    assert await provider.translate_batch(["A", "B"], "en", "es", "") == ["a", ""]
+    assert len(provider.requests) == 2
+
+
+def test_build_batch_items_keeps_ids_and_unicode():
+    assert json.loads(build_batch_items({4: "Añadir {TAG_0}"})) == [{"id": 4, "text": "Añadir {TAG_0}"}]
+
+
+def test_parse_batch_response_accepts_wrapped_and_fenced_json():
+    wrapped = '```json\n{"translations": [{"id": 1, "text": "uno"}, {"id": "2", "text": "dos"}]}\n```'
+
+    assert parse_batch_response(wrapped, [1, 2]) == {1: "uno", 2: "dos"}
+
+
+def test_parse_batch_response_ignores_unknown_duplicate_and_malformed_items():
+    response = json.dumps([
+        {"id": 1, "text": "first"},
+        {"id": 1, "text": "second"},
+        {"id": 9, "text": "unknown"},
+        {"id": 2},
+        {"text": "no id"},
+        "not an item",
+    ])
+
+    assert parse_batch_response(response, [1, 2]) == {1: "first"}
+    assert parse_batch_response("not json", [1]) == {}
@@ -0,0 +1,91 @@
+import os
+import zipfile
+
+import pytest
+from ebooklib import epub
+
+from app.pipeline.epub_writer import EpubZipWriter, ZipCopyEpubWriter, read_book, write_book
+
+IMAGE = bytes(range(256)) * 64
+CSS = "body { margin: 0; }\n" * 50
+
+
+@pytest.fixture
+def source_epub(tmp_path):
+    """A small EPUB with a chapter, an image and a stylesheet."""
+    book = epub.EpubBook()
+    book.set_identifier("test-book")
+    book.set_title("Test")
+    book.set_language("en")
+    chapter = epub.EpubHtml(title="One", file_name="chapter.xhtml", lang="en")
+    chapter.content = "<h1>One</h1><p>Text <img src=\"images/pic.png\"/></p>"
+    image = epub.EpubItem(uid="pic", file_name="images/pic.png", media_type="image/png", content=IMAGE)
+    style = epub.EpubItem(uid="style", file_name="style/main.css", media_type="text/css", content=CSS)
+    for item in (chapter, image, style):
+        book.add_item(item)
+    book.toc = [epub.Link("chapter.xhtml", "One", "one")]
+    book.spine = ["nav", chapter]
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+    path = str(tmp_path / "source.epub")
+    epub.write_epub(path, book)
+    return path
+
+
+def read_source(path):
+    book = read_book(path)
+    # ebooklib reads TOC links without uids; the pipeline rebuilds the TOC the same way
+    book.toc = [epub.Link("chapter.xhtml", "One", "one")]
+    return book
+
+
+def test_unchanged_members_are_copied_without_recompression(source_epub, tmp_path):
+    book = read_source(source_epub)
+    output = str(tmp_path / "output.epub")
+
+    writer = ZipCopyEpubWriter(output, book, source_epub)
+    writer.process()
+    writer.write()
+
+    assert writer.stats["copied"] == 2
+    with zipfile.ZipFile(source_epub) as source, zipfile.ZipFile(output) as written:
+        assert written.testzip() is None
+        assert written.namelist()[0] == "mimetype"
+        assert written.getinfo("mimetype").compress_type == zipfile.ZIP_STORED
+        for name in ("EPUB/images/pic.png", "EPUB/style/main.css"):
+            original, copy = source.getinfo(name), written.getinfo(name)
+            assert written.read(name) == source.read(name)
+            assert (copy.CRC, copy.compress_size, copy.compress_type) == (
+                original.CRC, original.compress_size, original.compress_type
+            )
+
+
+def test_changed_items_are_written_fresh(source_epub, tmp_path):
+    book = read_source(source_epub)
+    book.get_item_with_id("style").content = b"body { margin: 1em; }"
+    output = str(tmp_path / "output.epub")
+
+    write_book(output, book, book)
+
+    with zipfile.ZipFile(output) as written:
+        assert written.testzip() is None
+        assert written.read("EPUB/style/main.css") == b"body { margin: 1em; }"
+        assert written.read("EPUB/images/pic.png") == IMAGE
+
+
+def test_epub_zip_writer_output_reads_back_with_zipfile(source_epub, tmp_path):
+    output = str(tmp_path / "raw.zip")
+
+    with zipfile.ZipFile(source_epub) as source, open(source_epub, "rb") as source_file:
+        with EpubZipWriter(output, 6) as writer:
+            writer.writestr("mimetype", "application/epub+zip", compress_type=zipfile.ZIP_STORED)
+            writer.writestr("textos/capítulo.txt", "¡Hola! " * 100)
+            writer.copy_raw(source_file, source.getinfo("EPUB/images/pic.png"), "imágenes/pic.png")
+
+    with zipfile.ZipFile(output) as written:
+        assert written.testzip() is None
+        assert written.namelist() == ["mimetype", "textos/capítulo.txt", "imágenes/pic.png"]
+        assert written.read("mimetype") == b"application/epub+zip"
+        assert written.read("textos/capítulo.txt") == ("¡Hola! " * 100).encode("utf-8")
+        assert written.read("imágenes/pic.png") == IMAGE
+        assert os.path.getsize(output) < len(IMAGE)
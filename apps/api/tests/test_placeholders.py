@@ -0,0 +1,98 @@
+import re
+from typing import Dict, Tuple
+
+import pytest
+
+from app.pipeline.placeholders import PlaceholderManager
+
+
+def protect_per_pattern(manager: PlaceholderManager, segment: str) -> Tuple[str, Dict]:
+    """Reference: the previous protection, one substitution pass per pattern type."""
+    protected = segment
+    segment_map = {}
+    for pattern_type, pattern in manager.patterns.items():
+        matches = list(pattern.finditer(protected))
+        if not matches:
+            continue
+        type_map = {}
+        for i, match in reversed(list(enumerate(matches))):
+            placeholder = f"{{{pattern_type.upper()}_{i}}}"
+            type_map[placeholder] = match.group()
+            protected = protected[:match.start()] + placeholder + protected[match.end():]
+        segment_map[pattern_type] = type_map
+    return protected, segment_map
+
+
+def restore_per_pattern(translated: str, segment_map: Dict) -> Tuple[str, bool]:
+    """Reference: the previous restoration, one parity check and replace pass per pattern type."""
+    restored = translated
+    valid = True
+    for pattern_type, type_map in segment_map.items():
+        found = set(re.findall(rf'{{{pattern_type.upper()}_\d+}}', translated))
+        if found != set(type_map):
+            valid = False
+        for placeholder, original in type_map.items():
+            restored = restored.replace(placeholder, original)
+    return restored, valid
+
+
+SEGMENTS = [
+    "Plain prose without anything to protect.",
+    "<em>Bold</em> claims and <a href=\"#note\">a link</a>.",
+    "In 1984 there were 3,500,000 copies and 12.5% of them sold.",
+    "Write to editor@example.com or visit www.example.org today.",
+    "See https://example.com/page for details.",
+    "<span class=\"x\">Chapter</span> 7: mail a.b@c.io, <br/> then 42.",
+    "",
+]
+
+
+@pytest.fixture
+def manager():
+    return PlaceholderManager()
+
+
+@pytest.mark.parametrize("segment", SEGMENTS)
+def test_single_pass_protection_matches_per_pattern(manager, segment):
+    assert manager.protect_segment(segment, 0) == protect_per_pattern(manager, segment)
+
+
+@pytest.mark.parametrize("segment", SEGMENTS)
+def test_restore_matches_per_pattern(manager, segment):
+    protected, segment_map = manager.protect_segment(segment, 0)
+    # A translation that moves placeholders around
+    translated = " ".join(reversed(protected.split(" ")))
+
+    assert manager.restore_segment(translated, segment_map) == restore_per_pattern(translated, segment_map)
+    assert manager.restore_segment(protected, segment_map) == (segment, True)
+
+
+def test_number_inside_url_stays_part_of_the_url(manager):
+    segment = "Read https://example.com/page/42 first."
+
+    protected, segment_map = manager.protect_segment(segment, 0)
+
+    assert protected == "Read {URL_0} first."
+    assert segment_map == {"url": {"{URL_0}": "https://example.com/page/42"}}
+    assert manager.restore_segment(protected, segment_map) == (segment, True)
+
+
+@pytest.mark.parametrize("translated", [
+    "Negrita {TAG_1} sin apertura.",
+    "{TAG_0}Negrita{TAG_1} y {TAG_2} inventado.",
+])
+def test_missing_or_invented_placeholders_fail_parity(manager, translated):
+    _, segment_map = manager.protect_segment("<b>Bold</b> text.", 0)
+
+    assert manager.restore_segment(translated, segment_map) == restore_per_pattern(translated, segment_map)
+    assert manager.restore_segment(translated, segment_map)[1] is False
+
+
+def test_restore_segments_reports_failed_indices(manager):
+    protected, placeholder_map = manager.protect_segments(["<i>One</i>", "Two", "<b>3</b>"])
+    translated = [protected[0], protected[1], "{TAG_0}tres"]
+
+    restored, failed = manager.restore_segments(translated, placeholder_map)
+
+    assert restored == ["<i>One</i>", "Two", "<b>tres"]
+    assert failed == [2]
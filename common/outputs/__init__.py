@@ -2,6 +2,6 @@
 Output generation modules for all formats (EPUB, PDF, TXT)
 """
 
-from .generator import OutputGenerator, generate_outputs_with_metadata
+from .generator import OutputGenerator, extract_book_metadata, generate_outputs_with_metadata
 
-__all__ = ['OutputGenerator', 'generate_outputs_with_metadata']
\ No newline at end of file
+__all__ = ['OutputGenerator', 'extract_book_metadata', 'generate_outputs_with_metadata']
\ No newline at end of file
@@ -259,6 +259,30 @@ async def generate_outputs_with_metadata(
     output_generator = OutputGenerator()
 
     # Extract metadata for formatting
+    metadata = extract_book_metadata(original_book)
+
+    # Generate all outputs using shared module
+    results = await output_generator.generate_all_outputs(
+        output_dir=output_dir,
+        original_book=original_book,
+        translated_docs=translated_docs,
+        provider_name=job_id,
+        metadata=metadata
+    )
+
+    return results
+
+
+def extract_book_metadata(original_book: Any) -> Dict[str, str]:
+    """
+    Extract title/author metadata used to format the TXT output.
+
+    Args:
+        original_book: Original EPUB book object
+
+    Returns:
+        Dictionary with title, author and original_title (defaults when missing)
+    """
     metadata = {
         "title": "Traducción de Libro",
         "author": "Autor Desconocido",
@@ -282,13 +306,4 @@ async def generate_outputs_with_metadata(
     except Exception as e:
         logger.debug(f"Could not extract book metadata: {e}")
 
-    # Generate all outputs using shared module
-    results = await output_generator.generate_all_outputs(
-        output_dir=output_dir,
-        original_book=original_book,
-        translated_docs=translated_docs,
-        provider_name=job_id,
-        metadata=metadata
-    )
-
-    return results
\ No newline at end of file
+    return metadata
@@ -8,9 +8,9 @@ import sys
 import subprocess
 import tempfile
 import zipfile
-import base64
 from pathlib import Path
 from datetime import datetime
+from urllib.parse import unquote, urlsplit
 
 # Set environment for WeasyPrint
 os.environ['DYLD_LIBRARY_PATH'] = "/opt/homebrew/lib:" + os.environ.get('DYLD_LIBRARY_PATH', '')
@@ -156,6 +156,44 @@ def epub_to_pdf_reportlab(epub_path: str, output_path: str) -> bool:
         print(f"❌ ReportLab error: {e}")
         return False
 
+# Unresolvable host: only the EPUB url_fetcher serves URLs under it
+EPUB_ASSET_URL = "https://epub.invalid/"
+
+IMAGE_MIME_TYPES = {
+    '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
+    '.png': 'image/png', '.gif': 'image/gif'
+}
+
+def _epub_url_fetcher(epub: zipfile.ZipFile, image_members: dict):
+    """WeasyPrint url_fetcher serving EPUB_ASSET_URL images by file name from the zip"""
+    def read_image(url):
+        image_name = os.path.basename(unquote(urlsplit(url).path))
+        if image_name not in image_members:
+            raise ValueError(f"Image not found in EPUB: {url}")
+        mime_type = IMAGE_MIME_TYPES.get(os.path.splitext(image_name)[1].lower(), 'image/jpeg')
+        return epub.read(image_members[image_name]), mime_type
+
+    try:
+        # WeasyPrint 68+: fetchers are URLFetcher instances
+        from weasyprint.urls import URLFetcher, URLFetcherResponse
+    except ImportError:
+        from weasyprint import default_url_fetcher
+
+        def fetch(url, *args, **kwargs):
+            if not url.startswith(EPUB_ASSET_URL):
+                return default_url_fetcher(url, *args, **kwargs)
+            data, mime_type = read_image(url)
+            return {'string': data, 'mime_type': mime_type, 'redirected_url': url}
+        return fetch
+
+    class EPUBURLFetcher(URLFetcher):
+        def fetch(self, url, headers=None):
+            if not url.startswith(EPUB_ASSET_URL):
+                return super().fetch(url, headers)
+            data, mime_type = read_image(url)
+            return URLFetcherResponse(url, data, {'Content-Type': mime_type})
+    return EPUBURLFetcher()
+
 def epub_to_pdf_weasyprint(epub_path: str, output_path: str) -> bool:
     """Convert EPUB to PDF using WeasyPrint - excellent CSS support"""
     print("🔄 Converting with WeasyPrint (CSS support)...")
@@ -165,31 +203,16 @@ def epub_to_pdf_weasyprint(epub_path: str, output_path: str) -> bool:
         
         # Extract and process content
         temp_dir = tempfile.mkdtemp()
-        extracted_images = {}
-        
+
         with zipfile.ZipFile(epub_path, 'r') as epub:
-            # Extract images as base64
+            # Index images by file name; WeasyPrint reads them from the zip on demand
+            image_members = {}
             for file_info in epub.infolist():
-                if (file_info.filename.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')) 
+                if (file_info.filename.lower().endswith(tuple(IMAGE_MIME_TYPES))
                     and not file_info.is_dir() and 'OEBPS/' in file_info.filename):
-                    image_data = epub.read(file_info.filename)
-                    image_name = os.path.basename(file_info.filename)
-                    
-                    # Determine MIME type
-                    if image_name.lower().endswith(('.jpg', '.jpeg')):
-                        mime_type = 'image/jpeg'
-                    elif image_name.lower().endswith('.png'):
-                        mime_type = 'image/png'
-                    elif image_name.lower().endswith('.gif'):
-                        mime_type = 'image/gif'
-                    else:
-                        mime_type = 'image/jpeg'
-                    
-                    b64_data = base64.b64encode(image_data).decode('utf-8')
-                    data_uri = f"data:{mime_type};base64,{b64_data}"
-                    extracted_images[image_name] = data_uri
+                    image_members[os.path.basename(file_info.filename)] = file_info.filename
             
-            # Process HTML and embed images
+            # Process HTML
             combined_html = ""
             images_embedded = 0
             
@@ -198,13 +221,10 @@ def epub_to_pdf_weasyprint(epub_path: str, output_path: str) -> bool:
                     html_data = epub.read(file_info.filename).decode('utf-8')
                     soup = BeautifulSoup(html_data, 'html.parser')
                     
-                    # Replace image sources with base64
-                    for img in soup.find_all('img'):
-                        src = img.get('src', '')
-                        image_name = os.path.basename(src)
-                        if image_name in extracted_images:
-                            img['src'] = extracted_images[image_name]
-                            images_embedded += 1
+                    images_embedded += sum(
+                        1 for img in soup.find_all('img')
+                        if os.path.basename(img.get('src', '')) in image_members
+                    )
                     
                     # Add enhanced CSS
                     head = soup.find('head')
@@ -249,8 +269,12 @@ def epub_to_pdf_weasyprint(epub_path: str, output_path: str) -> bool:
                     
                     combined_html += str(soup) + "\n"
             
-            # Generate PDF
-            HTML(string=combined_html).write_pdf(output_path)
+            # Generate PDF (relative image URLs resolve under EPUB_ASSET_URL)
+            HTML(
+                string=combined_html,
+                base_url=EPUB_ASSET_URL,
+                url_fetcher=_epub_url_fetcher(epub, image_members)
+            ).write_pdf(output_path)
             
         file_size = os.path.getsize(output_path) / 1024
         print(f"✅ WeasyPrint PDF created: {file_size:.1f} KB ({images_embedded} images)")
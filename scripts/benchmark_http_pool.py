@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-request latency of the pooled provider HTTP client
+
+Starts a local keep-alive stub that answers like the Gemini generateContent
+endpoint and sends the same batches through GeminiFlashProvider twice:
+  - pooled:      one long-lived client (current behaviour)
+  - per-request: client closed after every call (old `async with` behaviour)
+
+Run from the repo root with the API environment loaded:
+    python3 scripts/benchmark_http_pool.py [requests] [stub_latency_ms]
+
+Note: the stub speaks plain HTTP on localhost, so the numbers only include
+TCP connection setup. Real API endpoints add a TLS handshake on every new
+connection, which makes the gap considerably larger in production.
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "apps", "api"))
+
+from app.providers.gemini import GeminiFlashProvider
+
+STUB_RESPONSE = json.dumps({
+    "candidates": [{"content": {"parts": [{"text": json.dumps([{"id": 0, "text": "Hola mundo"}])}]}}],
+    "usageMetadata": {"promptTokenCount": 10, "candidatesTokenCount": 5},
+}).encode()
+
+
+async def handle_stub_connection(reader, writer, latency: float):
+    """Serve HTTP/1.1 keep-alive requests with a canned Gemini response."""
+    try:
+        while True:
+            headers = await reader.readuntil(b"\r\n\r\n")
+            content_length = 0
+            for line in headers.decode().split("\r\n"):
+                if line.lower().startswith("content-length:"):
+                    content_length = int(line.split(":", 1)[1])
+            await reader.readexactly(content_length)
+
+            if latency:
+                await asyncio.sleep(latency)
+
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: application/json\r\n"
+                b"Connection: keep-alive\r\n"
+                + f"Content-Length: {len(STUB_RESPONSE)}\r\n\r\n".encode()
+                + STUB_RESPONSE
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run_requests(provider, count: int, close_each: bool):
+    """Send `count` single-segment batches and return per-request latencies."""
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        await provider._translate_batch(["Hello world"], "en", "es", "Translate.")
+        latencies.append(time.perf_counter() - started)
+        if close_each:
+            # Equivalent to the previous `async with httpx.AsyncClient()` per call
+            await provider.aclose()
+    await provider.aclose()
+    return latencies
+
+
+def print_stats(label: str, latencies):
+    ms = sorted(l * 1000 for l in latencies)
+    p95 = ms[int(len(ms) * 0.95) - 1]
+    print(f"   {label:<12} mean {statistics.mean(ms):7.2f}ms   "
+          f"median {statistics.median(ms):7.2f}ms   p95 {p95:7.2f}ms")
+    return statistics.mean(ms)
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    stub_latency_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+
+    server = await asyncio.start_server(
+        lambda r, w: handle_stub_connection(r, w, stub_latency_ms / 1000),
+        "127.0.0.1", 0
+    )
+    port = server.sockets[0].getsockname()[1]
+
+    provider = GeminiFlashProvider(api_key="benchmark", model="gemini-2.5-flash-lite")
+    provider.base_url = f"http://127.0.0.1:{port}/v1/models"
+
+    print(f"🚀 HTTP client benchmark: {count} requests, stub latency {stub_latency_ms:.0f}ms")
+    print("=" * 60)
+
+    # Warm up imports and the stub before measuring
+    await run_requests(provider, 5, close_each=False)
+
+    per_request = await run_requests(provider, count, close_each=True)
+    pooled = await run_requests(provider, count, close_each=False)
+
+    per_request_mean = print_stats("per-request", per_request)
+    pooled_mean = print_stats("pooled", pooled)
+
+    saved = per_request_mean - pooled_mean
+    print("=" * 60)
+    print(f"✅ Pooled client saves {saved:.2f}ms per request "
+          f"({saved / per_request_mean * 100:.1f}%)")
+
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark placeholder protection and restoration
+
+Protects and restores every segment of each sample book two ways:
+  - per pattern:  one regex pass per pattern type, the string rebuilt by
+                  slicing once per match, one str.replace per placeholder
+                  on restore (old PlaceholderManager)
+  - single pass:  PlaceholderManager's combined alternation with one re.sub
+                  callback, and one placeholder regex with a dict lookup on
+                  restore
+
+Segments are taken both per text node and with block coalescing (inline
+tags kept as markup, so there are many more placeholders per segment).
+A synthetic back-of-book index (thousands of page numbers per segment)
+shows the many-matches case. Restoration is timed on the protected segments
+themselves, i.e. a translation that kept every placeholder.
+
+Run from the repo root with the API environment loaded:
+    python3 scripts/benchmark_placeholders.py [repeats]
+"""
+import glob
+import logging
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "apps", "api"))
+
+from app.pipeline.epub_io import EPUBProcessor
+from app.pipeline.html_segment import HTMLSegmenter
+from app.pipeline.placeholders import PlaceholderManager
+
+SAMPLE_BOOKS = os.path.join(os.path.dirname(__file__), "..", "sample_books")
+
+
+def per_pattern_protect(patterns: dict, segment: str):
+    """Old behaviour: one pass per pattern type, rebuilding the string per match."""
+    protected = segment
+    segment_map = {}
+    for pattern_type, pattern in patterns.items():
+        matches = list(pattern.finditer(protected))
+        if not matches:
+            continue
+        type_map = {}
+        for i, match in enumerate(reversed(matches)):
+            placeholder = f"{{{pattern_type.upper()}_{len(matches) - i - 1}}}"
+            type_map[placeholder] = match.group()
+            protected = protected[:match.start()] + placeholder + protected[match.end():]
+        segment_map[pattern_type] = type_map
+    return protected, segment_map
+
+
+def per_pattern_restore(translated: str, segment_map: dict):
+    """Old behaviour: compile a parity regex and str.replace per placeholder."""
+    restored = translated
+    valid = True
+    for pattern_type, type_map in segment_map.items():
+        found = set(re.findall(rf'{{{pattern_type.upper()}_\d+}}', restored))
+        if found != set(type_map):
+            valid = False
+        for placeholder, original in type_map.items():
+            restored = restored.replace(placeholder, original)
+    return restored, valid
+
+
+def index_page(entries: int = 20, numbers: int = 2000) -> list:
+    """Back-of-book index entries: long runs of page numbers and emphasis tags."""
+    return [
+        f"<em>Term {i}</em>, " + ", ".join(str(page) for page in range(1, numbers + 1))
+        for i in range(entries)
+    ]
+
+
+def time_it(func, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - started) / repeats
+
+
+def run_case(name: str, segments: list, repeats: int):
+    manager = PlaceholderManager()
+
+    old_protected = [per_pattern_protect(manager.patterns, segment) for segment in segments]
+    new_protected = [manager.protect_segment(segment, i) for i, segment in enumerate(segments)]
+    differing = sum(old[0] != new[0] for old, new in zip(old_protected, new_protected))
+    restored_ok = all(
+        manager.restore_segment(protected, segment_map) == (segment, True)
+        for segment, (protected, segment_map) in zip(segments, new_protected)
+    )
+    placeholders = sum(
+        len(type_map) for _, segment_map in new_protected for type_map in segment_map.values()
+    )
+
+    old_protect = time_it(lambda: [per_pattern_protect(manager.patterns, s) for s in segments], repeats)
+    new_protect = time_it(lambda: [manager.protect_segment(s, i) for i, s in enumerate(segments)], repeats)
+    old_restore = time_it(lambda: [per_pattern_restore(p, m) for p, m in new_protected], repeats)
+    new_restore = time_it(lambda: [manager.restore_segment(p, m) for p, m in new_protected], repeats)
+
+    print(f"📖 {name:<34} {len(segments):>6} segments {placeholders:>6} placeholders   "
+          f"{'✅ round trip' if restored_ok else '❌ round trip'}   {differing} protected differently")
+    print(f"   protect  per pattern {old_protect * 1000:8.1f}ms   single pass {new_protect * 1000:8.1f}ms   "
+          f"({old_protect / max(new_protect, 1e-9):.1f}x)")
+    print(f"   restore  per pattern {old_restore * 1000:8.1f}ms   single pass {new_restore * 1000:8.1f}ms   "
+          f"({old_restore / max(new_restore, 1e-9):.1f}x)")
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    logging.disable(logging.INFO)
+
+    print(f"🚀 Placeholder benchmark ({repeats} repeats)")
+    print("=" * 100)
+
+    processor = EPUBProcessor()
+    for path in sorted(glob.glob(os.path.join(SAMPLE_BOOKS, "*.epub"))):
+        for coalesce_blocks in (False, True):
+            _, spine_docs = processor.read_epub(path, parse_documents=False)
+            segmenter = HTMLSegmenter(max_processes=1, coalesce_blocks=coalesce_blocks)
+            segments, _ = segmenter.segment_documents(spine_docs)
+            mode = "blocks" if coalesce_blocks else "text nodes"
+            run_case(f"{os.path.basename(path)} ({mode})", segments, repeats)
+
+    run_case("synthetic index page", index_page(), repeats)
+
+    print("=" * 100)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark text-node indexing for segmentation
+
+Indexes the translatable text nodes of every spine document two ways:
+  - ancestor walk: find_all(string=True), then walk each node's parents up to
+    the root looking for no-translate tags (old _should_skip_translation)
+  - single pass:   ParsedDocument's depth-first walk carrying the flag down
+
+Runs on the EPUBs in sample_books/ plus a synthetic deeply nested chapter
+(Calibre/InDesign exports often wrap every paragraph in many divs/spans).
+Parsing is done once up front and not timed.
+
+Run from the repo root with the API environment loaded:
+    python3 scripts/benchmark_segmentation.py [repeats]
+"""
+import glob
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "apps", "api"))
+
+from bs4 import NavigableString
+
+from app.pipeline.document import NO_TRANSLATE_TAGS, ParsedDocument, is_translatable_text
+from app.pipeline.epub_io import EPUBProcessor
+
+SAMPLE_BOOKS = os.path.join(os.path.dirname(__file__), "..", "sample_books")
+
+
+def ancestor_walk(document: ParsedDocument) -> list:
+    """Old behaviour: check every text node's ancestors."""
+    nodes = []
+    for node in document.soup.find_all(string=True):
+        if not isinstance(node, NavigableString) or not is_translatable_text(node.strip()):
+            continue
+        current = node.parent
+        skipped = False
+        while current:
+            if current.name in NO_TRANSLATE_TAGS:
+                skipped = True
+                break
+            current = current.parent
+        if not skipped:
+            nodes.append(node)
+    return nodes
+
+
+def single_pass(document: ParsedDocument) -> list:
+    document._index_text_nodes()
+    return document._text_nodes
+
+
+def deep_chapter(paragraphs: int = 2000, depth: int = 40) -> str:
+    """A chapter where every paragraph sits under `depth` nested wrappers."""
+    opening = "".join(f'<div class="d{i}"><span>' for i in range(depth))
+    closing = "</span></div>" * depth
+    body = "".join(
+        f"{opening}<p>Paragraph {i} with <em>some</em> text and a <a href='#n{i}'>note</a>.</p>{closing}"
+        for i in range(paragraphs)
+    )
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<html xmlns="http://www.w3.org/1999/xhtml"><head/><body>'
+        f"{body}</body></html>"
+    )
+
+
+def time_it(func, documents, repeats: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        for document in documents:
+            func(document)
+    return (time.perf_counter() - started) / repeats
+
+
+def run_case(name: str, documents, repeats: int):
+    old_nodes = sum(len(ancestor_walk(document)) for document in documents)
+    new_nodes = sum(len(single_pass(document)) for document in documents)
+    if old_nodes != new_nodes:
+        print(f"❌ {name}: node count differs ({old_nodes} vs {new_nodes})")
+        return
+
+    old = time_it(ancestor_walk, documents, repeats)
+    new = time_it(single_pass, documents, repeats)
+    print(f"📖 {name:<24} {new_nodes:>7} nodes   "
+          f"ancestor walk {old * 1000:8.1f}ms   single pass {new * 1000:8.1f}ms   "
+          f"({old / max(new, 1e-9):.1f}x)")
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    logging.disable(logging.INFO)
+
+    print(f"🚀 Segmentation indexing benchmark ({repeats} repeats)")
+    print("=" * 90)
+
+    processor = EPUBProcessor()
+    for path in sorted(glob.glob(os.path.join(SAMPLE_BOOKS, "*.epub"))):
+        _, spine_docs = processor.read_epub(path)
+        documents = [doc['document'] for doc in spine_docs if doc.get('document')]
+        run_case(os.path.basename(path), documents, repeats)
+
+    run_case("synthetic depth-40", [ParsedDocument.parse(deep_chapter())], repeats)
+    print("=" * 90)
+
+
+if __name__ == "__main__":
+    main()